@@ -0,0 +1,188 @@
+"""
+Per-worker admission control.
+
+At most ADMISSION_MAX_CONCURRENCY requests run at once; the rest wait in a
+bounded priority queue, so rental writes are let in before catalog reads. A
+request is turned away with 503 and `Retry-After` when the queue is full, when
+it waited longer than ADMISSION_QUEUE_TIMEOUT, or, unless it is a rental write,
+when recent DB pool checkouts took longer than ADMISSION_CHECKOUT_WAIT.
+Shedding early keeps a slow database from piling up requests until every
+client times out.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from enum import IntEnum
+
+from .settings import Settings
+
+settings = Settings()
+
+
+class Priority(IntEnum):
+	WRITE = 0
+	DEFAULT = 1
+	READ = 2
+
+
+class Rejected(Exception):
+	pass
+
+
+def _granted(future: asyncio.Future) -> bool:
+	return future.done() and not future.cancelled() and future.exception() is None
+
+
+class AdmissionController:
+	def __init__(
+		self,
+		max_concurrency: int,
+		max_queue: int,
+		queue_timeout: float,
+		checkout_wait_threshold: float,
+		retry_after: int,
+	):
+		self.max_concurrency = max_concurrency
+		self.max_queue = max_queue
+		self.queue_timeout = queue_timeout
+		self.checkout_wait_threshold = checkout_wait_threshold
+		self.retry_after = retry_after
+
+		self.active = 0
+		self.waiters = []  # heap of [priority, sequence, future]
+		self.sequence = itertools.count()
+		self.rejected = 0
+		self.checkout_wait = 0.0
+		self.last_checkout = 0.0
+
+	@property
+	def queued(self) -> int:
+		return len(self.waiters)
+
+	def observe_checkout_wait(self, seconds: float) -> None:
+		"""Feed how long a request waited for a pool connection."""
+		self.checkout_wait = 0.8 * self.checkout_wait + 0.2 * seconds
+		self.last_checkout = time.monotonic()
+
+	def pool_saturated(self) -> bool:
+		# Stale samples expire, otherwise shedding every read would keep the
+		# average high forever
+		recent = time.monotonic() - self.last_checkout < self.retry_after
+		return recent and self.checkout_wait > self.checkout_wait_threshold
+
+	def stats(self) -> dict:
+		return {
+			'active': self.active,
+			'queued': self.queued,
+			'rejected': self.rejected,
+			'checkout_wait_ms': round(self.checkout_wait * 1000, 3),
+			'pool_saturated': self.pool_saturated(),
+		}
+
+	def _reject(self, reason: str):
+		self.rejected += 1
+		return Rejected(reason)
+
+	async def acquire(self, priority: Priority) -> None:
+		if priority != Priority.WRITE and self.pool_saturated():
+			raise self._reject('Database pool saturated.')
+
+		if self.active < self.max_concurrency and not self.queued:
+			self.active += 1
+			return
+
+		if self.queued >= self.max_queue:
+			worst = max(self.waiters)
+			if worst[0] <= priority:
+				raise self._reject('Request queue full.')
+			# Make room by turning away the newest waiter of the lowest class
+			self._discard(worst)
+			worst[2].set_exception(self._reject('Request queue full.'))
+
+		future = asyncio.get_running_loop().create_future()
+		entry = [priority, next(self.sequence), future]
+		heapq.heappush(self.waiters, entry)
+		try:
+			await asyncio.wait_for(future, self.queue_timeout)
+		except TimeoutError:
+			if not _granted(future):
+				self._discard(entry)
+				raise self._reject('Timed out waiting in the request queue.')
+		except BaseException:
+			if _granted(future):
+				# Cancelled right after being handed a slot: pass it on
+				self.release()
+			else:
+				self._discard(entry)
+			raise
+
+	def _discard(self, entry) -> None:
+		if entry in self.waiters:
+			self.waiters.remove(entry)
+			heapq.heapify(self.waiters)
+
+	def release(self) -> None:
+		while self.waiters:
+			*_, future = heapq.heappop(self.waiters)
+			if not future.done():
+				# Hand the slot straight to the next waiter
+				future.set_result(None)
+				return
+
+		self.active -= 1
+
+
+admission = AdmissionController(
+	settings.ADMISSION_MAX_CONCURRENCY,
+	settings.ADMISSION_MAX_QUEUE,
+	settings.ADMISSION_QUEUE_TIMEOUT,
+	settings.ADMISSION_CHECKOUT_WAIT,
+	settings.ADMISSION_RETRY_AFTER,
+)
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+def classify(scope) -> Priority:
+	method, path = scope['method'], scope['path']
+	if path.startswith('/rental') and method in WRITE_METHODS:
+		return Priority.WRITE
+	if path.startswith('/costumes') and method == 'GET':
+		return Priority.READ
+
+	return Priority.DEFAULT
+
+
+class AdmissionMiddleware:
+	def __init__(self, app, controller=admission):
+		self.app = app
+		self.controller = controller
+
+	async def __call__(self, scope, receive, send):
+		# Health checks must answer even when the worker is shedding load
+		if scope['type'] != 'http' or scope['path'].startswith('/health'):
+			return await self.app(scope, receive, send)
+
+		try:
+			await self.controller.acquire(classify(scope))
+		except Rejected as rejected:
+			body = json.dumps({'detail': str(rejected)}).encode()
+			await send({
+				'type': 'http.response.start',
+				'status': 503,
+				'headers': [
+					(b'content-type', b'application/json'),
+					(b'content-length', str(len(body)).encode()),
+					(b'retry-after', str(self.controller.retry_after).encode()),
+				],
+			})
+			await send({'type': 'http.response.body', 'body': body})
+			return
+
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			self.controller.release()
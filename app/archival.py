@@ -0,0 +1,244 @@
+"""
+Monthly partitions of `rental` and archival of old rentals to `rental_history`.
+
+On PostgreSQL the migrations partition `rental` by month of `rental_date`
+(`rental_y2026m10` and so on, plus `rental_default` for anything outside
+them), so queries on recent rentals only touch the partitions of their months
+and each one is vacuumed on its own. While the app runs it keeps the partitions
+of this month and the next RENTAL_PARTITION_MONTHS_AHEAD ones created.
+
+Rentals returned more than RENTAL_ARCHIVE_AFTER_DAYS ago are moved to
+`rental_history`, which the rollups and customer stats rebuild from too. A
+partition whose month is entirely archived is copied and dropped in one go;
+rentals of other months are moved in batches. Run it, e.g. nightly, with
+
+	python -m app.archival
+
+which creates upcoming partitions as well. On SQLite only the archival applies.
+"""
+
+import argparse
+import asyncio
+import logging
+from collections.abc import Sequence
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from .database import AsyncSessionLocal, dialect_name
+from .models import Rental, RentalHistory, RentalView
+from .rollups import month_start, next_month
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+COLUMNS = [column.name for column in Rental.__table__.columns]
+DEFAULT_PARTITION = 'rental_default'
+
+
+def partition_name(month: date) -> str:
+	return f'rental_y{month.year}m{month.month:02d}'
+
+
+def partition_month(name: str) -> date | None:
+	"""The month of a partition named by `partition_name`, or None."""
+	try:
+		return datetime.strptime(name, 'rental_y%Ym%m').date()
+	except ValueError:
+		return None
+
+
+async def partitions(session: AsyncSession) -> list[str]:
+	"""The partitions of `rental`; none when it is not partitioned."""
+	if dialect_name(session) != 'postgresql':
+		return []
+
+	names = await session.scalars(
+		text(
+			'SELECT child.relname FROM pg_inherits '
+			'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+			"WHERE pg_inherits.inhparent = 'rental'::regclass "
+			'ORDER BY child.relname'
+		)
+	)
+
+	return list(names)
+
+
+async def create_partitions(session: AsyncSession, months_ahead: int) -> list[str]:
+	"""
+	Create the partitions of this month and the next `months_ahead` ones that
+	don't exist yet, returning their names.
+	"""
+	existing = await partitions(session)
+	if not existing:
+		return []
+	# Other workers wait here instead of racing to create the same ones
+	await session.execute(text("SELECT pg_advisory_xact_lock(hashtext('rental'))"))
+	existing = await partitions(session)
+
+	created = []
+	month = month_start(datetime.now())
+	for _ in range(months_ahead + 1):
+		name = partition_name(month)
+		if name not in existing:
+			bounds = {'start': month, 'end': next_month(month)}
+			# Rentals already dated in that month sit in the default partition,
+			# which must give them up before the new one can take the range
+			await session.execute(
+				text(f'CREATE TABLE {name} (LIKE rental INCLUDING DEFAULTS)')
+			)
+			await session.execute(
+				text(
+					f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+					'WHERE rental_date >= :start AND rental_date < :end RETURNING *) '
+					f'INSERT INTO {name} SELECT * FROM moved'
+				),
+				bounds,
+			)
+			await session.execute(
+				text(
+					f'ALTER TABLE rental ATTACH PARTITION {name} '
+					f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+				)
+			)
+			created.append(name)
+		month = next_month(month)
+
+	return created
+
+
+async def maintain_partitions() -> None:
+	"""Create upcoming partitions now and every RENTAL_PARTITION_CHECK_INTERVAL."""
+	while True:
+		try:
+			async with AsyncSessionLocal() as session:
+				created = await create_partitions(
+					session, settings.RENTAL_PARTITION_MONTHS_AHEAD
+				)
+				await session.commit()
+			if created:
+				logger.info('Created rental partitions %s', ', '.join(created))
+		except SQLAlchemyError:
+			logger.exception('Creating rental partitions failed')
+		await asyncio.sleep(settings.RENTAL_PARTITION_CHECK_INTERVAL)
+
+
+async def _archive_partitions(session: AsyncSession, cutoff: datetime) -> int:
+	"""
+	Copy and drop the partitions of months before `cutoff` with no rental
+	returned later or still out.
+	"""
+	archived = 0
+	columns = ', '.join(COLUMNS)
+	for name in await partitions(session):
+		month = partition_month(name)
+		if month is None or datetime.combine(next_month(month), time()) > cutoff:
+			continue
+
+		# Writes to the partition wait until it is gone
+		await session.execute(text(f'LOCK TABLE {name} IN SHARE MODE'))
+		still_open = await session.scalar(
+			text(
+				f'SELECT EXISTS (SELECT 1 FROM {name} '
+				'WHERE returned_at IS NULL OR returned_at >= :cutoff)'
+			),
+			{'cutoff': cutoff},
+		)
+		if still_open:
+			await session.commit()
+			continue
+
+		await session.execute(text(f'ALTER TABLE rental DETACH PARTITION {name}'))
+		result = await session.execute(
+			text(f'INSERT INTO rental_history ({columns}) SELECT {columns} FROM {name}')
+		)
+		await session.execute(
+			text(f'DELETE FROM rental_view WHERE id IN (SELECT id FROM {name})')
+		)
+		await session.execute(text(f'DROP TABLE {name}'))
+		await session.commit()
+		archived += result.rowcount
+
+	return archived
+
+
+async def archive(
+	session: AsyncSession, older_than: timedelta, batch_size: int = 10_000
+) -> int:
+	"""
+	Move the rentals returned before `older_than` ago to `rental_history`,
+	committing each partition or batch, and return how many were moved.
+	"""
+	cutoff = datetime.now() - older_than
+	archived = await _archive_partitions(session, cutoff)
+
+	rental_columns = [Rental.__table__.c[name] for name in COLUMNS]
+	while True:
+		ids = (
+			await session.scalars(
+				select(Rental.id)
+				# rental_date, never later than returned_at, limits the partitions read
+				.where(Rental.rental_date < cutoff, Rental.returned_at < cutoff)
+				.limit(batch_size)
+			)
+		).all()
+		if not ids:
+			break
+
+		await session.execute(
+			insert(RentalHistory).from_select(
+				COLUMNS, select(*rental_columns).where(Rental.id.in_(ids))
+			)
+		)
+		await session.execute(delete(RentalView).where(RentalView.id.in_(ids)))
+		await session.execute(delete(Rental).where(Rental.id.in_(ids)))
+		await session.commit()
+		archived += len(ids)
+
+	return archived
+
+
+async def _maintain(database_url: str, older_than: timedelta, batch_size: int) -> None:
+	engine = create_async_engine(database_url)
+	async with AsyncSession(engine) as session:
+		created = await create_partitions(
+			session, settings.RENTAL_PARTITION_MONTHS_AHEAD
+		)
+		await session.commit()
+		archived = await archive(session, older_than, batch_size)
+	await engine.dispose()
+	if created:
+		print(f'Created rental partitions {", ".join(created)}')
+	print(f'Archived {archived} rentals')
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(
+		description='Create upcoming rental partitions and archive old rentals.'
+	)
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	parser.add_argument(
+		'--older-than-days',
+		type=int,
+		default=settings.RENTAL_ARCHIVE_AFTER_DAYS,
+		help='defaults to RENTAL_ARCHIVE_AFTER_DAYS',
+	)
+	parser.add_argument('--batch-size', type=int, default=10_000)
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		args.database_url = settings.DATABASE_URL
+	asyncio.run(
+		_maintain(
+			args.database_url, timedelta(days=args.older_than_days), args.batch_size
+		)
+	)
+
+
+if __name__ == '__main__':
+	main()
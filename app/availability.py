@@ -0,0 +1,282 @@
+"""
+Live costume availability, streamed to clients as server-sent events.
+
+Triggers on `costumes` append every change of a costume's availability to
+`availability_events`, whoever made it: renting, returning or deleting a rental
+and updating the costume, in the same transaction. On PostgreSQL they also
+NOTIFY every worker, whose hub reads the new events and broadcasts them to its
+clients of `GET /costumes/availability/stream`; other backends poll for them
+every AVAILABILITY_POLL_INTERVAL seconds.
+
+Each event carries its id, so a client that reconnects with `Last-Event-ID`
+gets what it missed from the table, which keeps AVAILABILITY_EVENTS_KEEP_HOURS
+of history. If some of that history is gone, it gets a `reset` event and should
+reload the catalog.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime, timedelta
+
+from sqlalchemy import DDL, delete, event, func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import AsyncSessionLocal, async_engine
+from .models import AvailabilityEvent, table_registry
+from .settings import Settings
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'costume_availability'
+# How long a missing event id may be an uncommitted transaction rather than a
+# rolled back one; later events wait for it, so every client sees ids in order
+GAP_WAIT = 2.0
+FETCH_LIMIT = 1000
+LAGGED = object()
+
+POSTGRESQL_DDL = (
+	f"""
+	CREATE FUNCTION record_availability() RETURNS trigger AS $$
+	BEGIN
+		INSERT INTO availability_events (costume_id, availability, created_at)
+		VALUES (NEW.id, NEW.availability, LOCALTIMESTAMP);
+		PERFORM pg_notify('{CHANNEL}', '');
+		RETURN NULL;
+	END
+	$$ LANGUAGE plpgsql
+	""",
+	(
+		'CREATE TRIGGER record_availability AFTER UPDATE OF availability ON costumes '
+		'FOR EACH ROW WHEN (OLD.availability IS DISTINCT FROM NEW.availability) '
+		'EXECUTE FUNCTION record_availability()'
+	),
+)
+SQLITE_DDL = (
+	'CREATE TRIGGER record_availability AFTER UPDATE OF availability ON costumes '
+	'WHEN OLD.availability <> NEW.availability BEGIN '
+	'INSERT INTO availability_events (costume_id, availability, created_at) '
+	"VALUES (NEW.id, NEW.availability, datetime('now', 'localtime')); "
+	'END'
+)
+
+# After every table exists, as the triggers span two of them
+for statement in POSTGRESQL_DDL:
+	event.listen(
+		table_registry.metadata,
+		'after_create',
+		DDL(statement).execute_if(dialect='postgresql'),
+	)
+event.listen(
+	table_registry.metadata,
+	'after_create',
+	DDL(SQLITE_DDL).execute_if(dialect='sqlite'),
+)
+event.listen(
+	table_registry.metadata,
+	'before_drop',
+	DDL('DROP FUNCTION IF EXISTS record_availability() CASCADE').execute_if(
+		dialect='postgresql'
+	),
+)
+
+
+def as_event(row: AvailabilityEvent) -> dict:
+	return {
+		'id': row.id,
+		'costume_id': row.costume_id,
+		'availability': row.availability.value,
+	}
+
+
+def format_event(data: dict) -> str:
+	body = json.dumps({key: value for key, value in data.items() if key != 'id'})
+
+	return f'id: {data["id"]}\nevent: availability\ndata: {body}\n\n'
+
+
+class AvailabilityHub:
+	"""Reads new availability events once per worker and fans them out."""
+
+	def __init__(
+		self,
+		enabled: bool,
+		poll_interval: float,
+		session_factory=AsyncSessionLocal,
+		notify: bool | None = None,
+	):
+		self.enabled = enabled
+		self.poll_interval = poll_interval
+		self.session_factory = session_factory
+		if notify is None:
+			notify = async_engine.dialect.driver == 'asyncpg'
+		self.notify = notify
+
+		self.subscribers: set[asyncio.Queue] = set()
+		# The id of the last event broadcast; None until the hub has started
+		self.last_id: int | None = None
+		self.gap_seen: dict[int, float] = {}
+		self.purged_at = 0.0
+
+	def subscribe(self) -> asyncio.Queue:
+		queue = asyncio.Queue(settings.AVAILABILITY_QUEUE_SIZE)
+		self.subscribers.add(queue)
+
+		return queue
+
+	def unsubscribe(self, queue: asyncio.Queue) -> None:
+		self.subscribers.discard(queue)
+
+	def broadcast(self, events: list[dict]) -> None:
+		for queue in self.subscribers:
+			try:
+				queue.put_nowait(events)
+			except asyncio.QueueFull:
+				# Too slow to keep up: it catches up from the table instead
+				while not queue.empty():
+					queue.get_nowait()
+				queue.put_nowait(LAGGED)
+
+	async def read(self, after: int, until: int | None = None) -> list[dict]:
+		query = (
+			select(AvailabilityEvent)
+			.where(AvailabilityEvent.id > after)
+			.order_by(AvailabilityEvent.id)
+			.limit(FETCH_LIMIT)
+		)
+		if until is not None:
+			query = query.where(AvailabilityEvent.id <= until)
+		async with self.session_factory() as session:
+			return [as_event(row) for row in await session.scalars(query)]
+
+	async def start(self) -> None:
+		if self.last_id is not None:
+			return
+		async with self.session_factory() as session:
+			self.last_id = await session.scalar(
+				select(func.coalesce(func.max(AvailabilityEvent.id), 0))
+			)
+
+	async def fetch(self) -> None:
+		"""Broadcast the events after `last_id`, in id order."""
+		while True:
+			events = await self.read(self.last_id)
+			ready = []
+			for data in events:
+				missing = self.last_id + 1
+				if data['id'] != missing:
+					# An event before it may still be committed
+					seen = self.gap_seen.setdefault(missing, time.monotonic())
+					if time.monotonic() - seen < GAP_WAIT:
+						break
+					self.gap_seen.pop(missing)
+				ready.append(data)
+				self.last_id = data['id']
+			if ready:
+				self.broadcast(ready)
+			if len(events) < FETCH_LIMIT or len(ready) < len(events):
+				return
+
+	async def purge(self) -> None:
+		"""Drop the events older than AVAILABILITY_EVENTS_KEEP_HOURS, hourly."""
+		if time.monotonic() - self.purged_at < 3600:
+			return
+		self.purged_at = time.monotonic()
+		before = datetime.now() - timedelta(
+			hours=settings.AVAILABILITY_EVENTS_KEEP_HOURS
+		)
+		async with self.session_factory() as session:
+			await session.execute(
+				delete(AvailabilityEvent).where(AvailabilityEvent.created_at < before)
+			)
+			await session.commit()
+
+	async def poll(self) -> None:
+		while True:
+			try:
+				await self.fetch()
+				await self.purge()
+			except (OSError, SQLAlchemyError):
+				logger.exception('Reading availability events failed')
+			await asyncio.sleep(self.poll_interval)
+
+	async def _listen_once(self) -> None:
+		async with async_engine.connect() as conn:
+			raw = await conn.get_raw_connection()
+			received = asyncio.Event()
+			await raw.driver_connection.add_listener(
+				CHANNEL, lambda *args: received.set()
+			)
+			while True:
+				# Also on a timeout, for events held back by a gap
+				try:
+					await asyncio.wait_for(received.wait(), self.poll_interval)
+				except TimeoutError:
+					pass
+				received.clear()
+				await self.fetch()
+				await self.purge()
+
+	async def listen(self) -> None:
+		while True:
+			try:
+				await self._listen_once()
+			except Exception:  # asyncpg errors are not wrapped here
+				logger.exception('Availability listener failed')
+			await asyncio.sleep(self.poll_interval)
+
+	async def run(self) -> None:
+		await self.start()
+		await (self.listen() if self.notify else self.poll())
+
+	async def stream(
+		self,
+		last_event_id: int | None,
+		disconnected: Callable[[], Awaitable[bool]],
+	) -> AsyncIterator[str]:
+		"""
+		Server-sent events for one client, from after `last_event_id` when it
+		resumes, until `disconnected` says it has gone.
+		"""
+		await self.start()
+		queue = self.subscribe()
+		try:
+			yield f'retry: {int(self.poll_interval * 1000)}\n\n'
+			last = self.last_id
+			if last_event_id is not None and last_event_id < last:
+				first = await self.read(last_event_id, last)
+				# Purged, or never there: the client can't tell what changed
+				if not first or first[0]['id'] != last_event_id + 1:
+					yield f'id: {last}\nevent: reset\ndata: {{}}\n\n'
+				else:
+					backlog = first
+					while backlog:
+						for data in backlog:
+							yield format_event(data)
+						after = backlog[-1]['id']
+						backlog = await self.read(after, last) if after < last else []
+
+			while not await disconnected():
+				try:
+					events = await asyncio.wait_for(
+						queue.get(), settings.AVAILABILITY_KEEPALIVE
+					)
+				except TimeoutError:
+					yield ': keepalive\n\n'
+					continue
+				if events is LAGGED:
+					events = await self.read(last, self.last_id)
+				for data in events:
+					if data['id'] > last:
+						yield format_event(data)
+						last = data['id']
+		finally:
+			self.unsubscribe(queue)
+
+
+availability_hub = AvailabilityHub(
+	settings.AVAILABILITY_STREAM_ENABLED, settings.AVAILABILITY_POLL_INTERVAL
+)
@@ -0,0 +1,44 @@
+"""
+Registry of the long-running tasks started with the app.
+
+Tasks are started from the lifespan in `app.main` and cancelled on shutdown;
+readiness reports whether each of them is still alive.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+tasks: dict[str, asyncio.Task] = {}
+
+
+def start(name: str, run: Callable[[], Awaitable[None]]) -> asyncio.Task:
+	task = asyncio.create_task(run(), name=name)
+	tasks[name] = task
+
+	return task
+
+
+def status() -> dict[str, str]:
+	states = {}
+	for name, task in tasks.items():
+		if not task.done():
+			states[name] = 'running'
+		elif task.cancelled():
+			states[name] = 'cancelled'
+		else:
+			states[name] = 'failed' if task.exception() else 'stopped'
+
+	return states
+
+
+async def stop_all() -> None:
+	for task in tasks.values():
+		task.cancel()
+	results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+	for name, result in zip(tasks, results):
+		if isinstance(result, Exception):
+			logger.error('Background task %s failed', name, exc_info=result)
+	tasks.clear()
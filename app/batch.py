@@ -0,0 +1,42 @@
+"""
+Lookup of many rows by id in one query, for `GET /<resource>/batch?ids=`.
+
+Rows come back in the order their ids were asked for, each once, and the ids
+that matched nothing are reported in `missing`.
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_IDS = 100
+
+
+def requested_ids(ids: str) -> list[int]:
+	"""Parse comma-separated `ids`, dropping repeats but keeping their order."""
+	try:
+		parsed = [int(value) for value in ids.split(',') if value.strip()]
+	except ValueError:
+		raise HTTPException(400, detail='Ids must be integers.')
+
+	parsed = list(dict.fromkeys(parsed))
+	if not parsed:
+		raise HTTPException(400, detail='No ids given.')
+	if len(parsed) > MAX_IDS:
+		raise HTTPException(400, detail=f'At most {MAX_IDS} ids at a time.')
+
+	return parsed
+
+
+async def fetch_by_ids(
+	session: AsyncSession, model, ids: list[int], options=()
+) -> tuple[list, list[int]]:
+	"""The rows of `model` with `ids`, in that order, and the ids not found."""
+	rows = await session.scalars(
+		select(model).options(*options).where(model.id.in_(ids))
+	)
+	by_id = {row.id: row for row in rows}
+	found = [by_id[row_id] for row_id in ids if row_id in by_id]
+	missing = [row_id for row_id in ids if row_id not in by_id]
+
+	return found, missing
@@ -0,0 +1,170 @@
+"""
+In-process cache of the costume catalog, kept coherent across workers.
+
+Every write that touches a costume calls `invalidate` inside its transaction.
+With asyncpg that sends a PostgreSQL NOTIFY, delivered to every worker when
+the transaction commits, and each worker drops the costume from its cache.
+Other backends bump a row of `cache_versions` instead, which every worker
+polls each CACHE_POLL_INTERVAL seconds, flushing its cache when it changed.
+
+The cache only answers while its worker is receiving invalidations: if the
+listening connection drops or polling fails, reads go to the database until
+it is back.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal, async_engine
+from .models import CacheVersion, Costume, CostumeAvailability
+from .schemas import CostumeOutput
+from .settings import Settings
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'costume_cache'
+LOST = object()
+
+
+def _to_dict(costume: Costume) -> dict:
+	return CostumeOutput.model_validate(costume, from_attributes=True).model_dump()
+
+
+class CostumeCache:
+	def __init__(
+		self,
+		enabled: bool,
+		poll_interval: float,
+		session_factory=AsyncSessionLocal,
+		notify: bool | None = None,
+	):
+		self.enabled = enabled
+		self.poll_interval = poll_interval
+		self.session_factory = session_factory
+		if notify is None:
+			notify = async_engine.dialect.driver == 'asyncpg'
+		self.notify = notify
+
+		self.by_id: dict[int, dict] = {}
+		self.by_availability: dict[CostumeAvailability | None, list[dict]] = {}
+		# Bumped on every invalidation, so a load that raced with one is not kept
+		self.generation = 0
+		self.active = False
+		self.version = None
+
+	def clear(self) -> None:
+		self.by_id.clear()
+		self.by_availability.clear()
+		self.generation += 1
+
+	def discard(self, costume_id: int) -> None:
+		self.by_id.pop(costume_id, None)
+		self.by_availability.clear()
+		self.generation += 1
+
+	async def get(self, session: AsyncSession, costume_id: int) -> dict | None:
+		if costume_id in self.by_id:
+			return self.by_id[costume_id]
+
+		generation = self.generation
+		costume = await session.scalar(select(Costume).where(Costume.id == costume_id))
+		if costume is None:
+			return None
+		data = _to_dict(costume)
+		if generation == self.generation:
+			self.by_id[costume_id] = data
+
+		return data
+
+	async def list(
+		self, session: AsyncSession, availability: CostumeAvailability | None
+	) -> list[dict]:
+		if availability in self.by_availability:
+			return self.by_availability[availability]
+
+		generation = self.generation
+		query = select(Costume).order_by(Costume.id)
+		if availability:
+			query = query.where(Costume.availability == availability)
+		costumes = [_to_dict(costume) for costume in await session.scalars(query)]
+		if generation == self.generation:
+			self.by_availability[availability] = costumes
+
+		return costumes
+
+	async def invalidate(self, session: AsyncSession, costume_id: int) -> None:
+		"""Tell every worker, once `session` commits, that the costume changed."""
+		self.discard(costume_id)
+		if not self.enabled:
+			return
+
+		if self.notify:
+			await session.execute(select(func.pg_notify(CHANNEL, str(costume_id))))
+			return
+
+		bumped = await session.execute(
+			update(CacheVersion)
+			.where(CacheVersion.name == CHANNEL)
+			.values(version=CacheVersion.version + 1)
+		)
+		if bumped.rowcount == 0:
+			session.add(CacheVersion(name=CHANNEL, version=1))
+			await session.flush()
+
+	async def poll_once(self) -> None:
+		async with self.session_factory() as session:
+			version = await session.scalar(
+				select(CacheVersion.version).where(CacheVersion.name == CHANNEL)
+			)
+		if not self.active or version != self.version:
+			self.clear()
+		self.version = version
+		self.active = True
+
+	async def poll(self) -> None:
+		while True:
+			try:
+				await self.poll_once()
+			except (OSError, SQLAlchemyError):
+				if self.active:
+					logger.exception('Costume cache polling failed, bypassing it')
+				self.active = False
+			await asyncio.sleep(self.poll_interval)
+
+	async def _listen_once(self) -> None:
+		async with async_engine.connect() as conn:
+			raw = await conn.get_raw_connection()
+			driver = raw.driver_connection
+			received = asyncio.Queue()
+			await driver.add_listener(
+				CHANNEL, lambda *args: received.put_nowait(args[-1])
+			)
+			driver.add_termination_listener(lambda *args: received.put_nowait(LOST))
+			# Anything may have changed while nobody was listening
+			self.clear()
+			self.active = True
+			while (payload := await received.get()) is not LOST:
+				self.discard(int(payload))
+
+	async def listen(self) -> None:
+		while True:
+			try:
+				await self._listen_once()
+			except Exception:  # asyncpg errors are not wrapped here
+				logger.exception('Costume cache listener failed, bypassing it')
+			finally:
+				self.active = False
+			await asyncio.sleep(self.poll_interval)
+
+	async def run(self) -> None:
+		await (self.listen() if self.notify else self.poll())
+
+
+costume_cache = CostumeCache(
+	settings.COSTUME_CACHE_ENABLED, settings.CACHE_POLL_INTERVAL
+)
@@ -0,0 +1,161 @@
+"""
+Filtering and sorting of the costume catalog (`GET /costumes/`).
+
+Every combination of filters and sort order is served by an index on
+`costumes`, ending in `id` so that ties keep a stable order: the costumes of a
+page, and the cursor to the next one, come from a single index range scan.
+
+	python -m app.catalog --runs 20
+
+benchmarks each combination against DATABASE_URL, e.g. after
+`python -m app.seed --costumes 1000000`, printing its timings and plan.
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import Sequence
+from typing import Literal
+
+from fastapi import HTTPException
+from sqlalchemy import Select, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from .models import Costume, CostumeAvailability
+from .pagination import decode_cursor, encode_cursor
+
+CostumeSort = Literal['id', '-id', 'fee', '-fee', 'name', '-name']
+
+SORT_COLUMNS = {'id': Costume.id, 'fee': Costume.fee, 'name': Costume.name}
+CURSOR_TYPES = {'id': int, 'fee': (int, float), 'name': str}
+
+
+def catalog_query(
+	availability: CostumeAvailability | None = None,
+	min_fee: float | None = None,
+	max_fee: float | None = None,
+	sort: CostumeSort = 'id',
+	cursor: str | None = None,
+) -> Select:
+	"""Costumes with `min_fee <= fee <= max_fee`, after `cursor` in `sort` order."""
+	field = sort.removeprefix('-')
+	column = SORT_COLUMNS[field]
+	descending = sort.startswith('-')
+
+	query = select(Costume)
+	if availability:
+		query = query.where(Costume.availability == availability)
+	if min_fee is not None:
+		query = query.where(Costume.fee >= min_fee)
+	if max_fee is not None:
+		query = query.where(Costume.fee <= max_fee)
+
+	key = (column,) if column is Costume.id else (column, Costume.id)
+	if cursor:
+		after = tuple_(*cursor_values(cursor, sort))
+		# Compared as a row, so the database scans the index from the cursor on
+		query = query.where(
+			tuple_(*key) < after if descending else tuple_(*key) > after
+		)
+
+	return query.order_by(*(column.desc() if descending else column for column in key))
+
+
+def next_cursor(costume, sort: CostumeSort) -> str:
+	"""Cursor to the costumes after `costume`, an ORM object or a dict."""
+	values = costume if isinstance(costume, dict) else vars(costume)
+	field = sort.removeprefix('-')
+	if field == 'id':
+		return encode_cursor(sort, values['id'])
+
+	return encode_cursor(sort, values[field], values['id'])
+
+
+def cursor_values(cursor: str, sort: CostumeSort) -> list:
+	field = sort.removeprefix('-')
+	types = (CURSOR_TYPES[field],) if field == 'id' else (CURSOR_TYPES[field], int)
+	cursor_sort, *values = decode_cursor(cursor, str, *types)
+	# A cursor only continues the order it was made for
+	if cursor_sort != sort:
+		raise HTTPException(400, detail='Invalid cursor.')
+
+	return values
+
+
+# Benchmark: each filter and sort of the catalog, as the route runs them
+BENCHMARKS = {
+	'all by id': {},
+	'all by fee': {'sort': 'fee'},
+	'all by name, descending': {'sort': '-name'},
+	'available by id': {'availability': CostumeAvailability.AVAILABLE},
+	'available by fee': {'availability': CostumeAvailability.AVAILABLE, 'sort': 'fee'},
+	'available by name': {
+		'availability': CostumeAvailability.AVAILABLE,
+		'sort': 'name',
+	},
+	'fee range by fee': {'min_fee': 100, 'max_fee': 200, 'sort': 'fee'},
+	'fee range by id': {'min_fee': 100, 'max_fee': 200},
+	'available fee range by fee, descending': {
+		'availability': CostumeAvailability.AVAILABLE,
+		'min_fee': 100,
+		'max_fee': 200,
+		'sort': '-fee',
+	},
+}
+EXPLAIN = {
+	'postgresql': 'EXPLAIN (ANALYZE, BUFFERS) ',
+	'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+
+async def explain(session: AsyncSession, query: Select) -> list[str]:
+	dialect = session.bind.dialect
+	compiled = query.compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+	rows = await session.execute(text(EXPLAIN[dialect.name] + str(compiled)))
+
+	return [str(row[-1]) for row in rows]
+
+
+async def benchmark(database_url: str, limit: int, runs: int) -> None:
+	engine = create_async_engine(database_url)
+	async with AsyncSession(engine) as session:
+		for name, params in BENCHMARKS.items():
+			first_page = catalog_query(**params).limit(limit)
+			last = (await session.scalars(first_page)).all()[-1]
+			second_page = catalog_query(
+				**params, cursor=next_cursor(last, params.get('sort', 'id'))
+			).limit(limit)
+
+			timings = []
+			for _ in range(runs):
+				start = time.perf_counter()
+				(await session.scalars(second_page)).all()
+				timings.append((time.perf_counter() - start) * 1000)
+			timings.sort()
+			print(
+				f'{name}: median {timings[len(timings) // 2]:.2f} ms, '
+				f'max {timings[-1]:.2f} ms'
+			)
+			for line in await explain(session, second_page):
+				print(f'    {line}')
+	await engine.dispose()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(
+		description='Time the second page of every costume catalog query.'
+	)
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	parser.add_argument('--limit', type=int, default=50)
+	parser.add_argument('--runs', type=int, default=20)
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		from .settings import Settings
+
+		args.database_url = Settings().DATABASE_URL
+	asyncio.run(benchmark(args.database_url, args.limit, args.runs))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,145 @@
+"""
+Total counts for paginated lists, cheap enough to send with every page.
+
+Lists called with `?total=true` report the number of matching rows in the
+`X-Total-Count` header and whether it is exact in `X-Total-Count-Exact`.
+Costumes are counted by availability in `costume_counts`, kept up to date by
+triggers on `costumes` (so bulk loads that bypass the ORM are counted too),
+which makes their totals exact and free. Other tables are counted exactly
+while small; past COUNT_EXACT_THRESHOLD rows the planner's estimate
+(`pg_class.reltuples`) is reported instead, or the highest id on SQLite.
+"""
+
+from sqlalchemy import DDL, Select, event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import dialect_name
+from .models import CostumeAvailability, CostumeCount, table_registry
+from .settings import Settings
+
+settings = Settings()
+
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+TOTAL_COUNT_EXACT_HEADER = 'X-Total-Count-Exact'
+
+POSTGRESQL_DDL = (
+	"""
+	CREATE FUNCTION count_costumes() RETURNS trigger AS $$
+	BEGIN
+		IF TG_OP = 'UPDATE' AND OLD.availability = NEW.availability THEN
+			RETURN NULL;
+		END IF;
+		IF TG_OP IN ('DELETE', 'UPDATE') THEN
+			UPDATE costume_counts SET count = count - 1
+			WHERE availability = OLD.availability;
+		END IF;
+		IF TG_OP IN ('INSERT', 'UPDATE') THEN
+			INSERT INTO costume_counts (availability, count)
+			VALUES (NEW.availability, 1)
+			ON CONFLICT (availability) DO UPDATE SET count = costume_counts.count + 1;
+		END IF;
+		RETURN NULL;
+	END
+	$$ LANGUAGE plpgsql
+	""",
+	(
+		'CREATE TRIGGER count_costumes AFTER INSERT OR DELETE OR UPDATE OF availability '
+		'ON costumes FOR EACH ROW EXECUTE FUNCTION count_costumes()'
+	),
+)
+SQLITE_COUNT_NEW = (
+	'INSERT INTO costume_counts (availability, count) VALUES (NEW.availability, 1) '
+	'ON CONFLICT (availability) DO UPDATE SET count = count + 1;'
+)
+SQLITE_UNCOUNT_OLD = (
+	'UPDATE costume_counts SET count = count - 1 WHERE availability = OLD.availability;'
+)
+SQLITE_DDL = (
+	(
+		'CREATE TRIGGER count_costumes_insert AFTER INSERT ON costumes '
+		f'BEGIN {SQLITE_COUNT_NEW} END'
+	),
+	(
+		'CREATE TRIGGER count_costumes_delete AFTER DELETE ON costumes '
+		f'BEGIN {SQLITE_UNCOUNT_OLD} END'
+	),
+	(
+		'CREATE TRIGGER count_costumes_update AFTER UPDATE OF availability ON costumes '
+		'WHEN OLD.availability <> NEW.availability '
+		f'BEGIN {SQLITE_UNCOUNT_OLD} {SQLITE_COUNT_NEW} END'
+	),
+)
+
+# After every table exists, as the triggers span two of them
+for statement in POSTGRESQL_DDL:
+	event.listen(
+		table_registry.metadata,
+		'after_create',
+		DDL(statement).execute_if(dialect='postgresql'),
+	)
+for statement in SQLITE_DDL:
+	event.listen(
+		table_registry.metadata,
+		'after_create',
+		DDL(statement).execute_if(dialect='sqlite'),
+	)
+event.listen(
+	table_registry.metadata,
+	'before_drop',
+	DDL('DROP FUNCTION IF EXISTS count_costumes() CASCADE').execute_if(
+		dialect='postgresql'
+	),
+)
+
+
+def total_headers(count: int, exact: bool) -> dict[str, str]:
+	return {
+		TOTAL_COUNT_HEADER: str(count),
+		TOTAL_COUNT_EXACT_HEADER: 'true' if exact else 'false',
+	}
+
+
+async def costume_count(
+	session: AsyncSession, availability: CostumeAvailability | None = None
+) -> int:
+	query = select(func.coalesce(func.sum(CostumeCount.count), 0))
+	if availability:
+		query = query.where(CostumeCount.availability == availability)
+
+	return await session.scalar(query)
+
+
+async def costume_total(
+	session: AsyncSession, availability: CostumeAvailability | None = None
+) -> dict[str, str]:
+	return total_headers(await costume_count(session, availability), exact=True)
+
+
+async def estimated_total(session: AsyncSession, model) -> dict[str, str]:
+	"""Exact below COUNT_EXACT_THRESHOLD rows, estimated above."""
+	table = model.__tablename__
+	if dialect_name(session) == 'postgresql':
+		estimate = await session.scalar(
+			text('SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)'),
+			{'table': table},
+		)
+	else:
+		# Ids start at 1, so the highest one bounds the row count
+		estimate = await session.scalar(select(func.max(model.id)))
+
+	# reltuples is -1 until the table is first analyzed
+	if estimate is not None and estimate >= settings.COUNT_EXACT_THRESHOLD:
+		return total_headers(int(estimate), exact=False)
+
+	count = await session.scalar(select(func.count()).select_from(model))
+
+	return total_headers(count, exact=True)
+
+
+async def exact_total(session: AsyncSession, query: Select) -> dict[str, str]:
+	"""Counts the rows of `query`, for filters no counter covers."""
+	count = await session.scalar(
+		select(func.count()).select_from(query.order_by(None).subquery())
+	)
+
+	return total_headers(count, exact=True)
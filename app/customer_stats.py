@@ -0,0 +1,161 @@
+"""
+Rental activity of every customer, so the customer screen never aggregates
+over `rental`.
+
+`customer_stats` holds each customer's lifetime rentals and spend, how many
+rentals are still open and when the last one started. The rental routes keep
+it in the same transaction as their write. Returning a rental closes it;
+deleting an open one closes it too, but it stays in the lifetime figures. Drift,
+e.g. after rentals were loaded around the API, is repaired by rebuilding the
+table from `rental` and `rental_history`, its archived rentals, which only
+know the rentals still on record:
+
+	python -m app.customer_stats
+"""
+
+import argparse
+import asyncio
+from collections.abc import Sequence
+
+from sqlalchemy import (
+	case,
+	delete,
+	func,
+	insert,
+	literal,
+	select,
+	text,
+	union_all,
+	update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from .database import dialect_name
+from .models import Costume, CustomerStats, Rental, RentalHistory
+from .rollups import UPSERTS
+
+
+async def record_rental(session: AsyncSession, rental: Rental) -> None:
+	"""Count a new rental of its customer, charged `rental.fee`."""
+	upsert = UPSERTS[dialect_name(session)](CustomerStats).values(
+		customer_id=rental.customer_id,
+		rentals=1,
+		open_rentals=1,
+		last_rental_date=rental.rental_date,
+		spend=rental.fee or 0.0,
+	)
+	columns = CustomerStats.__table__.c
+	excluded = upsert.excluded
+	await session.execute(
+		upsert.on_conflict_do_update(
+			index_elements=[columns.customer_id],
+			set_={
+				'rentals': columns.rentals + 1,
+				'open_rentals': columns.open_rentals + 1,
+				'last_rental_date': case(
+					(
+						excluded.last_rental_date > columns.last_rental_date,
+						excluded.last_rental_date,
+					),
+					else_=columns.last_rental_date,
+				),
+				'spend': columns.spend + excluded.spend,
+			},
+		)
+	)
+
+
+async def record_return(session: AsyncSession, customer_id: int) -> None:
+	"""Close one of the open rentals of a customer."""
+	await session.execute(
+		update(CustomerStats)
+		.where(CustomerStats.customer_id == customer_id)
+		.values(open_rentals=CustomerStats.open_rentals - 1)
+	)
+
+
+async def record_change(session: AsyncSession, rental: Rental) -> None:
+	"""Refresh the last rental date after `rental` was moved."""
+	await session.flush()
+	last = (
+		select(func.max(Rental.rental_date))
+		.where(Rental.customer_id == rental.customer_id)
+		.scalar_subquery()
+	)
+	await session.execute(
+		update(CustomerStats)
+		.where(CustomerStats.customer_id == rental.customer_id)
+		.values(last_rental_date=last)
+	)
+
+
+async def rebuild(session: AsyncSession) -> int:
+	"""
+	Recompute every customer's stats from `rental` and `rental_history`,
+	returning how many.
+	"""
+	if dialect_name(session) == 'postgresql':
+		# Rental writes and archiving wait, so none is counted twice or missed
+		await session.execute(text('LOCK TABLE rental, rental_history IN SHARE MODE'))
+	await session.execute(delete(CustomerStats))
+
+	# Archived rentals are all closed
+	every_rental = union_all(
+		select(
+			Rental.customer_id,
+			Rental.costume_id,
+			Rental.rental_date,
+			Rental.fee,
+			case((Rental.returned_at.is_(None), 1), else_=0).label('open'),
+		),
+		select(
+			RentalHistory.customer_id,
+			RentalHistory.costume_id,
+			RentalHistory.rental_date,
+			RentalHistory.fee,
+			literal(0).label('open'),
+		),
+	).subquery()
+	result = await session.execute(
+		insert(CustomerStats).from_select(
+			['customer_id', 'rentals', 'open_rentals', 'last_rental_date', 'spend'],
+			select(
+				every_rental.c.customer_id,
+				func.count(),
+				func.sum(every_rental.c.open),
+				func.max(every_rental.c.rental_date),
+				func.sum(func.coalesce(every_rental.c.fee, Costume.fee)),
+			)
+			.join(Costume, Costume.id == every_rental.c.costume_id)
+			.group_by(every_rental.c.customer_id),
+		)
+	)
+
+	return result.rowcount
+
+
+async def _rebuild(database_url: str) -> None:
+	engine = create_async_engine(database_url)
+	async with AsyncSession(engine) as session:
+		customers = await rebuild(session)
+		await session.commit()
+	await engine.dispose()
+	print(f'Rebuilt the stats of {customers} customers')
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(
+		description='Rebuild the customer stats from the rental history.'
+	)
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		from .settings import Settings
+
+		args.database_url = Settings().DATABASE_URL
+	asyncio.run(_rebuild(args.database_url))
+
+
+if __name__ == '__main__':
+	main()
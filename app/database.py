@@ -1,10 +1,15 @@
+import time
 from typing import AsyncGenerator
 
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from .admission import admission
+from .replicas import client_key, replicas
 from .settings import Settings
 
-DATABASE_URL = Settings().DATABASE_URL
+settings = Settings()
+DATABASE_URL = settings.DATABASE_URL
 
 async_engine = create_async_engine(DATABASE_URL, echo=True)
 AsyncSessionLocal = async_sessionmaker(
@@ -14,6 +19,11 @@ AsyncSessionLocal = async_sessionmaker(
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
 	async with AsyncSessionLocal() as session:
+		if settings.ADMISSION_ENABLED:
+			# Connect up front to measure how long the pool made us wait
+			started = time.perf_counter()
+			await session.connection()
+			admission.observe_checkout_wait(time.perf_counter() - started)
 		try:
 			yield session
 			await session.commit()  # Commit changes if the request is successful
@@ -22,3 +32,35 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 			raise
 		finally:
 			await session.close()  # Ensure the session is closed
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+	"""Session for a route that only reads, on a replica when one can serve it."""
+	replica = None if replicas.pinned(client_key(request.scope)) else replicas.pick()
+	session_factory = replica.sessionmaker if replica else AsyncSessionLocal
+
+	async with session_factory() as session:
+		yield session
+
+
+def dialect_name(session: AsyncSession) -> str:
+	return session.bind.dialect.name
+
+
+def pool_status(pool=None) -> dict:
+	"""Connection counts of a queue pool; other pool classes report none."""
+	pool = pool or async_engine.pool
+	if not hasattr(pool, 'checkedout'):
+		return {'pool': type(pool).__name__, 'saturated': False}
+
+	max_overflow = pool._max_overflow  # -1 means unbounded
+	checked_out = pool.checkedout()
+
+	return {
+		'pool': type(pool).__name__,
+		'size': pool.size(),
+		'checked_out': checked_out,
+		'idle': pool.checkedin(),
+		'overflow': max(pool.overflow(), 0),
+		'saturated': max_overflow >= 0 and checked_out >= pool.size() + max_overflow,
+	}
@@ -0,0 +1,116 @@
+"""
+Sparse field selection with `?fields=`.
+
+`?fields=id,name` narrows a response to those fields of the route's output
+schema and loads only their columns. Nested objects take dotted paths, e.g.
+`?fields=rental_date,costume.name` on rentals; naming a nested object alone
+returns all of it.
+"""
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy.orm import joinedload, load_only
+
+from .tracing import TracedJSONResponse
+
+# Requested fields: {field: None for all of it, or the set of nested fields}
+Fields = dict[str, set[str] | None]
+
+
+def _nested_schema(schema: type[BaseModel], field: str) -> type[BaseModel] | None:
+	annotation = schema.model_fields[field].annotation
+	if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+		return annotation
+
+	return None
+
+
+def requested_fields(fields: str | None, schema: type[BaseModel]) -> Fields | None:
+	"""Parse and check `fields` against `schema`; None when not given."""
+	if not fields:
+		return None
+
+	selected: Fields = {}
+	unknown = []
+	for path in filter(None, (path.strip() for path in fields.split(','))):
+		field, _, nested = path.partition('.')
+		nested_schema = (
+			_nested_schema(schema, field) if field in schema.model_fields else None
+		)
+		if field not in schema.model_fields or (
+			nested
+			and (nested_schema is None or nested not in nested_schema.model_fields)
+		):
+			unknown.append(path)
+		elif not nested or field in selected and selected[field] is None:
+			selected[field] = None
+		else:
+			selected.setdefault(field, set()).add(nested)
+
+	if unknown:
+		raise HTTPException(400, detail=f'Unknown fields: {", ".join(unknown)}.')
+	if not selected:
+		raise HTTPException(400, detail='No fields selected.')
+
+	# Keep the order of the schema, not of the query string
+	return {
+		field: selected[field] for field in schema.model_fields if field in selected
+	}
+
+
+def load_options(model, selected: Fields, relationships: dict | None = None) -> list:
+	"""
+	Loader options fetching only the selected columns of `model` and, joined,
+	of the related objects in `relationships` ({schema field: relationship}).
+	"""
+	relationships = relationships or {}
+	# Only the primary key when nothing but related objects were selected
+	columns = [
+		getattr(model, field) for field in selected if field not in relationships
+	] or [model.id]
+	options = [load_only(*columns)]
+
+	for field, relationship in relationships.items():
+		if field not in selected:
+			continue
+		option = joinedload(relationship)
+		if selected[field] is not None:
+			related = relationship.property.mapper.class_
+			option = option.load_only(
+				*(getattr(related, nested) for nested in selected[field])
+			)
+		options.append(option)
+
+	return options
+
+
+def pick(
+	obj,
+	selected: Fields,
+	schema: type[BaseModel],
+	attributes: dict[str, str] | None = None,
+) -> dict:
+	"""
+	The selected fields of `obj`, an ORM object or a dict; `attributes` maps
+	schema fields to differently named attributes.
+	"""
+	attributes = attributes or {}
+	data = {}
+	for field, nested in selected.items():
+		name = attributes.get(field, field)
+		value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+		nested_schema = _nested_schema(schema, field)
+		if nested_schema is not None and value is not None:
+			value = pick(
+				value,
+				dict.fromkeys(nested or nested_schema.model_fields),
+				nested_schema,
+			)
+		data[field] = value
+
+	return data
+
+
+def sparse_response(content, headers=None) -> TracedJSONResponse:
+	return TracedJSONResponse(jsonable_encoder(content), headers=headers)
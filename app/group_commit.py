@@ -0,0 +1,249 @@
+"""
+Group commit of concurrent writes, so a burst of them shares one commit.
+
+A write submitted while others are waiting joins their batch; the batch runs
+RENTAL_GROUP_COMMIT_WINDOW seconds after its first write, or as soon as it
+holds RENTAL_GROUP_COMMIT_MAX of them, in one transaction with one commit
+(and one fsync) for all. Each caller still gets its own result or error:
+a write may reject its item with an HTTPException before writing anything,
+which leaves the rest of the batch alone. Any other error rolls the batch
+back and runs each of its writes again in a transaction of its own.
+
+`POST /rental` goes through it with RENTAL_GROUP_COMMIT_ENABLED. The gain
+against a commit per request is measured with
+
+	python -m app.group_commit --rentals 2000 --concurrency 64
+
+on a scratch database, a new SQLite file by default.
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import (
+	AsyncSession,
+	async_sessionmaker,
+	create_async_engine,
+)
+
+from . import metrics
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+Work = Callable[[AsyncSession, Any], Awaitable[Any]]
+
+
+class GroupCommit:
+	def __init__(
+		self,
+		name: str,
+		work: Work,
+		enabled: bool = True,
+		window: float = 0.005,
+		max_size: int = 64,
+		session_factory: async_sessionmaker = AsyncSessionLocal,
+	):
+		self.name = name
+		self.work = work
+		self.enabled = enabled
+		self.window = window
+		self.max_size = max_size
+		self.session_factory = session_factory
+
+		self.pending: list[tuple[Any, asyncio.Future]] = []
+		self.timer: asyncio.TimerHandle | None = None
+		self.running: set[asyncio.Task] = set()
+
+	async def submit(self, item: Any) -> Any:
+		"""Write `item` with the next batch, returning what the write returned."""
+		if not self.enabled:
+			return await self.run_alone(item)
+
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		self.pending.append((item, future))
+		if len(self.pending) >= self.max_size:
+			self.flush()
+		elif self.timer is None:
+			self.timer = loop.call_later(self.window, self.flush)
+
+		# A caller that goes away leaves its write in the batch
+		return await asyncio.shield(future)
+
+	def flush(self) -> None:
+		if self.timer is not None:
+			self.timer.cancel()
+			self.timer = None
+		batch, self.pending = self.pending, []
+		if batch:
+			task = asyncio.create_task(self.commit(batch))
+			self.running.add(task)
+			task.add_done_callback(self.running.discard)
+
+	async def run(self, items: list[Any]) -> list[tuple[Any, Exception | None]]:
+		"""Write `items` in one transaction, returning each result or rejection."""
+		outcomes = []
+		async with self.session_factory() as session:
+			for item in items:
+				try:
+					outcomes.append((await self.work(session, item), None))
+				except HTTPException as rejection:
+					outcomes.append((None, rejection))
+			await session.commit()
+
+		return outcomes
+
+	async def run_alone(self, item: Any) -> Any:
+		[(result, rejection)] = await self.run([item])
+		if rejection is not None:
+			raise rejection
+
+		return result
+
+	async def commit(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
+		metrics.increment(f'{self.name}.batches')
+		metrics.increment(f'{self.name}.items', len(batch))
+		try:
+			outcomes = await self.run([item for item, _ in batch])
+		except Exception:
+			logger.warning('Batch of %d writes failed, retrying each', len(batch))
+			metrics.increment(f'{self.name}.retried', len(batch))
+			for item, future in batch:
+				try:
+					outcome = (await self.run_alone(item), None)
+				except Exception as error:
+					outcome = (None, error)
+				settle(future, *outcome)
+		else:
+			for (_, future), outcome in zip(batch, outcomes):
+				settle(future, *outcome)
+
+
+def settle(future: asyncio.Future, result: Any, error: Exception | None) -> None:
+	if future.done():
+		return
+	if error is None:
+		future.set_result(result)
+	else:
+		future.set_exception(error)
+
+
+async def _seed(sessions: async_sessionmaker, costumes: int):
+	from .models import (
+		Costume,
+		CostumeAvailability,
+		Customer,
+		User,
+		table_registry,
+	)
+
+	async with sessions() as session:
+		await (await session.connection()).run_sync(table_registry.metadata.create_all)
+		user = User(
+			name='Benchmark',
+			email='benchmark@example.com',
+			password='-',
+			phone_number=None,
+			is_admin=False,
+		)
+		customer = Customer(
+			cpf='00000000000',
+			name='Benchmark',
+			email='benchmark@example.com',
+			phone_number='61900000000',
+			address='-',
+		)
+		new_costumes = [
+			Costume(
+				name=f'Benchmark {n}',
+				description='-',
+				fee=10.0,
+				availability=CostumeAvailability.AVAILABLE,
+			)
+			for n in range(costumes)
+		]
+		session.add_all([user, customer, *new_costumes])
+		await session.commit()
+
+	return user, customer.id, [costume.id for costume in new_costumes]
+
+
+async def benchmark(
+	database_url: str, rentals: int, concurrency: int, window: float, max_size: int
+) -> None:
+	from .routes.rental import rent_item
+	from .schemas import RentalInput
+
+	options = {}
+	if make_url(database_url).get_backend_name() == 'sqlite':
+		# One writer at a time, as SQLite allows, rather than failing on its lock
+		options = {'pool_size': 1, 'max_overflow': 0}
+	engine = create_async_engine(database_url, **options)
+	sessions = async_sessionmaker(engine, expire_on_commit=False)
+	user, customer_id, costume_ids = await _seed(sessions, 2 * rentals)
+	batches = {
+		'commit per request': GroupCommit(
+			'benchmark', rent_item, enabled=False, session_factory=sessions
+		),
+		'group commit': GroupCommit(
+			'benchmark', rent_item, True, window, max_size, session_factory=sessions
+		),
+	}
+	limit = asyncio.Semaphore(concurrency)
+
+	for (name, writes), first in zip(batches.items(), (0, rentals)):
+
+		async def rent(costume_id: int) -> None:
+			async with limit:
+				await writes.submit((
+					user,
+					RentalInput(costume_id=costume_id, customer_id=customer_id),
+				))
+
+		start = time.perf_counter()
+		await asyncio.gather(*map(rent, costume_ids[first : first + rentals]))
+		elapsed = time.perf_counter() - start
+		print(
+			f'{name}: {rentals / elapsed:.0f} rentals/s '
+			f'({elapsed * 1000 / rentals:.2f} ms each)'
+		)
+	await engine.dispose()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(
+		description='Compare rental throughput with and without group commit.'
+	)
+	parser.add_argument(
+		'--database-url', help='a scratch database; defaults to a new SQLite file'
+	)
+	parser.add_argument('--rentals', type=int, default=2000)
+	parser.add_argument('--concurrency', type=int, default=64)
+	parser.add_argument('--window', type=float, default=0.005, help='seconds')
+	parser.add_argument('--max-size', type=int, default=64)
+	args = parser.parse_args(argv)
+
+	with tempfile.TemporaryDirectory() as directory:
+		if args.database_url is None:
+			args.database_url = f'sqlite+aiosqlite:///{directory}/group_commit.db'
+		asyncio.run(
+			benchmark(
+				args.database_url,
+				args.rentals,
+				args.concurrency,
+				args.window,
+				args.max_size,
+			)
+		)
+
+
+if __name__ == '__main__':
+	main()
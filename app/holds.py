@@ -0,0 +1,122 @@
+"""
+Time-limited holds on costumes during checkout.
+
+`POST /holds` sets costumes aside for the current user until `held_until`,
+all of them or none. Checkout claims a costume with one conditional update
+that skips it while someone else holds it, so a held costume can't be rented
+from another terminal; renting it consumes the hold.
+
+A hold stops counting the moment it expires, whether or not it has been
+cleared. Each worker clears the holds it knows of on time with a heap of
+expiries: its task sleeps until the earliest one, or until an earlier hold
+is scheduled, instead of scanning the table. Holds that were extended,
+released or rented are skipped when their old expiry comes up, since clearing
+only touches a costume whose `held_until` is due.
+"""
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import metrics
+from .database import AsyncSessionLocal
+from .models import Costume
+
+logger = logging.getLogger(__name__)
+
+
+def free_for(user_id: int, now: datetime):
+	"""Whether a costume isn't held, or is held by `user_id`."""
+	return or_(
+		Costume.held_until.is_(None),
+		Costume.held_until <= now,
+		Costume.held_by == user_id,
+	)
+
+
+async def active_holds(session: AsyncSession) -> int:
+	return await session.scalar(
+		select(func.count())
+		.select_from(Costume)
+		.where(Costume.held_until > datetime.now())
+	)
+
+
+class HoldScheduler:
+	def __init__(self, session_factory=AsyncSessionLocal):
+		self.session_factory = session_factory
+		self.expiries: list[tuple[datetime, int]] = []
+		# Set when an earlier expiry is scheduled; made by run(), in its loop
+		self.wakeup: asyncio.Event | None = None
+
+	def schedule(self, costume_id: int, held_until: datetime) -> None:
+		heapq.heappush(self.expiries, (held_until, costume_id))
+		if self.wakeup and self.expiries[0] == (held_until, costume_id):
+			self.wakeup.set()
+		metrics.set_gauge('holds.scheduled', len(self.expiries))
+
+	async def load(self) -> None:
+		"""Schedule the holds already in the database, e.g. after a restart."""
+		async with self.session_factory() as session:
+			holds = await session.execute(
+				select(Costume.held_until, Costume.id).where(
+					Costume.held_until.is_not(None)
+				)
+			)
+			for held_until, costume_id in holds:
+				self.schedule(costume_id, held_until)
+
+	async def release_due(self) -> int:
+		"""Clear the holds that expired by now, returning how many were."""
+		now = datetime.now()
+		due = []
+		while self.expiries and self.expiries[0][0] <= now:
+			due.append(heapq.heappop(self.expiries)[1])
+		metrics.set_gauge('holds.scheduled', len(self.expiries))
+		if not due:
+			return 0
+
+		try:
+			async with self.session_factory() as session:
+				result = await session.execute(
+					update(Costume)
+					.where(Costume.id.in_(due), Costume.held_until <= now)
+					.values(held_by=None, held_until=None)
+				)
+				await session.commit()
+		except BaseException:
+			for costume_id in due:  # Try them again next time
+				heapq.heappush(self.expiries, (now, costume_id))
+			raise
+		metrics.increment('holds.expired', result.rowcount)
+
+		return result.rowcount
+
+	async def run(self) -> None:
+		self.wakeup = asyncio.Event()
+		try:
+			await self.load()
+		except (OSError, SQLAlchemyError):
+			logger.exception('Loading holds failed')
+		while True:
+			timeout = None  # Nothing scheduled: wait for a hold
+			if self.expiries:
+				timeout = max((self.expiries[0][0] - datetime.now()).total_seconds(), 0)
+			try:
+				await asyncio.wait_for(self.wakeup.wait(), timeout)
+			except TimeoutError:
+				pass
+			self.wakeup.clear()
+			try:
+				await self.release_due()
+			except (OSError, SQLAlchemyError):
+				logger.exception('Releasing expired holds failed')
+				await asyncio.sleep(1)
+
+
+hold_scheduler = HoldScheduler()
@@ -0,0 +1,150 @@
+"""
+Idempotency keys for the create routes, so a retried request runs once.
+
+A client sends the same `Idempotency-Key` header with every retry of one
+`POST /rental` or `POST /customers`. The first request to arrive inserts the
+key, with a fingerprint of its route and body, in the transaction that then
+creates the rental or customer and stores the response next to the key. A
+retry replays that response, marked `Idempotent-Replayed: true`, without
+running the route again. A duplicate sent while the first is still running
+blocks on the key's row until that transaction ends, then replays its
+response, or runs itself if the first one failed: only successful responses
+are stored, so a rejected request may be retried with the same key.
+
+Keys are scoped to the user and kept IDEMPOTENCY_KEY_TTL_HOURS; reusing one
+for a different request is refused with 422.
+"""
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Annotated
+
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal, dialect_name, get_session
+from .models import IdempotencyKey, User
+from .rollups import UPSERTS
+from .security import get_current_user
+from .settings import Settings
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+	digest = hashlib.sha256(f'{method} {path}\n'.encode())
+	digest.update(body)
+
+	return digest.hexdigest()
+
+
+@dataclass
+class Idempotency:
+	"""The key of a create request, or None when it was sent without one."""
+
+	key: IdempotencyKey | None = None
+	# The stored response, when the request already ran
+	replay: JSONResponse | None = None
+
+	async def save(
+		self, session: AsyncSession, status_code: int, response: BaseModel
+	) -> None:
+		"""Store the response to replay, to be committed with what it reports."""
+		if self.key is None:
+			return
+		self.key.status_code = status_code
+		self.key.response = response.model_dump(mode='json')
+		await session.flush()
+
+
+async def claim(
+	session: AsyncSession, user_id: int, key: str, request_fingerprint: str
+) -> Idempotency:
+	"""
+	Insert the key, waiting on a concurrent request holding it, or return the
+	response stored for it.
+	"""
+	now = datetime.now()
+	await session.execute(
+		delete(IdempotencyKey).where(
+			IdempotencyKey.user_id == user_id,
+			IdempotencyKey.key == key,
+			IdempotencyKey.expires_at < now,
+		)
+	)
+	await session.execute(
+		UPSERTS[dialect_name(session)](IdempotencyKey)
+		.values(
+			user_id=user_id,
+			key=key,
+			fingerprint=request_fingerprint,
+			expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+		)
+		.on_conflict_do_nothing()
+	)
+	stored = await session.scalar(
+		select(IdempotencyKey)
+		.where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+		.execution_options(populate_existing=True)
+	)
+
+	if stored.fingerprint != request_fingerprint:
+		raise HTTPException(
+			422, detail='Idempotency key already used for another request.'
+		)
+
+	if stored.status_code is None:
+		return Idempotency(stored)
+
+	return Idempotency(
+		replay=JSONResponse(
+			stored.response,
+			status_code=stored.status_code,
+			headers={REPLAYED_HEADER: 'true'},
+		)
+	)
+
+
+async def idempotency(
+	request: Request,
+	session: Annotated[AsyncSession, Depends(get_session)],
+	current_user: Annotated[User, Depends(get_current_user)],
+	idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> Idempotency:
+	if idempotency_key is None:
+		return Idempotency()
+
+	request_fingerprint = fingerprint(
+		request.method, request.url.path, await request.body()
+	)
+
+	return await claim(session, current_user.id, idempotency_key, request_fingerprint)
+
+
+Idempotent = Annotated[Idempotency, Depends(idempotency)]
+
+
+async def purge_expired() -> None:
+	"""Delete expired keys every IDEMPOTENCY_PURGE_INTERVAL seconds."""
+	while True:
+		await asyncio.sleep(settings.IDEMPOTENCY_PURGE_INTERVAL)
+		try:
+			async with AsyncSessionLocal() as session:
+				await session.execute(
+					delete(IdempotencyKey).where(
+						IdempotencyKey.expires_at < datetime.now()
+					)
+				)
+				await session.commit()
+		except SQLAlchemyError:
+			logger.exception('Purging idempotency keys failed')
@@ -1,15 +1,78 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from .routes import auth, costumes, customers, rental, users
+from . import archival, background, idempotency, outbox
+from .admission import AdmissionMiddleware
+from .availability import availability_hub
+from .cache import costume_cache
+from .database import async_engine
+from .holds import hold_scheduler
+from .profiling import ProfilingMiddleware
+from .replicas import ReplicaPinMiddleware, replicas
+from .routes import (
+	auth,
+	costumes,
+	customers,
+	health,
+	holds,
+	profiles,
+	rental,
+	reports,
+	users,
+)
 from .schemas import Message
+from .settings import Settings
+from .tracing import TracedJSONResponse, TracingMiddleware, instrument_engine
+
+settings = Settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	if replicas.replicas:
+		background.start('replica-monitor', replicas.monitor)
+	if costume_cache.enabled:
+		background.start('costume-cache', costume_cache.run)
+	if async_engine.dialect.name == 'postgresql':
+		background.start('rental-partitions', archival.maintain_partitions)
+	background.start('idempotency-keys', idempotency.purge_expired)
+	background.start('costume-holds', hold_scheduler.run)
+	if settings.OUTBOX_ENABLED:
+		background.start('outbox', outbox.Dispatcher(outbox.sink_from_settings()).run)
+	if availability_hub.enabled:
+		background.start('availability-hub', availability_hub.run)
+	yield
+	await background.stop_all()
+	await replicas.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=TracedJSONResponse)
+
+if settings.PROFILING_ENABLED:
+	app.add_middleware(ProfilingMiddleware)
+
+if settings.ADMISSION_ENABLED:
+	app.add_middleware(AdmissionMiddleware)
+
+if replicas.replicas:
+	app.add_middleware(ReplicaPinMiddleware)
 
-app = FastAPI()
+if settings.TRACING_ENABLED:
+	instrument_engine(async_engine)
+	for replica in replicas.replicas:
+		instrument_engine(replica.engine)
+	app.add_middleware(TracingMiddleware)
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(costumes.router)
 app.include_router(customers.router)
 app.include_router(rental.router)
+app.include_router(holds.router)
+app.include_router(reports.router)
+app.include_router(profiles.router)
+app.include_router(health.router)
 
 
 @app.get('/', response_model=Message, status_code=200)
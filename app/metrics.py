@@ -0,0 +1,19 @@
+"""
+Process-wide counters and gauges, reported by `GET /health/metrics`.
+
+Each worker counts on its own; sum counters across workers when scraping.
+Gauges hold the last value a worker measured.
+"""
+
+from collections import Counter
+
+counters: Counter[str] = Counter()
+gauges: dict[str, float] = {}
+
+
+def increment(name: str, amount: int = 1) -> None:
+	counters[name] += amount
+
+
+def set_gauge(name: str, value: float) -> None:
+	gauges[name] = value
@@ -1,8 +1,8 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from enum import Enum
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import JSON, ForeignKey, Index, String, text
 from sqlalchemy.orm import (
 	Mapped,
 	mapped_as_dataclass,
@@ -23,12 +23,29 @@ class CostumeAvailability(str, Enum):
 @mapped_as_dataclass(table_registry)
 class Costume:
 	__tablename__ = 'costumes'
+	# One per filter and sort order of GET /costumes/ (see app.catalog)
+	__table_args__ = (
+		Index('ix_costumes_fee', 'fee', 'id'),
+		Index('ix_costumes_name', 'name', 'id'),
+		Index('ix_costumes_availability_id', 'availability', 'id'),
+		Index('ix_costumes_availability_fee', 'availability', 'fee', 'id'),
+		Index('ix_costumes_availability_name', 'availability', 'name', 'id'),
+		Index(
+			'ix_costumes_held_until',
+			'held_until',
+			postgresql_where=text('held_until IS NOT NULL'),
+			sqlite_where=text('held_until IS NOT NULL'),
+		),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True, init=False)
 	name: Mapped[str]
 	description: Mapped[str]
 	fee: Mapped[float]
 	availability: Mapped[CostumeAvailability]
+	# Set aside for a user's checkout until then (see app.holds)
+	held_by: Mapped[Optional[int]] = mapped_column(default=None, init=False)
+	held_until: Mapped[Optional[datetime]] = mapped_column(default=None, init=False)
 
 	rental: Mapped[List['Rental']] = relationship(back_populates='costumes', init=False)
 
@@ -38,10 +55,10 @@ class Customer:
 	__tablename__ = 'customers'
 
 	id: Mapped[int] = mapped_column(primary_key=True, init=False)
-	cpf: Mapped[str] = mapped_column(String(11))
+	cpf: Mapped[str] = mapped_column(String(11), index=True)
 	name: Mapped[str]
 	email: Mapped[str]
-	phone_number: Mapped[str] = mapped_column(String(11))
+	phone_number: Mapped[str] = mapped_column(String(11), index=True)
 	address: Mapped[str]
 
 	rental: Mapped[List['Rental']] = relationship(
@@ -73,6 +90,45 @@ class Rental:
 	"""
 
 	__tablename__ = 'rental'
+	# Partitioned by month of rental_date on PostgreSQL (see app.archival).
+	# One index per filter of GET /rental, in the order it pages through the rows
+	__table_args__ = (
+		Index(
+			'ix_rental_customer_id_rental_date',
+			'customer_id',
+			text('rental_date DESC'),
+			text('id DESC'),
+		),
+		Index(
+			'ix_rental_user_id_rental_date',
+			'user_id',
+			text('rental_date DESC'),
+			text('id DESC'),
+		),
+		Index(
+			'ix_rental_costume_id_rental_date',
+			'costume_id',
+			text('rental_date DESC'),
+			text('id DESC'),
+		),
+		Index('ix_rental_rental_date', text('rental_date DESC'), text('id DESC')),
+		Index('ix_rental_return_date', 'return_date', 'id'),
+		# Only the open rentals, however many closed ones pile up beside them
+		Index(
+			'ix_rental_open_rental_date',
+			text('rental_date DESC'),
+			text('id DESC'),
+			postgresql_where=text('returned_at IS NULL'),
+			sqlite_where=text('returned_at IS NULL'),
+		),
+		Index(
+			'ix_rental_open_return_date',
+			'return_date',
+			'id',
+			postgresql_where=text('returned_at IS NULL'),
+			sqlite_where=text('returned_at IS NULL'),
+		),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True, init=False)
 	user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
@@ -87,3 +143,189 @@ class Rental:
 	return_date: Mapped[datetime] = mapped_column(
 		default=datetime.now() + timedelta(days=7)
 	)
+	# The costume fee when it was rented; empty for rentals loaded in bulk
+	fee: Mapped[Optional[float]] = mapped_column(default=None)
+	# Empty while the costume is out
+	returned_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+
+
+@mapped_as_dataclass(table_registry)
+class CacheVersion:
+	"""Bumped on writes so that workers polling it know their cache is stale."""
+
+	__tablename__ = 'cache_versions'
+
+	name: Mapped[str] = mapped_column(String(32), primary_key=True)
+	version: Mapped[int]
+
+
+@mapped_as_dataclass(table_registry)
+class CostumeCount:
+	"""Costumes per availability, maintained by triggers (see app.counts)."""
+
+	__tablename__ = 'costume_counts'
+
+	availability: Mapped[CostumeAvailability] = mapped_column(primary_key=True)
+	count: Mapped[int]
+
+
+@mapped_as_dataclass(table_registry)
+class CostumeRollup:
+	"""Rentals, revenue and time rented of a costume in a month (see app.rollups)."""
+
+	__tablename__ = 'costume_rollups'
+	__table_args__ = (Index('ix_costume_rollups_month', 'month', 'costume_id'),)
+
+	costume_id: Mapped[int] = mapped_column(
+		ForeignKey('costumes.id', ondelete='CASCADE'), primary_key=True
+	)
+	month: Mapped[date] = mapped_column(primary_key=True)  # Its first day
+	rentals: Mapped[int]
+	revenue: Mapped[float]
+	rented_seconds: Mapped[int]
+
+
+@mapped_as_dataclass(table_registry)
+class CustomerStats:
+	"""Rental activity of a customer (see app.customer_stats)."""
+
+	__tablename__ = 'customer_stats'
+	# One per sort order of GET /customers/top
+	__table_args__ = (
+		Index('ix_customer_stats_rentals', 'rentals', 'customer_id'),
+		Index('ix_customer_stats_open_rentals', 'open_rentals', 'customer_id'),
+		Index('ix_customer_stats_last_rental_date', 'last_rental_date', 'customer_id'),
+		Index('ix_customer_stats_spend', 'spend', 'customer_id'),
+	)
+
+	customer_id: Mapped[int] = mapped_column(
+		ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True
+	)
+	rentals: Mapped[int]
+	open_rentals: Mapped[int]
+	last_rental_date: Mapped[datetime]
+	spend: Mapped[float]
+
+
+@mapped_as_dataclass(table_registry)
+class RentalView:
+	"""
+	A rental with the names the rental board shows, so listing it needs no
+	joins (see app.rental_view).
+	"""
+
+	__tablename__ = 'rental_view'
+	# The indexes of `rental`, for the same filters of GET /rental
+	__table_args__ = (
+		Index(
+			'ix_rental_view_customer_id_rental_date',
+			'customer_id',
+			text('rental_date DESC'),
+			text('id DESC'),
+		),
+		Index(
+			'ix_rental_view_user_id_rental_date',
+			'user_id',
+			text('rental_date DESC'),
+			text('id DESC'),
+		),
+		Index(
+			'ix_rental_view_costume_id_rental_date',
+			'costume_id',
+			text('rental_date DESC'),
+			text('id DESC'),
+		),
+		Index('ix_rental_view_rental_date', text('rental_date DESC'), text('id DESC')),
+		Index('ix_rental_view_return_date', 'return_date', 'id'),
+	)
+
+	# The id of its rental. Not a foreign key: those can't point into the
+	# partitioned `rental` of PostgreSQL, whose rows are unique by (id, rental_date)
+	id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+	rental_date: Mapped[datetime]
+	return_date: Mapped[datetime]
+	costume_id: Mapped[int]
+	costume_name: Mapped[str]
+	customer_id: Mapped[int]
+	customer_name: Mapped[str]
+	user_id: Mapped[int]
+	user_name: Mapped[str]
+
+
+@mapped_as_dataclass(table_registry)
+class RentalHistory:
+	"""A closed rental moved out of `rental` by the archival job (see app.archival)."""
+
+	__tablename__ = 'rental_history'
+	__table_args__ = (
+		Index(
+			'ix_rental_history_customer_id_rental_date', 'customer_id', 'rental_date'
+		),
+		Index('ix_rental_history_costume_id_rental_date', 'costume_id', 'rental_date'),
+	)
+
+	# The columns of `rental`, in its order, so whole partitions copy over
+	id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+	user_id: Mapped[int]
+	customer_id: Mapped[int]
+	costume_id: Mapped[int]
+	rental_date: Mapped[datetime]
+	return_date: Mapped[datetime]
+	fee: Mapped[Optional[float]]
+	returned_at: Mapped[Optional[datetime]]
+
+
+@mapped_as_dataclass(table_registry)
+class OutboxEvent:
+	"""A rental event waiting for, or past, delivery downstream (see app.outbox)."""
+
+	__tablename__ = 'outbox_events'
+	# Only the undelivered events, in the order they are claimed
+	__table_args__ = (
+		Index(
+			'ix_outbox_events_pending',
+			'available_at',
+			'id',
+			postgresql_where=text('delivered_at IS NULL'),
+			sqlite_where=text('delivered_at IS NULL'),
+		),
+	)
+
+	id: Mapped[int] = mapped_column(primary_key=True, init=False)
+	topic: Mapped[str] = mapped_column(String(32))
+	payload: Mapped[dict] = mapped_column(JSON)
+	created_at: Mapped[datetime]
+	# When it may be claimed next: when it was written, then after each attempt
+	available_at: Mapped[datetime]
+	attempts: Mapped[int] = mapped_column(default=0)
+	delivered_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+	last_error: Mapped[Optional[str]] = mapped_column(default=None)
+
+
+@mapped_as_dataclass(table_registry)
+class AvailabilityEvent:
+	"""A costume's new availability, written by triggers (see app.availability)."""
+
+	__tablename__ = 'availability_events'
+	__table_args__ = (Index('ix_availability_events_created_at', 'created_at'),)
+
+	id: Mapped[int] = mapped_column(primary_key=True, init=False)
+	costume_id: Mapped[int]
+	availability: Mapped[CostumeAvailability]
+	created_at: Mapped[datetime]
+
+
+@mapped_as_dataclass(table_registry)
+class IdempotencyKey:
+	"""A create request by its key, with the response replayed for it."""
+
+	__tablename__ = 'idempotency_keys'
+	__table_args__ = (Index('ix_idempotency_keys_expires_at', 'expires_at'),)
+
+	user_id: Mapped[int] = mapped_column(primary_key=True)
+	key: Mapped[str] = mapped_column(String(255), primary_key=True)
+	# Of the route and body, so a key can't be reused for another request
+	fingerprint: Mapped[str] = mapped_column(String(64))
+	expires_at: Mapped[datetime]
+	status_code: Mapped[Optional[int]] = mapped_column(default=None)
+	response: Mapped[Optional[dict]] = mapped_column(JSON, default=None)
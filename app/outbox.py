@@ -0,0 +1,276 @@
+"""
+Transactional outbox of rental events for downstream systems.
+
+The rental routes write an event to `outbox_events` in the same transaction as
+the rental itself (`rental.created`, `rental.changed`, `rental.returned`,
+`rental.deleted`), so an event exists exactly when its change was committed
+and checkout never waits on anyone downstream. A dispatcher, started with the
+app when OUTBOX_ENABLED or on its own with
+
+	python -m app.outbox
+
+claims up to OUTBOX_BATCH_SIZE due events with `FOR UPDATE SKIP LOCKED`, so
+several dispatchers share the work, and leases them for OUTBOX_LEASE_SECONDS
+before delivering them to the sink named by OUTBOX_SINK: `file` appends them
+to OUTBOX_FILE as JSON lines, `webhook` posts them to OUTBOX_WEBHOOK_URL.
+A failed batch is retried after a backoff doubling from OUTBOX_BACKOFF_BASE up
+to OUTBOX_BACKOFF_MAX seconds, at most OUTBOX_MAX_ATTEMPTS times. Delivery is
+at least once: sinks should skip event ids they have seen.
+
+`GET /health/metrics` counts delivered and failed events and reports the age of
+the oldest undelivered one as the `outbox.lag_seconds` gauge.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from typing import Protocol
+
+import httpx
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+	AsyncSession,
+	async_sessionmaker,
+	create_async_engine,
+)
+
+from . import metrics
+from .database import AsyncSessionLocal
+from .models import OutboxEvent, Rental
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+
+def rental_payload(rental: Rental) -> dict:
+	return {
+		'rental_id': rental.id,
+		'costume_id': rental.costume_id,
+		'customer_id': rental.customer_id,
+		'user_id': rental.user_id,
+		'rental_date': rental.rental_date.isoformat(),
+		'return_date': rental.return_date.isoformat(),
+		'returned_at': rental.returned_at and rental.returned_at.isoformat(),
+		'fee': rental.fee,
+	}
+
+
+def publish(session: AsyncSession, topic: str, payload: dict) -> None:
+	"""Add an event to the outbox, committed with the rest of `session`."""
+	now = datetime.now()
+	session.add(
+		OutboxEvent(topic=topic, payload=payload, created_at=now, available_at=now)
+	)
+
+
+def as_message(event: OutboxEvent) -> dict:
+	return {
+		'id': event.id,
+		'topic': event.topic,
+		'created_at': event.created_at.isoformat(),
+		'payload': event.payload,
+	}
+
+
+class Sink(Protocol):
+	async def deliver(self, events: list[dict]) -> None:
+		"""Deliver a batch of events, raising if any of them was not."""
+
+
+class FileSink:
+	"""Appends each event to a file as a JSON line, e.g. for local runs and tests."""
+
+	def __init__(self, path: str):
+		self.path = path
+
+	def _write(self, events: list[dict]) -> None:
+		with open(self.path, 'a', encoding='utf-8') as file:
+			file.writelines(json.dumps(event) + '\n' for event in events)
+
+	async def deliver(self, events: list[dict]) -> None:
+		await asyncio.to_thread(self._write, events)
+
+
+class WebhookSink:
+	"""Posts each batch as `{"events": [...]}`; any non-2xx answer fails it."""
+
+	def __init__(
+		self,
+		url: str,
+		timeout: float = 10.0,
+		transport: httpx.AsyncBaseTransport | None = None,
+	):
+		self.url = url
+		self.timeout = timeout
+		self.transport = transport  # e.g. httpx.MockTransport in tests
+
+	async def deliver(self, events: list[dict]) -> None:
+		async with httpx.AsyncClient(
+			timeout=self.timeout, transport=self.transport
+		) as client:
+			response = await client.post(self.url, json={'events': events})
+			response.raise_for_status()
+
+
+def sink_from_settings() -> Sink:
+	if settings.OUTBOX_SINK == 'webhook':
+		return WebhookSink(settings.OUTBOX_WEBHOOK_URL)
+
+	return FileSink(settings.OUTBOX_FILE)
+
+
+def backoff(attempts: int) -> float:
+	"""Seconds to wait after the `attempts`-th failed delivery."""
+	return min(
+		settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.OUTBOX_BACKOFF_MAX
+	)
+
+
+class Dispatcher:
+	def __init__(
+		self,
+		sink: Sink,
+		session_factory: async_sessionmaker = AsyncSessionLocal,
+		batch_size: int = settings.OUTBOX_BATCH_SIZE,
+	):
+		self.sink = sink
+		self.session_factory = session_factory
+		self.batch_size = batch_size
+
+	async def claim(self, session: AsyncSession) -> list[OutboxEvent]:
+		"""Lease a batch of due events; other dispatchers skip the locked ones."""
+		now = datetime.now()
+		events = (
+			await session.scalars(
+				select(OutboxEvent)
+				.where(
+					OutboxEvent.delivered_at.is_(None),
+					OutboxEvent.available_at <= now,
+					OutboxEvent.attempts < settings.OUTBOX_MAX_ATTEMPTS,
+				)
+				.order_by(OutboxEvent.available_at, OutboxEvent.id)
+				.limit(self.batch_size)
+				.with_for_update(skip_locked=True)
+			)
+		).all()
+		leased_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+		for event in events:
+			event.attempts += 1
+			# Claimable again if this dispatcher dies before settling them
+			event.available_at = leased_until
+		await session.commit()
+
+		return events
+
+	async def settle(
+		self, session: AsyncSession, events: list[OutboxEvent], error: str | None
+	) -> None:
+		ids = [event.id for event in events]
+		if error is None:
+			await session.execute(
+				update(OutboxEvent)
+				.where(OutboxEvent.id.in_(ids))
+				.values(delivered_at=datetime.now(), last_error=None)
+			)
+			metrics.increment('outbox.delivered', len(events))
+		else:
+			now = datetime.now()
+			for event in events:
+				await session.execute(
+					update(OutboxEvent)
+					.where(OutboxEvent.id == event.id)
+					.values(
+						available_at=now + timedelta(seconds=backoff(event.attempts)),
+						last_error=error,
+					)
+				)
+			metrics.increment('outbox.failed', len(events))
+			dead = sum(
+				event.attempts >= settings.OUTBOX_MAX_ATTEMPTS for event in events
+			)
+			if dead:
+				metrics.increment('outbox.dead', dead)
+				logger.error('%d outbox events ran out of attempts', dead)
+		await session.commit()
+
+	async def measure(self, session: AsyncSession) -> None:
+		pending, oldest = (
+			await session.execute(
+				select(func.count(), func.min(OutboxEvent.created_at)).where(
+					OutboxEvent.delivered_at.is_(None),
+					OutboxEvent.attempts < settings.OUTBOX_MAX_ATTEMPTS,
+				)
+			)
+		).one()
+		metrics.set_gauge('outbox.pending', pending)
+		metrics.set_gauge(
+			'outbox.lag_seconds',
+			(datetime.now() - oldest).total_seconds() if oldest else 0.0,
+		)
+
+	async def dispatch_once(self) -> int:
+		"""Claim and deliver one batch, returning how many events it held."""
+		async with self.session_factory() as session:
+			events = await self.claim(session)
+			if events:
+				try:
+					await self.sink.deliver([as_message(event) for event in events])
+				except Exception as error:  # Whatever the sink raises, retry later
+					logger.warning('Delivering %d outbox events failed', len(events))
+					await self.settle(session, events, repr(error)[:500])
+				else:
+					await self.settle(session, events, None)
+			await self.measure(session)
+
+		return len(events)
+
+	async def purge(self) -> None:
+		"""Delete the events delivered longer than OUTBOX_KEEP_DELIVERED_HOURS ago."""
+		before = datetime.now() - timedelta(hours=settings.OUTBOX_KEEP_DELIVERED_HOURS)
+		async with self.session_factory() as session:
+			await session.execute(
+				delete(OutboxEvent).where(OutboxEvent.delivered_at < before)
+			)
+			await session.commit()
+
+	async def run(self) -> None:
+		while True:
+			try:
+				# A full batch means more are likely waiting
+				if await self.dispatch_once() == self.batch_size:
+					continue
+				await self.purge()
+			except (OSError, SQLAlchemyError):
+				logger.exception('Outbox dispatch failed')
+			await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
+
+
+async def _run(database_url: str) -> None:
+	engine = create_async_engine(database_url)
+	dispatcher = Dispatcher(
+		sink_from_settings(), async_sessionmaker(engine, expire_on_commit=False)
+	)
+	try:
+		await dispatcher.run()
+	finally:
+		await engine.dispose()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(description='Deliver the rental outbox events.')
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		args.database_url = settings.DATABASE_URL
+	asyncio.run(_run(args.database_url))
+
+
+if __name__ == '__main__':
+	main()
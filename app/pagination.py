@@ -0,0 +1,50 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor holds the sort key of the last row of a page. List endpoints return
+the cursor of the next page in the `X-Next-Cursor` header, and clients pass it
+back as `?cursor=` to continue right after that row.
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(*values) -> str:
+	payload = [
+		{'dt': value.isoformat()} if isinstance(value, datetime) else value
+		for value in values
+	]
+
+	return urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def _matches(value, expected) -> bool:
+	# JSON booleans would otherwise pass as integers
+	return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, *types) -> list:
+	"""
+	Values of `cursor`, which must hold one value of each of `types` (a type
+	or a tuple of types, as taken by `isinstance`) in order.
+	"""
+	try:
+		padded = cursor + '=' * (-len(cursor) % 4)
+		payload = json.loads(urlsafe_b64decode(padded))
+		values = [
+			datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+			for value in payload
+		]
+	except (ValueError, TypeError, KeyError):
+		raise HTTPException(400, detail='Invalid cursor.')
+
+	if len(values) != len(types) or not all(map(_matches, values, types)):
+		raise HTTPException(400, detail='Invalid cursor.')
+
+	return values
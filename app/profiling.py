@@ -0,0 +1,151 @@
+"""
+Opt-in cProfile capture of single requests.
+
+The middleware is only installed when PROFILING_ENABLED is set, and even then a
+request is profiled only if it carries `X-Profile: 1` (or `?profile=1`) and the
+bearer token of an admin user. cProfile follows the event loop thread, so other
+requests running concurrently show up in the same profile; one profile is
+captured at a time.
+"""
+
+import asyncio
+import cProfile
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from sqlalchemy import select
+
+from .database import AsyncSessionLocal
+from .models import User
+from .security import decode_access_token
+from .settings import Settings
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+PROFILE_ID = re.compile(r'^[\w-]+$')
+
+
+class ProfileStore:
+	def __init__(self, directory: str, keep: int):
+		self.directory = Path(directory)
+		self.keep = keep
+
+	def path(self, profile_id: str) -> Path | None:
+		if not PROFILE_ID.match(profile_id):
+			return None
+		path = self.directory / f'{profile_id}.prof'
+
+		return path if path.exists() else None
+
+	def save(self, profiler: cProfile.Profile, info: dict) -> dict:
+		self.directory.mkdir(parents=True, exist_ok=True)
+		slug = re.sub(r'\W+', '-', info['path']).strip('-') or 'root'
+		profile_id = f'{datetime.now():%Y%m%dT%H%M%S%f}-{info["method"]}-{slug}'
+		info = {'id': profile_id, **info}
+
+		profiler.dump_stats(self.directory / f'{profile_id}.prof')
+		(self.directory / f'{profile_id}.json').write_text(json.dumps(info))
+		self.prune()
+
+		return info
+
+	def list(self) -> list[dict]:
+		if not self.directory.exists():
+			return []
+		infos = [json.loads(path.read_text()) for path in self.directory.glob('*.json')]
+
+		return sorted(infos, key=lambda info: info['id'], reverse=True)
+
+	def prune(self) -> None:
+		for info in self.list()[self.keep :]:
+			for suffix in ('.prof', '.json'):
+				(self.directory / f'{info["id"]}{suffix}').unlink(missing_ok=True)
+
+
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_KEEP)
+
+
+def _wants_profile(scope) -> bool:
+	for name, value in scope['headers']:
+		if name == b'x-profile':
+			return value in {b'1', b'true'}
+
+	query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+
+	return query.get('profile', [''])[-1] in {'1', 'true'}
+
+
+def _bearer_token(scope) -> str | None:
+	for name, value in scope['headers']:
+		if name == b'authorization':
+			scheme, _, token = value.decode('latin-1').partition(' ')
+			return token if scheme.lower() == 'bearer' else None
+
+	return None
+
+
+class ProfilingMiddleware:
+	def __init__(self, app, store=profile_store, session_factory=AsyncSessionLocal):
+		self.app = app
+		self.store = store
+		self.session_factory = session_factory
+		self.lock = asyncio.Lock()
+
+	async def admin_email(self, scope) -> str | None:
+		token = _bearer_token(scope)
+		email = decode_access_token(token) if token else None
+		if not email:
+			return None
+
+		async with self.session_factory() as session:
+			user = await session.scalar(select(User).where(User.email == email))
+
+		return user.email if user and user.is_admin else None
+
+	async def __call__(self, scope, receive, send):
+		if scope['type'] != 'http' or not _wants_profile(scope):
+			return await self.app(scope, receive, send)
+
+		email = await self.admin_email(scope)
+		if email is None or self.lock.locked():
+			return await self.app(scope, receive, send)
+
+		status_code = 500
+
+		async def send_wrapper(message):
+			nonlocal status_code
+			if message['type'] == 'http.response.start':
+				status_code = message['status']
+			await send(message)
+
+		async with self.lock:
+			profiler = cProfile.Profile()
+			started = time.perf_counter()
+			profiler.enable()
+			try:
+				await self.app(scope, receive, send_wrapper)
+			finally:
+				profiler.disable()
+				duration = time.perf_counter() - started
+
+			# Unmatched paths (404s, trailing slash redirects) have nothing to profile
+			if 'route' in scope:
+				info = {
+					'method': scope['method'],
+					'path': scope['path'],
+					'route': scope['route'].path,
+					'status_code': status_code,
+					'duration_ms': round(duration * 1000, 3),
+					'user': email,
+					'created_at': datetime.now().isoformat(),
+				}
+				try:
+					await asyncio.to_thread(self.store.save, profiler, info)
+				except OSError:
+					logger.exception('Could not save profile of %s', scope['path'])
@@ -0,0 +1,167 @@
+"""
+Denormalized read model of rentals for the rental board.
+
+`rental_view` copies each rental's dates together with the names of its
+costume, customer and clerk, which the rental, costume, customer and user
+routes keep current in the same transaction as their writes. With
+RENTAL_VIEW_ENABLED, `GET /rental/` serves `?fields=` selections that only
+ask for those (e.g. `rental_date,costume.name,customer.name,user.name`) from
+it, with one index scan and no joins. Rebuild it, e.g. after a bulk load, with
+
+	python -m app.rental_view
+"""
+
+import argparse
+import asyncio
+from collections.abc import Sequence
+
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from .database import dialect_name
+from .fields import Fields
+from .models import Costume, Customer, Rental, RentalView, User
+from .settings import Settings
+
+settings = Settings()
+
+# What the view holds of RentalSchema, as {field: nested fields or None}
+COVERED = {
+	'rental_date': None,
+	'return_date': None,
+	'costume': {'id', 'name'},
+	'customer': {'name'},
+	'user': {'id', 'name'},
+}
+
+
+def serves(selected: Fields | None) -> bool:
+	"""Whether the view holds every field of the `selected` ones."""
+	if not settings.RENTAL_VIEW_ENABLED or not selected:
+		return False
+
+	return all(
+		field in COVERED
+		and (COVERED[field] is None or nested is not None and nested <= COVERED[field])
+		for field, nested in selected.items()
+	)
+
+
+def as_rental(row: RentalView) -> dict:
+	"""A view row shaped like RentalSchema, as far as the view goes."""
+	return {
+		'rental_date': row.rental_date,
+		'return_date': row.return_date,
+		'costume': {'id': row.costume_id, 'name': row.costume_name},
+		'customer': {'name': row.customer_name},
+		'user': {'id': row.user_id, 'name': row.user_name},
+	}
+
+
+def add(
+	session: AsyncSession,
+	rental: Rental,
+	costume: Costume,
+	customer: Customer,
+	user: User,
+) -> None:
+	session.add(
+		RentalView(
+			id=rental.id,
+			rental_date=rental.rental_date,
+			return_date=rental.return_date,
+			costume_id=costume.id,
+			costume_name=costume.name,
+			customer_id=customer.id,
+			customer_name=customer.name,
+			user_id=user.id,
+			user_name=user.name,
+		)
+	)
+
+
+async def move(session: AsyncSession, rental: Rental) -> None:
+	"""Copy the new dates of `rental`."""
+	await session.execute(
+		update(RentalView)
+		.where(RentalView.id == rental.id)
+		.values(rental_date=rental.rental_date, return_date=rental.return_date)
+	)
+
+
+async def remove(session: AsyncSession, rental_id: int) -> None:
+	await session.execute(delete(RentalView).where(RentalView.id == rental_id))
+
+
+async def rename(session: AsyncSession, model, row_id: int, name: str) -> None:
+	"""Copy the new name of a costume, customer or user to its rentals."""
+	prefix = {Costume: 'costume', Customer: 'customer', User: 'user'}[model]
+	await session.execute(
+		update(RentalView)
+		.where(getattr(RentalView, f'{prefix}_id') == row_id)
+		.values({f'{prefix}_name': name})
+	)
+
+
+async def rebuild(session: AsyncSession) -> int:
+	"""Refill the view from `rental`, returning how many rentals it holds."""
+	if dialect_name(session) == 'postgresql':
+		# Writes wait, so none is lost between the delete and the insert
+		await session.execute(
+			text('LOCK TABLE rental, costumes, customers, users IN SHARE MODE')
+		)
+	await session.execute(delete(RentalView))
+	result = await session.execute(
+		insert(RentalView).from_select(
+			[
+				'id',
+				'rental_date',
+				'return_date',
+				'costume_id',
+				'costume_name',
+				'customer_id',
+				'customer_name',
+				'user_id',
+				'user_name',
+			],
+			select(
+				Rental.id,
+				Rental.rental_date,
+				Rental.return_date,
+				Costume.id,
+				Costume.name,
+				Customer.id,
+				Customer.name,
+				User.id,
+				User.name,
+			)
+			.join(Costume, Costume.id == Rental.costume_id)
+			.join(Customer, Customer.id == Rental.customer_id)
+			.join(User, User.id == Rental.user_id),
+		)
+	)
+
+	return result.rowcount
+
+
+async def _rebuild(database_url: str) -> None:
+	engine = create_async_engine(database_url)
+	async with AsyncSession(engine) as session:
+		rentals = await rebuild(session)
+		await session.commit()
+	await engine.dispose()
+	print(f'Rebuilt the rental view from {rentals} rentals')
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(description='Rebuild the rental view.')
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		args.database_url = settings.DATABASE_URL
+	asyncio.run(_rebuild(args.database_url))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,174 @@
+"""
+Routing of reads to database replicas.
+
+GET routes take their session from `get_read_session`, which picks the
+healthy replica with the fewest connections in use (round-robin among ties)
+and falls back to the primary when DATABASE_REPLICA_URLS is empty, when no
+replica is healthy, or when the client wrote something in the last
+REPLICA_PIN_SECONDS, so it always reads its own writes. A background task
+checks every replica each REPLICA_CHECK_INTERVAL seconds and takes it out of
+rotation while it is unreachable or lags more than REPLICA_MAX_LAG seconds.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .settings import Settings
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 when it replayed everything
+LAG_QUERIES = {
+	'postgresql': (
+		'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+		'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+	),
+}
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class Replica:
+	def __init__(self, url: str):
+		self.name = make_url(url).render_as_string(hide_password=True)
+		self.engine = create_async_engine(url)
+		self.sessionmaker = async_sessionmaker(
+			self.engine, expire_on_commit=False, class_=AsyncSession, autoflush=False
+		)
+		self.healthy = True
+		self.lag = 0.0
+
+	@property
+	def in_use(self) -> int:
+		checkedout = getattr(self.engine.pool, 'checkedout', None)
+		return checkedout() if checkedout else 0
+
+
+class ReplicaSet:
+	def __init__(
+		self,
+		urls: list[str],
+		max_lag: float,
+		check_interval: float,
+		check_timeout: float,
+		pin_seconds: float,
+	):
+		self.replicas = [Replica(url) for url in urls]
+		self.max_lag = max_lag
+		self.check_interval = check_interval
+		self.check_timeout = check_timeout
+		self.pin_seconds = pin_seconds
+		self.turn = itertools.count()
+		self.pins: dict[str, float] = {}  # client -> monotonic expiry
+
+	def pick(self) -> Replica | None:
+		healthy = [replica for replica in self.replicas if replica.healthy]
+		if not healthy:
+			return None
+		start = next(self.turn) % len(healthy)
+		rotated = healthy[start:] + healthy[:start]
+
+		return min(rotated, key=lambda replica: replica.in_use)
+
+	async def _lag(self, replica: Replica) -> float:
+		async with replica.engine.connect() as conn:
+			query = LAG_QUERIES.get(conn.dialect.name, 'SELECT 0')
+			return float(await conn.scalar(text(query)) or 0)
+
+	async def check(self, replica: Replica) -> None:
+		try:
+			replica.lag = await asyncio.wait_for(self._lag(replica), self.check_timeout)
+			healthy = replica.lag <= self.max_lag
+		except (TimeoutError, OSError, SQLAlchemyError):
+			healthy = False
+
+		if healthy != replica.healthy:
+			logger.warning(
+				'Replica %s is %s (lag %.1fs)',
+				replica.name,
+				'back in rotation' if healthy else 'out of rotation',
+				replica.lag,
+			)
+		replica.healthy = healthy
+
+	async def monitor(self) -> None:
+		while True:
+			await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+			await asyncio.sleep(self.check_interval)
+
+	def pin(self, client: str) -> None:
+		now = time.monotonic()
+		if len(self.pins) > 10_000:
+			self.pins = {key: until for key, until in self.pins.items() if until > now}
+		self.pins[client] = now + self.pin_seconds
+
+	def pinned(self, client: str) -> bool:
+		until = self.pins.get(client)
+		if until is None:
+			return False
+		if until < time.monotonic():
+			del self.pins[client]
+			return False
+
+		return True
+
+	def status(self) -> list[dict]:
+		return [
+			{
+				'name': replica.name,
+				'healthy': replica.healthy,
+				'lag': replica.lag,
+				'in_use': replica.in_use,
+			}
+			for replica in self.replicas
+		]
+
+	async def dispose(self) -> None:
+		for replica in self.replicas:
+			await replica.engine.dispose()
+
+
+replicas = ReplicaSet(
+	[url.strip() for url in settings.DATABASE_REPLICA_URLS.split(',') if url.strip()],
+	settings.REPLICA_MAX_LAG,
+	settings.REPLICA_CHECK_INTERVAL,
+	settings.HEALTH_DB_TIMEOUT,
+	settings.REPLICA_PIN_SECONDS,
+)
+
+
+def client_key(scope) -> str:
+	"""Who made the request: its bearer token, else its address."""
+	for name, value in scope['headers']:
+		if name == b'authorization':
+			return value.decode('latin-1')
+	client = scope.get('client')
+
+	return client[0] if client else ''
+
+
+class ReplicaPinMiddleware:
+	"""Send the reads of a client that just wrote something to the primary."""
+
+	def __init__(self, app, replica_set=replicas):
+		self.app = app
+		self.replica_set = replica_set
+
+	async def __call__(self, scope, receive, send):
+		if scope['type'] != 'http' or scope['method'] not in WRITE_METHODS:
+			return await self.app(scope, receive, send)
+
+		async def send_wrapper(message):
+			# Pin before the client sees the response and can read again
+			if message['type'] == 'http.response.start' and message['status'] < 400:
+				self.replica_set.pin(client_key(scope))
+			await send(message)
+
+		await self.app(scope, receive, send_wrapper)
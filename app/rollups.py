@@ -0,0 +1,179 @@
+"""
+Monthly rollups of costume rentals, so reports never scan `rental`.
+
+`costume_rollups` holds, per costume and month, the rentals that started in
+that month, the fees they were charged and how long the costume was out in
+that month (a rental spanning months is split between them). The rental
+routes call `record` in the same transaction as their write, adding a
+rental's share or taking it back with `sign=-1`. Rentals written around the
+ORM, e.g. by `app.seed`, are picked up by rebuilding it all from `rental` and
+`rental_history`:
+
+	python -m app.rollups
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import date, datetime, time
+
+from sqlalchemy import delete, func, insert, select, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from .database import dialect_name
+from .models import Costume, CostumeRollup, Rental, RentalHistory
+
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def month_start(moment: date) -> date:
+	return date(moment.year, moment.month, 1)
+
+
+def next_month(month: date) -> date:
+	return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def month_seconds(month: date) -> int:
+	return (next_month(month) - month).days * 86_400
+
+
+def rented_seconds(start: datetime, end: datetime) -> dict[date, int]:
+	"""Seconds of `start` to `end` in each month they span."""
+	seconds = {}
+	while start < end:
+		month = month_start(start)
+		until = min(end, datetime.combine(next_month(month), time()))
+		seconds[month] = int((until - start).total_seconds())
+		start = until
+
+	return seconds
+
+
+def shares(
+	costume_id: int, start: datetime, end: datetime, fee: float
+) -> dict[tuple[int, date], list]:
+	"""[rentals, revenue, rented seconds] of a rental, by (costume, month)."""
+	by_month = {
+		(costume_id, month): [0, 0.0, seconds]
+		for month, seconds in rented_seconds(start, end).items()
+	}
+	first = by_month.setdefault((costume_id, month_start(start)), [0, 0.0, 0])
+	first[0] += 1
+	first[1] += fee
+
+	return by_month
+
+
+async def record(session: AsyncSession, rental: Rental, sign: int = 1) -> None:
+	"""Add the share of `rental` to the rollups, or take it back with `sign=-1`."""
+	fee = rental.fee
+	if fee is None:
+		fee = await session.scalar(
+			select(Costume.fee).where(Costume.id == rental.costume_id)
+		)
+	rows = [
+		{
+			'costume_id': costume_id,
+			'month': month,
+			'rentals': sign * rentals,
+			'revenue': sign * revenue,
+			'rented_seconds': sign * seconds,
+		}
+		for (costume_id, month), (rentals, revenue, seconds) in shares(
+			rental.costume_id, rental.rental_date, rental.return_date, fee
+		).items()
+	]
+
+	upsert = UPSERTS[dialect_name(session)](CostumeRollup).values(rows)
+	columns = CostumeRollup.__table__.c
+	await session.execute(
+		upsert.on_conflict_do_update(
+			index_elements=[columns.costume_id, columns.month],
+			set_={
+				name: columns[name] + upsert.excluded[name]
+				for name in ('rentals', 'revenue', 'rented_seconds')
+			},
+		)
+	)
+
+
+async def rebuild(session: AsyncSession, chunk_size: int = 10_000) -> int:
+	"""
+	Recompute every rollup from `rental` and `rental_history`, returning how
+	many rentals it read.
+	"""
+	if dialect_name(session) == 'postgresql':
+		# Rental writes and archiving wait, so none is counted twice or missed
+		await session.execute(text('LOCK TABLE rental, rental_history IN SHARE MODE'))
+	await session.execute(delete(CostumeRollup))
+
+	totals = defaultdict(lambda: [0, 0.0, 0])
+	read = 0
+	every_rental = union_all(
+		*(
+			select(model.costume_id, model.rental_date, model.return_date, model.fee)
+			for model in (Rental, RentalHistory)
+		)
+	).subquery()
+	rentals = await session.stream(
+		select(
+			every_rental.c.costume_id,
+			every_rental.c.rental_date,
+			every_rental.c.return_date,
+			func.coalesce(every_rental.c.fee, Costume.fee),
+		).join(Costume, Costume.id == every_rental.c.costume_id)
+	)
+	async for costume_id, start, end, fee in rentals:
+		for key, (count, revenue, seconds) in shares(
+			costume_id, start, end, fee
+		).items():
+			total = totals[key]
+			total[0] += count
+			total[1] += revenue
+			total[2] += seconds
+		read += 1
+
+	rows = [
+		{
+			'costume_id': costume_id,
+			'month': month,
+			'rentals': count,
+			'revenue': revenue,
+			'rented_seconds': seconds,
+		}
+		for (costume_id, month), (count, revenue, seconds) in totals.items()
+	]
+	for start in range(0, len(rows), chunk_size):
+		await session.execute(insert(CostumeRollup), rows[start : start + chunk_size])
+
+	return read
+
+
+async def _rebuild(database_url: str) -> None:
+	engine = create_async_engine(database_url)
+	async with AsyncSession(engine) as session:
+		read = await rebuild(session)
+		await session.commit()
+	await engine.dispose()
+	print(f'Rebuilt the costume rollups from {read} rentals')
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(
+		description='Rebuild the costume rollups from the rental history.'
+	)
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		from .settings import Settings
+
+		args.database_url = Settings().DATABASE_URL
+	asyncio.run(_rebuild(args.database_url))
+
+
+if __name__ == '__main__':
+	main()
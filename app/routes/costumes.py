@@ -1,24 +1,42 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_session
+from app import rental_view, search
+from app.availability import availability_hub
+from app.batch import fetch_by_ids, requested_ids
+from app.cache import costume_cache
+from app.catalog import CostumeSort, catalog_query, next_cursor
+from app.counts import costume_total, exact_total
+from app.database import get_read_session, get_session
+from app.fields import load_options, pick, requested_fields, sparse_response
 from app.models import Costume, CostumeAvailability, User
-from app.schemas import CostumeInput, CostumeList, CostumeOutput, Message
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.schemas import (
+	CostumeBatch,
+	CostumeInput,
+	CostumeList,
+	CostumeOutput,
+	Message,
+)
 from app.security import get_current_user
+from app.singleflight import costume_reads
 
 router = APIRouter(prefix='/costumes', tags=['costumes'])
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 
 
-async def query_costume_by_id(session: Session, costume_id):
+async def query_costume_by_id(session: Session, costume_id, options=()):
 	query_db_costume = await session.scalar(
-		select(Costume).where(Costume.id == costume_id)
+		select(Costume).options(*options).where(Costume.id == costume_id)
 	)
 
 	if not query_db_costume:
@@ -29,26 +47,160 @@ async def query_costume_by_id(session: Session, costume_id):
 
 @router.get('/', response_model=CostumeList)
 async def get_costumes(
-	session: Session,
+	session: ReadSession,
+	response: Response,
 	availability: CostumeAvailability = Query(None),
+	min_fee: float = Query(None),
+	max_fee: float = Query(None),
+	sort: CostumeSort = Query('id'),
+	cursor: str = Query(None),
 	skip: int = Query(None),
 	limit: int = Query(None),
+	fields: str = Query(None),
+	total: bool = Query(False),
 ):
-	query = select(Costume)
+	"""
+	Costumes by id, or by `fee` or `name` (prefixed with `-` for descending
+	order), with fees from `min_fee` to `max_fee`. When `limit` is given, pass
+	the `X-Next-Cursor` response header as `cursor` for the next page. With
+	`total=true` the number of matching costumes is sent in `X-Total-Count`.
+	"""
+	selected = requested_fields(fields, CostumeOutput)
+	query = catalog_query(availability, min_fee, max_fee, sort, cursor)
+	headers = {}
+	if total and min_fee is None and max_fee is None:
+		headers = await costume_total(session, availability)
+	elif total:
+		filtered = catalog_query(availability, min_fee, max_fee)
+		headers = await exact_total(session, filtered)
+
+	# The cache holds the catalog in id order, unfiltered by fee
+	cached = min_fee is None and max_fee is None and sort == 'id' and not cursor
+	if costume_cache.active and cached:
+		costumes = await costume_cache.list(session, availability)
+		costumes = costumes[skip or 0 :]
+		costumes = costumes if limit is None else costumes[:limit]
+	else:
+		if selected:
+			# The cursor needs the sort key even when it is not returned
+			sort_key = dict.fromkeys(('id', sort.removeprefix('-')))
+			query = query.options(*load_options(Costume, {**selected, **sort_key}))
 
-	if availability:
-		query = await query.filter(Costume.availability == availability)
+		costumes_scalar = await session.scalars(query.offset(skip).limit(limit))
+		costumes = costumes_scalar.all()
 
-	costumes_scalar = await session.scalars(query.offset(skip).limit(limit))
-	costumes = costumes_scalar.all()
+	if limit and len(costumes) == limit:
+		headers[NEXT_CURSOR_HEADER] = next_cursor(costumes[-1], sort)
+	response.headers.update(headers)
+
+	if selected:
+		costumes = [pick(costume, selected, CostumeOutput) for costume in costumes]
+		return sparse_response({'costumes': costumes}, headers)
 
 	return {'costumes': costumes}
 
 
+@router.get('/search', response_model=CostumeList)
+async def search_costumes(
+	session: ReadSession,
+	response: Response,
+	q: str = Query(min_length=1),
+	availability: CostumeAvailability = Query(None),
+	cursor: str = Query(None),
+	limit: int = Query(20, ge=1, le=100),
+	fields: str = Query(None),
+):
+	"""
+	Costumes whose name or description contain every word of `q`, most relevant
+	first. Pass the `X-Next-Cursor` response header as `cursor` for the next page.
+	"""
+	selected = requested_fields(fields, CostumeOutput)
+	after = decode_cursor(cursor, (int, float), int) if cursor else None
+	options = load_options(Costume, selected) if selected else ()
+	results = await search.search_costumes(
+		session, q, limit, availability, after, options
+	)
+
+	headers = {}
+	if len(results) == limit:
+		last_costume, last_rank = results[-1]
+		headers[NEXT_CURSOR_HEADER] = encode_cursor(last_rank, last_costume.id)
+	response.headers.update(headers)
+
+	costumes = [costume for costume, _ in results]
+	if selected:
+		costumes = [pick(costume, selected, CostumeOutput) for costume in costumes]
+		return sparse_response({'costumes': costumes}, headers)
+
+	return {'costumes': costumes}
+
+
+@router.get('/batch', response_model=CostumeBatch)
+async def get_costumes_by_ids(
+	session: ReadSession, ids: str = Query(), fields: str = Query(None)
+):
+	"""Costumes with the comma-separated `ids`, in that order."""
+	selected = requested_fields(fields, CostumeOutput)
+	# The id is needed to order the costumes even when it is not returned
+	options = load_options(Costume, {'id': None, **selected}) if selected else ()
+	costumes, missing = await fetch_by_ids(
+		session, Costume, requested_ids(ids), options
+	)
+
+	if selected:
+		costumes = [pick(costume, selected, CostumeOutput) for costume in costumes]
+		return sparse_response({'costumes': costumes, 'missing': missing})
+
+	return {'costumes': costumes, 'missing': missing}
+
+
+@router.get('/availability/stream', response_class=StreamingResponse)
+async def stream_availability(
+	request: Request, last_event_id: Annotated[int | None, Header()] = None
+):
+	"""
+	Server-sent `availability` events as costumes are rented, returned and
+	updated; a reconnecting client gets those after its `Last-Event-ID`.
+	"""
+	if not availability_hub.enabled:
+		raise HTTPException(
+			status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+			detail='Availability stream disabled.',
+		)
+
+	return StreamingResponse(
+		availability_hub.stream(last_event_id, request.is_disconnected),
+		media_type='text/event-stream',
+		headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+	)
+
+
 @router.get('/{costume_id}', response_model=CostumeOutput)
-async def get_costume(session: Session, costume_id: int):
-	db_costume = await query_costume_by_id(session, costume_id)
-	return db_costume
+async def get_costume(session: ReadSession, costume_id: int, fields: str = Query(None)):
+	selected = requested_fields(fields, CostumeOutput)
+
+	async def load_costume() -> bytes:
+		if costume_cache.active:
+			db_costume = await costume_cache.get(session, costume_id)
+			if not db_costume:
+				raise HTTPException(
+					HTTPStatus.NOT_FOUND, detail='Costume not registered.'
+				)
+		else:
+			options = load_options(Costume, selected) if selected else ()
+			db_costume = await query_costume_by_id(session, costume_id, options)
+
+		if selected:
+			return to_json(pick(db_costume, selected, CostumeOutput))
+
+		return CostumeOutput.model_validate(
+			db_costume, from_attributes=True
+		).model_dump_json()
+
+	# Reads pinned to the primary must not share a flight running on a replica
+	body = await costume_reads.do((costume_id, id(session.bind), fields), load_costume)
+
+	return Response(body, media_type='application/json')
 
 
 @router.post('/', response_model=CostumeOutput, status_code=HTTPStatus.CREATED)
@@ -72,6 +224,9 @@ async def create_costume(
 	)
 
 	session.add(db_costume)
+	await session.flush()
+	await search.index_costume(session, db_costume)
+	await costume_cache.invalidate(session, db_costume.id)
 	await session.commit()
 	await session.refresh(db_costume)
 
@@ -92,6 +247,9 @@ async def update_costume(
 	db_costume.fee = costume.fee
 	db_costume.availability = costume.availability
 
+	await search.index_costume(session, db_costume)
+	await costume_cache.invalidate(session, costume_id)
+	await rental_view.rename(session, Costume, costume_id, costume.name)
 	await session.commit()
 	await session.refresh(db_costume)
 
@@ -107,6 +265,8 @@ async def delete_costume(
 	db_costume = await query_costume_by_id(session, costume_id)
 
 	await session.delete(db_costume)
+	await search.remove_costume(session, costume_id)
+	await costume_cache.invalidate(session, costume_id)
 	await session.commit()
 
 	return {'message': 'Costume deleted.'}
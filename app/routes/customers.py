@@ -1,51 +1,194 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_session
-from app.models import Customer, User
-from app.schemas import CustomerList, CustomerSchema, Message
+from app import rental_view, search
+from app.batch import fetch_by_ids, requested_ids
+from app.counts import estimated_total
+from app.database import get_read_session, get_session
+from app.fields import load_options, pick, requested_fields, sparse_response
+from app.idempotency import Idempotent
+from app.models import Customer, CustomerStats, User
+from app.schemas import (
+	CustomerBatch,
+	CustomerDetail,
+	CustomerInput,
+	CustomerList,
+	CustomerSchema,
+	CustomerStatsSchema,
+	Message,
+	TopCustomerList,
+)
 from app.security import get_current_user
 
 router = APIRouter(prefix='/customers', tags=['customers'])
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 
 
 @router.get('/', response_model=CustomerList)
 async def get_customers(
-	session: Session,
+	session: ReadSession,
 	current_user: CurrentUser,
+	response: Response,
 	skip: int = 0,
 	limit: int = 0,
+	fields: str = Query(None),
+	total: bool = Query(False),
 ):
-	customers_scalar = await session.scalars(select(Customer).offset(skip).limit(limit))
+	selected = requested_fields(fields, CustomerSchema)
+	headers = await estimated_total(session, Customer) if total else {}
+	response.headers.update(headers)
+	query = select(Customer)
+
+	if selected:
+		query = query.options(*load_options(Customer, selected))
+
+	customers_scalar = await session.scalars(query.offset(skip).limit(limit))
 	customers = customers_scalar.all()
 
+	if selected:
+		customers = [pick(customer, selected, CustomerSchema) for customer in customers]
+		return sparse_response({'customers': customers}, headers)
+
+	return {'customers': customers}
+
+
+@router.get('/search', response_model=CustomerList)
+async def search_customers(
+	session: ReadSession,
+	current_user: CurrentUser,
+	q: str = Query(min_length=1),
+	limit: int = Query(20, ge=1, le=100),
+	fields: str = Query(None),
+):
+	"""
+	Customers by CPF or phone prefix (punctuation is ignored) or by part of
+	their name.
+	"""
+	selected = requested_fields(fields, CustomerSchema)
+	options = load_options(Customer, selected) if selected else ()
+	customers = await search.search_customers(session, q, limit, options)
+
+	if selected:
+		customers = [pick(customer, selected, CustomerSchema) for customer in customers]
+		return sparse_response({'customers': customers})
+
 	return {'customers': customers}
 
 
-@router.get('/{customer_id}', response_model=CustomerSchema)
-async def get_customer(session: Session, current_user: CurrentUser, customer_id: int):
+@router.get('/batch', response_model=CustomerBatch)
+async def get_customers_by_ids(
+	session: ReadSession,
+	current_user: CurrentUser,
+	ids: str = Query(),
+	fields: str = Query(None),
+):
+	"""Customers with the comma-separated `ids`, in that order."""
+	selected = requested_fields(fields, CustomerSchema)
+	# The id is needed to order the customers even when it is not returned
+	options = load_options(Customer, {'id': None, **selected}) if selected else ()
+	customers, missing = await fetch_by_ids(
+		session, Customer, requested_ids(ids), options
+	)
+
+	if selected:
+		customers = [pick(customer, selected, CustomerSchema) for customer in customers]
+		return sparse_response({'customers': customers, 'missing': missing})
+
+	return {'customers': customers, 'missing': missing}
+
+
+@router.get('/top', response_model=TopCustomerList)
+async def get_top_customers(
+	session: ReadSession,
+	current_user: CurrentUser,
+	sort: Literal['spend', 'rentals', 'open_rentals', 'last_rental_date'] = Query(
+		'spend'
+	),
+	limit: int = Query(20, ge=1, le=100),
+):
+	"""Customers who spent the most, rented the most or rented last."""
+	column = getattr(CustomerStats, sort)
+	rows = await session.execute(
+		select(CustomerStats, Customer.name)
+		.join(Customer, Customer.id == CustomerStats.customer_id)
+		.order_by(column.desc(), CustomerStats.customer_id.desc())
+		.limit(limit)
+	)
+
+	return {
+		'customers': [
+			{
+				'customer_id': stats.customer_id,
+				'name': name,
+				**CustomerStatsSchema.model_validate(
+					stats, from_attributes=True
+				).model_dump(),
+			}
+			for stats, name in rows
+		]
+	}
+
+
+@router.get(
+	'/{customer_id}', response_model=CustomerDetail, response_model_exclude_unset=True
+)
+async def get_customer(
+	session: ReadSession,
+	current_user: CurrentUser,
+	customer_id: int,
+	fields: str = Query(None),
+	stats: bool = Query(False),
+):
+	"""With `stats=true`, the customer's rental activity is added as `stats`."""
+	selected = requested_fields(fields, CustomerSchema)
+	options = load_options(Customer, selected) if selected else ()
 	db_customer = await session.scalar(
-		select(Customer).where(Customer.id == customer_id)
+		select(Customer).options(*options).where(Customer.id == customer_id)
 	)
 
 	if not db_customer:
 		raise HTTPException(404, detail='Customer not registered.')
 
-	return db_customer
+	if not stats and selected:
+		return sparse_response(pick(db_customer, selected, CustomerSchema))
+	if not stats:
+		return db_customer
+
+	db_stats = await session.get(CustomerStats, customer_id)
+	# No row until the customer's first rental
+	activity = (
+		CustomerStatsSchema.model_validate(db_stats, from_attributes=True)
+		if db_stats
+		else CustomerStatsSchema()
+	).model_dump()
+	if selected:
+		return sparse_response({
+			**pick(db_customer, selected, CustomerSchema),
+			'stats': activity,
+		})
+
+	return {
+		**CustomerSchema.model_validate(db_customer, from_attributes=True).model_dump(),
+		'stats': activity,
+	}
 
 
 @router.post('/', response_model=CustomerSchema, status_code=201)
 async def create_customer(
 	session: Session,
 	current_user: CurrentUser,
-	customer: CustomerSchema,
+	customer: CustomerInput,
+	idempotency: Idempotent,
 ):
+	if idempotency.replay:
+		return idempotency.replay
+
 	db_customer = await session.scalar(
 		select(Customer).where(Customer.cpf == customer.cpf)
 	)
@@ -61,8 +204,12 @@ async def create_customer(
 	)
 
 	session.add(db_customer)
-	await session.commit()
+	await session.flush()
 	await session.refresh(db_customer)
+	await idempotency.save(
+		session, 201, CustomerSchema.model_validate(db_customer, from_attributes=True)
+	)
+	await session.commit()
 
 	return db_customer
 
@@ -71,7 +218,7 @@ async def create_customer(
 async def update_customer(
 	session: Session,
 	current_user: CurrentUser,
-	customer: CustomerSchema,
+	customer: CustomerInput,
 	customer_id: int,
 ):
 	db_customer = await session.scalar(
@@ -87,6 +234,7 @@ async def update_customer(
 	db_customer.phone_number = customer.phone_number
 	db_customer.address = customer.address
 
+	await rental_view.rename(session, Customer, customer_id, customer.name)
 	await session.commit()
 	await session.refresh(db_customer)
 
@@ -0,0 +1,71 @@
+import asyncio
+from http import HTTPStatus
+
+from fastapi import APIRouter, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import background, metrics
+from app.admission import admission
+from app.database import async_engine, pool_status
+from app.schemas import Liveness, Metrics, Readiness
+from app.settings import Settings
+
+router = APIRouter(prefix='/health', tags=['health'])
+
+settings = Settings()
+
+
+@router.get('/live', response_model=Liveness)
+def liveness():
+	"""The worker is up and serving requests."""
+	return {'status': 'ok'}
+
+
+async def ping_database() -> bool:
+	# Its own connection rather than get_session, so that checking it out of an
+	# exhausted pool or a dead server is bounded by the timeout as well
+	async def ping():
+		async with async_engine.connect() as conn:
+			await conn.execute(text('SELECT 1'))
+
+	try:
+		await asyncio.wait_for(ping(), settings.HEALTH_DB_TIMEOUT)
+	except (TimeoutError, OSError, SQLAlchemyError):
+		return False
+
+	return True
+
+
+@router.get('/ready', response_model=Readiness)
+async def readiness(response: Response):
+	"""
+	Whether this worker should get traffic: the database answers a ping within
+	HEALTH_DB_TIMEOUT, the connection pool is not exhausted and every background
+	task is alive. Answers 503 otherwise so the load balancer backs off.
+	"""
+	database = 'ok' if await ping_database() else 'unavailable'
+
+	pool = pool_status()
+	tasks = background.status()
+	ready = (
+		database == 'ok'
+		and not pool['saturated']
+		and all(state == 'running' for state in tasks.values())
+	)
+	if not ready:
+		response.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+
+	return {
+		'status': 'ok' if ready else 'unavailable',
+		'database': database,
+		'pool': pool,
+		'admission': admission.stats(),
+		'background_tasks': tasks,
+	}
+
+
+@router.get('/metrics', response_model=Metrics)
+def read_metrics():
+	"""Counters of this worker since it started, and its latest gauges."""
+	return {'counters': metrics.counters, 'gauges': metrics.gauges}
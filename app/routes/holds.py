@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.database import get_read_session, get_session
+from app.holds import active_holds, free_for, hold_scheduler
+from app.models import Costume, CostumeAvailability, User
+from app.schemas import HoldCount, HoldInput, HoldList, Message
+from app.security import get_current_user
+from app.settings import Settings
+
+router = APIRouter(prefix='/holds', tags=['holds'])
+
+CurrentUser = Annotated[User, Depends(get_current_user)]
+Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+
+settings = Settings()
+
+
+@router.post('/', response_model=HoldList, status_code=HTTPStatus.CREATED)
+async def hold_costumes(session: Session, current_user: CurrentUser, hold: HoldInput):
+	"""
+	Hold every costume in `costume_ids` for checkout, or none of them; holding
+	one again extends the hold.
+	"""
+	now = datetime.now()
+	seconds = min(hold.seconds or settings.HOLD_SECONDS, settings.HOLD_MAX_SECONDS)
+	held_until = now + timedelta(seconds=seconds)
+	costume_ids = set(hold.costume_ids)
+
+	held = await session.scalars(
+		update(Costume)
+		.where(
+			Costume.id.in_(costume_ids),
+			Costume.availability != CostumeAvailability.UNAVAILABLE,
+			free_for(current_user.id, now),
+		)
+		.values(held_by=current_user.id, held_until=held_until)
+		.returning(Costume.id)
+	)
+	if set(held) != costume_ids:
+		await session.rollback()
+		raise HTTPException(400, detail='Costume unavailable.')
+
+	await session.commit()
+	metrics.increment('holds.created', len(costume_ids))
+	for costume_id in costume_ids:
+		hold_scheduler.schedule(costume_id, held_until)
+
+	return {
+		'holds': [
+			{'costume_id': costume_id, 'held_until': held_until}
+			for costume_id in sorted(costume_ids)
+		]
+	}
+
+
+@router.get('/count', response_model=HoldCount)
+async def count_holds(session: ReadSession, current_user: CurrentUser):
+	"""The number of costumes held for checkout right now."""
+	return {'active': await active_holds(session)}
+
+
+@router.delete('/{costume_id}', response_model=Message)
+async def release_hold(session: Session, current_user: CurrentUser, costume_id: int):
+	released = await session.execute(
+		update(Costume)
+		.where(
+			Costume.id == costume_id,
+			Costume.held_by == current_user.id,
+			Costume.held_until > datetime.now(),
+		)
+		.values(held_by=None, held_until=None)
+	)
+	if not released.rowcount:
+		raise HTTPException(404, detail='Hold not registered.')
+
+	await session.commit()
+	metrics.increment('holds.released')
+
+	return {'message': 'Hold has been released successfully.'}
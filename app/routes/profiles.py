@@ -0,0 +1,41 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.models import User
+from app.profiling import profile_store
+from app.schemas import ProfileList
+from app.security import get_current_user
+
+router = APIRouter(prefix='/profiles', tags=['profiles'])
+
+CurrentUser = Annotated[User, Depends(get_current_user)]
+
+
+def require_admin(current_user: User):
+	if not current_user.is_admin:
+		raise HTTPException(status_code=400, detail='Not enough permissions')
+
+
+@router.get('/', response_model=ProfileList)
+async def list_profiles(current_user: CurrentUser):
+	"""
+	Most recent request profiles, captured by sending `X-Profile: 1`
+	as an admin while PROFILING_ENABLED is set.
+	"""
+	require_admin(current_user)
+
+	return {'profiles': profile_store.list()}
+
+
+@router.get('/{profile_id}', response_class=FileResponse)
+async def download_profile(current_user: CurrentUser, profile_id: str):
+	"""Raw cProfile dump, readable with `pstats` or snakeviz."""
+	require_admin(current_user)
+
+	path = profile_store.path(profile_id)
+	if path is None:
+		raise HTTPException(404, detail='Profile not found.')
+
+	return FileResponse(path, media_type='application/octet-stream', filename=path.name)
@@ -1,17 +1,27 @@
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_session
+from app import customer_stats, outbox, rental_view, rollups
+from app.cache import costume_cache
+from app.counts import estimated_total
+from app.database import dialect_name, get_read_session, get_session
+from app.fields import load_options, pick, requested_fields, sparse_response
+from app.group_commit import GroupCommit
+from app.holds import free_for
+from app.idempotency import Idempotent
 from app.models import (
 	Costume,
 	CostumeAvailability,
 	Customer,
 	Rental,
+	RentalView,
 	User,
 )
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from app.schemas import (
 	Message,
 	RentalInput,
@@ -20,11 +30,23 @@ from app.schemas import (
 	RentalSchema,
 )
 from app.security import get_current_user
+from app.settings import Settings
 
 router = APIRouter(prefix='/rental', tags=['rental'])
 
+settings = Settings()
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+
+# RentalSchema fields backed by relationships, for ?fields=
+RELATIONSHIPS = {
+	'costume': Rental.costumes,
+	'customer': Rental.customers,
+	'user': Rental.users,
+}
+ATTRIBUTES = {field: related.key for field, related in RELATIONSHIPS.items()}
 
 
 def set_rental_attr(rental):
@@ -38,15 +60,98 @@ def set_rental_attr(rental):
 
 @router.get('/', response_model=RentalList)
 async def read_rental_list(
-	session: Session,
+	session: ReadSession,
 	current_user: CurrentUser,
+	response: Response,
+	customer_id: int = Query(None),
+	user_id: int = Query(None),
+	costume_id: int = Query(None),
+	rented_from: datetime = Query(None),
+	rented_until: datetime = Query(None),
+	due_from: datetime = Query(None),
+	due_until: datetime = Query(None),
+	returned: bool = Query(None),
+	cursor: str = Query(None),
 	skip: int = 0,
 	limit: int = 100,
+	fields: str = Query(None),
+	total: bool = Query(False),
 ):
-	db_rental_list_scalar = await session.scalars(
-		select(Rental).offset(skip).limit(limit)
-	)
-	db_rental_list = db_rental_list_scalar.all()
+	"""
+	Rentals, newest first, or soonest due first when filtered by `due_from` or
+	`due_until`. Date ranges include their start and exclude their end;
+	`returned=false` keeps the rentals still out. Pass the `X-Next-Cursor`
+	response header as `cursor` for the next page.
+	"""
+	selected = requested_fields(fields, RentalSchema)
+	headers = await estimated_total(session, Rental) if total else {}
+	by_due_date = due_from is not None or due_until is not None
+	# Both have the same columns and indexes for these filters, not for returns
+	source = RentalView if returned is None and rental_view.serves(selected) else Rental
+	query = select(source)
+	if returned is not None:
+		# Matches the partial indexes on open rentals when false
+		query = query.where(
+			Rental.returned_at.is_not(None)
+			if returned
+			else Rental.returned_at.is_(None)
+		)
+
+	if selected and source is Rental:
+		# The cursor needs the sort date even when it is not returned
+		sort_date = 'return_date' if by_due_date else 'rental_date'
+		query = query.options(
+			*load_options(Rental, {sort_date: None, **selected}, RELATIONSHIPS)
+		)
+
+	for column, value in (
+		(source.customer_id, customer_id),
+		(source.user_id, user_id),
+		(source.costume_id, costume_id),
+	):
+		if value is not None:
+			query = query.where(column == value)
+	for column, start, end in (
+		(source.rental_date, rented_from, rented_until),
+		(source.return_date, due_from, due_until),
+	):
+		if start is not None:
+			query = query.where(column >= start)
+		if end is not None:
+			query = query.where(column < end)
+
+	sort_column = source.return_date if by_due_date else source.rental_date
+	# Compared as a row, so the database scans the index from the cursor on
+	key = tuple_(sort_column, source.id)
+	if cursor:
+		after = tuple_(*decode_cursor(cursor, datetime, int))
+		query = query.where(key > after if by_due_date else key < after)
+	if by_due_date:
+		query = query.order_by(source.return_date, source.id)
+	else:
+		query = query.order_by(source.rental_date.desc(), source.id.desc())
+
+	db_rental_list_scalar = await session.scalars(query.offset(skip).limit(limit))
+	db_rental_list = db_rental_list_scalar.unique().all()
+
+	if limit and len(db_rental_list) == limit:
+		last = db_rental_list[-1]
+		last_date = last.return_date if by_due_date else last.rental_date
+		headers[NEXT_CURSOR_HEADER] = encode_cursor(last_date, last.id)
+	response.headers.update(headers)
+
+	if source is RentalView:
+		rental_list = [
+			pick(rental_view.as_rental(row), selected, RentalSchema)
+			for row in db_rental_list
+		]
+		return sparse_response({'rental_list': rental_list}, headers)
+	if selected:
+		rental_list = [
+			pick(rental, selected, RentalSchema, ATTRIBUTES)
+			for rental in db_rental_list
+		]
+		return sparse_response({'rental_list': rental_list}, headers)
 
 	rental_list = [set_rental_attr(rental_obj) for rental_obj in db_rental_list]
 
@@ -54,21 +159,36 @@ async def read_rental_list(
 
 
 @router.get('/{rental_id}', response_model=RentalSchema)
-async def read_rental(session: Session, current_user: CurrentUser, rental_id: int):
-	db_rental = await session.scalar(select(Rental).where(Rental.id == rental_id))
+async def read_rental(
+	session: ReadSession,
+	current_user: CurrentUser,
+	rental_id: int,
+	fields: str = Query(None),
+):
+	selected = requested_fields(fields, RentalSchema)
+	options = load_options(Rental, selected, RELATIONSHIPS) if selected else ()
+	db_rental = await session.scalar(
+		select(Rental).options(*options).where(Rental.id == rental_id)
+	)
 
 	if not db_rental:
 		raise HTTPException(404, detail='Rental not registered.')
 
+	if selected:
+		return sparse_response(pick(db_rental, selected, RentalSchema, ATTRIBUTES))
+
 	set_rental_attr(db_rental)
 
 	return db_rental
 
 
-@router.post('/', response_model=RentalSchema, status_code=201)
-async def create_rental(
-	session: Session, current_user: CurrentUser, rental: RentalInput
-):
+async def rent(
+	session: AsyncSession, current_user: User, rental: RentalInput
+) -> Rental:
+	"""
+	Rent the costume, rejecting the rental before anything is written, so that
+	a rejection leaves the rest of a group commit alone.
+	"""
 	# Costume code
 	db_costume = await session.scalar(
 		select(Costume).where(Costume.id == rental.costume_id)
@@ -79,8 +199,6 @@ async def create_rental(
 	if db_costume.availability == CostumeAvailability.UNAVAILABLE:
 		raise HTTPException(400, detail='Costume unavailable.')
 
-	db_costume.availability = CostumeAvailability.UNAVAILABLE
-
 	# Customer code
 	db_customer = await session.scalar(
 		select(Customer).where(Customer.id == rental.customer_id)
@@ -88,22 +206,84 @@ async def create_rental(
 	if not db_customer:
 		raise HTTPException(400, detail='Customer not registered.')
 
+	# One conditional update, so that neither a concurrent checkout nor one
+	# from under someone else's hold can rent it too
+	claimed = await session.execute(
+		update(Costume)
+		.where(
+			Costume.id == db_costume.id,
+			Costume.availability != CostumeAvailability.UNAVAILABLE,
+			free_for(current_user.id, datetime.now()),
+		)
+		.values(
+			availability=CostumeAvailability.UNAVAILABLE, held_by=None, held_until=None
+		)
+	)
+	if not claimed.rowcount:
+		if db_costume.availability == CostumeAvailability.UNAVAILABLE:
+			raise HTTPException(400, detail='Costume unavailable.')
+		raise HTTPException(400, detail='Costume held for another checkout.')
+
 	# Rental code
 	db_rental = Rental(
 		user_id=current_user.id,
 		customer_id=db_customer.id,
 		costume_id=rental.costume_id,
+		fee=db_costume.fee,
 	)
 
 	session.add(db_rental)
-	await session.commit()
-	await session.refresh(db_rental)
-
+	await session.flush()
+	await rollups.record(session, db_rental)
+	await customer_stats.record_rental(session, db_rental)
+	rental_view.add(session, db_rental, db_costume, db_customer, current_user)
+	outbox.publish(session, 'rental.created', outbox.rental_payload(db_rental))
+	await costume_cache.invalidate(session, db_costume.id)
 	set_rental_attr(db_rental)
 
 	return db_rental
 
 
+async def rent_item(session: AsyncSession, item: tuple[User, RentalInput]) -> Rental:
+	current_user, rental = item
+	# Into this session, so the rental finds its user without a query
+	current_user = await session.merge(current_user, load=False)
+
+	return await rent(session, current_user, rental)
+
+
+rental_writes = GroupCommit(
+	'rental_writes',
+	rent_item,
+	settings.RENTAL_GROUP_COMMIT_ENABLED,
+	settings.RENTAL_GROUP_COMMIT_WINDOW,
+	settings.RENTAL_GROUP_COMMIT_MAX,
+)
+
+
+@router.post('/', response_model=RentalSchema, status_code=201)
+async def create_rental(
+	session: Session,
+	current_user: CurrentUser,
+	rental: RentalInput,
+	idempotency: Idempotent,
+):
+	if idempotency.replay:
+		return idempotency.replay
+
+	# With a key, the response is stored in the request's own transaction
+	if rental_writes.enabled and idempotency.key is None:
+		return await rental_writes.submit((current_user, rental))
+
+	db_rental = await rent(session, current_user, rental)
+	await idempotency.save(
+		session, 201, RentalSchema.model_validate(db_rental, from_attributes=True)
+	)
+	await session.commit()
+
+	return db_rental
+
+
 @router.patch('/{rental_id}', response_model=RentalSchema)
 async def patch_rental(
 	session: Session,
@@ -116,12 +296,17 @@ async def patch_rental(
 	if not db_rental:
 		raise HTTPException(404, detail='Rental not registered.')
 
+	await rollups.record(session, db_rental, sign=-1)
 	for key, value in rental.model_dump(exclude_unset=True).items():
 		setattr(db_rental, key, value)
 
 	if db_rental.return_date < db_rental.rental_date:
 		raise HTTPException(400, detail="Rental date can't be later than return date.")
 
+	await rollups.record(session, db_rental)
+	await customer_stats.record_change(session, db_rental)
+	await rental_view.move(session, db_rental)
+	outbox.publish(session, 'rental.changed', outbox.rental_payload(db_rental))
 	session.add(db_rental)
 	await session.commit()
 	await session.refresh(db_rental)
@@ -131,19 +316,77 @@ async def patch_rental(
 	return db_rental
 
 
+@router.post('/{rental_id}/return', response_model=Message)
+async def return_rental(session: Session, current_user: CurrentUser, rental_id: int):
+	"""Record that the costume came back, keeping the rental on record."""
+	returned_at = datetime.now()
+	returned = (
+		update(Rental)
+		.where(Rental.id == rental_id, Rental.returned_at.is_(None))
+		.values(returned_at=returned_at)
+		.returning(Rental.costume_id, Rental.customer_id)
+	)
+	free = update(Costume).values(availability=CostumeAvailability.AVAILABLE)
+
+	if dialect_name(session) == 'postgresql':
+		# One statement closes the rental and frees its costume
+		returned = returned.cte('returned')
+		row = (
+			await session.execute(
+				free.where(Costume.id == returned.c.costume_id).returning(
+					returned.c.costume_id, returned.c.customer_id
+				)
+			)
+		).one_or_none()
+	else:
+		# SQLite can't update from a CTE; both run in the same transaction
+		row = (await session.execute(returned)).one_or_none()
+		if row:
+			await session.execute(free.where(Costume.id == row.costume_id))
+
+	if not row:
+		if await session.get(Rental, rental_id):
+			raise HTTPException(400, detail='Rental already returned.')
+		raise HTTPException(404, detail='Rental not registered.')
+
+	costume_id, customer_id = row
+	await customer_stats.record_return(session, customer_id)
+	outbox.publish(
+		session,
+		'rental.returned',
+		{
+			'rental_id': rental_id,
+			'costume_id': costume_id,
+			'customer_id': customer_id,
+			'returned_at': returned_at.isoformat(),
+		},
+	)
+	await costume_cache.invalidate(session, costume_id)
+	await session.commit()
+
+	return {'message': 'Rental has been returned successfully.'}
+
+
 @router.delete('/{rental_id}', response_model=Message)
 async def delete_rental(session: Session, current_user: CurrentUser, rental_id: int):
+	"""Erase a rental, e.g. one made by mistake; `/return` records returns."""
 	db_rental = await session.scalar(select(Rental).where(Rental.id == rental_id))
 
 	if not db_rental:
 		raise HTTPException(404, detail='Rental not registered.')
 
-	# Updating unavailable costume to available
-	db_costume = await session.scalar(
-		select(Costume).where(Costume.id == db_rental.costume_id)
-	)
-	db_costume.availability = CostumeAvailability.AVAILABLE
-
+	if db_rental.returned_at is None:
+		# Updating unavailable costume to available
+		db_costume = await session.scalar(
+			select(Costume).where(Costume.id == db_rental.costume_id)
+		)
+		db_costume.availability = CostumeAvailability.AVAILABLE
+		await customer_stats.record_return(session, db_rental.customer_id)
+		await costume_cache.invalidate(session, db_costume.id)
+
+	await rollups.record(session, db_rental, sign=-1)
+	await rental_view.remove(session, db_rental.id)
+	outbox.publish(session, 'rental.deleted', outbox.rental_payload(db_rental))
 	await session.delete(db_rental)
 	await session.commit()
 
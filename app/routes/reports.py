@@ -0,0 +1,123 @@
+from datetime import date
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.counts import costume_count
+from app.database import get_read_session
+from app.models import CostumeRollup, User
+from app.rollups import month_seconds, month_start, next_month
+from app.schemas import CostumeReportList, RevenueReport
+from app.security import get_current_user
+
+router = APIRouter(prefix='/reports', tags=['reports'])
+
+CurrentUser = Annotated[User, Depends(get_current_user)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+MAX_MONTHS = 120
+
+
+def month_range(start: date, end: date) -> list[date]:
+	"""Every month from the one of `start` to the one of `end`."""
+	if end < start:
+		raise HTTPException(400, detail="Start can't be later than end.")
+	if (end.year - start.year) * 12 + end.month - start.month >= MAX_MONTHS:
+		raise HTTPException(400, detail=f'At most {MAX_MONTHS} months at a time.')
+
+	months = [month_start(start)]
+	while months[-1] < month_start(end):
+		months.append(next_month(months[-1]))
+
+	return months
+
+
+def report(rentals: int, revenue: float, seconds: int, available: int) -> dict:
+	return {
+		'rentals': rentals,
+		'revenue': round(revenue, 2),
+		'rented_days': round(seconds / 86_400, 2),
+		'utilization': round(seconds / available, 4) if available else 0.0,
+	}
+
+
+@router.get('/revenue', response_model=RevenueReport)
+async def revenue_by_month(
+	session: ReadSession,
+	current_user: CurrentUser,
+	start: date = Query(),
+	end: date = Query(),
+	costume_id: int = Query(None),
+):
+	"""
+	Rentals, revenue and utilization (time rented over time in the catalog) per
+	month from `start` to `end`, of one costume or of the whole catalog.
+	"""
+	months = month_range(start, end)
+	query = (
+		select(
+			CostumeRollup.month,
+			func.sum(CostumeRollup.rentals),
+			func.sum(CostumeRollup.revenue),
+			func.sum(CostumeRollup.rented_seconds),
+		)
+		.where(CostumeRollup.month.between(months[0], months[-1]))
+		.group_by(CostumeRollup.month)
+	)
+	costumes = 1
+	if costume_id is not None:
+		query = query.where(CostumeRollup.costume_id == costume_id)
+	else:
+		costumes = await costume_count(session)
+
+	totals = {month: row for month, *row in await session.execute(query)}
+
+	return {
+		'months': [
+			{
+				'month': month,
+				**report(
+					*totals.get(month, (0, 0.0, 0)), month_seconds(month) * costumes
+				),
+			}
+			for month in months
+		]
+	}
+
+
+@router.get('/costumes', response_model=CostumeReportList)
+async def costumes_by_revenue(
+	session: ReadSession,
+	current_user: CurrentUser,
+	start: date = Query(),
+	end: date = Query(),
+	sort: Literal['revenue', 'utilization', 'rentals'] = Query('revenue'),
+	limit: int = Query(20, ge=1, le=100),
+):
+	"""
+	The costumes that earned the most, were out the longest or were rented the
+	most times from the month of `start` to the month of `end`.
+	"""
+	months = month_range(start, end)
+	available = sum(map(month_seconds, months))
+	rentals = func.sum(CostumeRollup.rentals)
+	revenue = func.sum(CostumeRollup.revenue)
+	seconds = func.sum(CostumeRollup.rented_seconds)
+	order = {'revenue': revenue, 'utilization': seconds, 'rentals': rentals}[sort]
+	rows = await session.execute(
+		select(CostumeRollup.costume_id, rentals, revenue, seconds)
+		.where(CostumeRollup.month.between(months[0], months[-1]))
+		.group_by(CostumeRollup.costume_id)
+		.order_by(order.desc(), CostumeRollup.costume_id)
+		.limit(limit)
+	)
+
+	return {
+		'costumes': [
+			{'costume_id': costume_id, **report(*totals, available)}
+			for costume_id, *totals in rows
+		]
+	}
@@ -1,15 +1,20 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from psycopg import IntegrityError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_session
+from app import rental_view
+from app.batch import fetch_by_ids, requested_ids
+from app.counts import estimated_total
+from app.database import get_read_session, get_session
+from app.fields import load_options, pick, requested_fields, sparse_response
 from app.models import User
 from app.schemas import (
 	Message,
+	UserBatch,
 	UserInput,
 	UserList,
 	UserOutput,
@@ -20,24 +25,68 @@ router = APIRouter(prefix='/users', tags=['users'])
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 
 
 @router.get('/', response_model=UserList)
-async def read_users(session: Session, skip: int = 0, limit: int = 100):
-	users_scalar = await session.scalars(select(User).offset(skip).limit(limit))
+async def read_users(
+	session: ReadSession,
+	response: Response,
+	skip: int = 0,
+	limit: int = 100,
+	fields: str = Query(None),
+	total: bool = Query(False),
+):
+	selected = requested_fields(fields, UserOutput)
+	headers = await estimated_total(session, User) if total else {}
+	response.headers.update(headers)
+	query = select(User)
+
+	if selected:
+		query = query.options(*load_options(User, selected))
+
+	users_scalar = await session.scalars(query.offset(skip).limit(limit))
 
 	users = users_scalar.all()
 
+	if selected:
+		users = [pick(user, selected, UserOutput) for user in users]
+		return sparse_response({'users': users}, headers)
+
 	return {'users': users}
 
 
+@router.get('/batch', response_model=UserBatch)
+async def read_users_by_ids(
+	session: ReadSession, ids: str = Query(), fields: str = Query(None)
+):
+	"""Users with the comma-separated `ids`, in that order."""
+	selected = requested_fields(fields, UserOutput)
+	# The id is needed to order the users even when it is not returned
+	options = load_options(User, {'id': None, **selected}) if selected else ()
+	users, missing = await fetch_by_ids(session, User, requested_ids(ids), options)
+
+	if selected:
+		users = [pick(user, selected, UserOutput) for user in users]
+		return sparse_response({'users': users, 'missing': missing})
+
+	return {'users': users, 'missing': missing}
+
+
 @router.get('/{user_id}', response_model=UserOutput, status_code=200)
-async def read_user(session: Session, user_id: int):
-	user = await session.scalar(select(User).where(User.id == user_id))
+async def read_user(session: ReadSession, user_id: int, fields: str = Query(None)):
+	selected = requested_fields(fields, UserOutput)
+	options = load_options(User, selected) if selected else ()
+	user = await session.scalar(
+		select(User).options(*options).where(User.id == user_id)
+	)
 
 	if not user:
 		raise HTTPException(404, detail='User not registered.')
 
+	if selected:
+		return sparse_response(pick(user, selected, UserOutput))
+
 	return user
 
 
@@ -89,6 +138,7 @@ async def update_user(
 		db_user.phone_number = user.phone_number
 		db_user.is_admin = False if not current_user.is_admin else user.is_admin
 
+		await rental_view.rename(session, User, user_id, user.name)
 		await session.commit()
 		await session.refresh(db_user)
 
@@ -1,7 +1,8 @@
-from datetime import datetime, timedelta
-from typing import List
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 from .models import CostumeAvailability
 
@@ -41,6 +42,10 @@ class UserList(BaseModel):
 	users: List[UserOutput]
 
 
+class UserBatch(UserList):
+	missing: List[int]
+
+
 # Costumes
 class CostumeInput(BaseModel):
 	name: str
@@ -61,6 +66,29 @@ class CostumeList(BaseModel):
 	costumes: List[CostumeOutput]
 
 
+class CostumeBatch(CostumeList):
+	missing: List[int]
+
+
+class HoldInput(BaseModel):
+	costume_ids: List[int] = Field(min_length=1, max_length=50)
+	# Defaults to HOLD_SECONDS, at most HOLD_MAX_SECONDS
+	seconds: int | None = Field(None, gt=0)
+
+
+class HoldSchema(BaseModel):
+	costume_id: int
+	held_until: datetime
+
+
+class HoldList(BaseModel):
+	holds: List[HoldSchema]
+
+
+class HoldCount(BaseModel):
+	active: int
+
+
 # Customers
 class CustomerSchema(BaseModel):
 	cpf: str
@@ -74,10 +102,66 @@ class CustomerList(BaseModel):
 	customers: List[CustomerSchema]
 
 
+class CustomerBatch(CustomerList):
+	missing: List[int]
+
+
+def only_digits(value: str) -> str:
+	return re.sub(r'\D', '', value)
+
+
+class CustomerStatsSchema(BaseModel):
+	rentals: int = 0
+	open_rentals: int = 0
+	last_rental_date: datetime | None = None
+	spend: float = 0.0
+
+
+class CustomerDetail(CustomerSchema):
+	stats: CustomerStatsSchema | None = None
+
+
+class TopCustomer(CustomerStatsSchema):
+	customer_id: int
+	name: str
+
+
+class TopCustomerList(BaseModel):
+	customers: List[TopCustomer]
+
+
+class CustomerInput(CustomerSchema):
+	"""
+	CPF and phone are stored as bare digits, however they were typed, so that
+	lookups by prefix work on a single canonical form.
+	"""
+
+	@field_validator('cpf')
+	@classmethod
+	def normalize_cpf(cls, cpf: str) -> str:
+		cpf = only_digits(cpf)
+		if len(cpf) != 11:
+			raise ValueError('CPF must have 11 digits')
+
+		return cpf
+
+	@field_validator('phone_number')
+	@classmethod
+	def normalize_phone_number(cls, phone_number: str) -> str:
+		phone_number = only_digits(phone_number)
+		if len(phone_number) in {12, 13} and phone_number.startswith('55'):
+			phone_number = phone_number[2:]  # +55 country code
+		if len(phone_number) not in {10, 11}:
+			raise ValueError('Phone number must have an area code and 8 or 9 digits')
+
+		return phone_number
+
+
 # Rental
 class RentalSchema(BaseModel):
 	rental_date: datetime
 	return_date: datetime
+	returned_at: datetime | None = None
 	costume: CostumeOutput
 	customer: CustomerSchema
 	user: UserOutput
@@ -95,3 +179,79 @@ class RentalInput(BaseModel):
 class RentalPatch(BaseModel):
 	rental_date: datetime | None = datetime.now()
 	return_date: datetime | None = datetime.now() + timedelta(days=7)
+
+
+# Reports
+class MonthReport(BaseModel):
+	month: date
+	rentals: int
+	revenue: float
+	rented_days: float
+	utilization: float
+
+
+class RevenueReport(BaseModel):
+	months: List[MonthReport]
+
+
+class CostumeReport(BaseModel):
+	costume_id: int
+	rentals: int
+	revenue: float
+	rented_days: float
+	utilization: float
+
+
+class CostumeReportList(BaseModel):
+	costumes: List[CostumeReport]
+
+
+# Profiles
+class ProfileInfo(BaseModel):
+	id: str
+	method: str
+	path: str
+	route: str
+	status_code: int
+	duration_ms: float
+	user: str
+	created_at: datetime
+
+
+class ProfileList(BaseModel):
+	profiles: List[ProfileInfo]
+
+
+# Health
+class Liveness(BaseModel):
+	status: str
+
+
+class PoolStatus(BaseModel):
+	pool: str
+	size: int | None = None
+	checked_out: int | None = None
+	idle: int | None = None
+	overflow: int | None = None
+	saturated: bool
+
+
+class AdmissionStatus(BaseModel):
+	active: int
+	queued: int
+	rejected: int
+	checkout_wait_ms: float
+	pool_saturated: bool
+
+
+class Readiness(BaseModel):
+	status: str
+	database: str
+	pool: PoolStatus
+	admission: AdmissionStatus
+	background_tasks: Dict[str, str]
+
+
+class Metrics(BaseModel):
+	counters: Dict[str, int]
+	gauges: Dict[str, float]
@@ -0,0 +1,198 @@
+"""
+Full-text search over costume names and descriptions, and customer lookup.
+
+PostgreSQL indexes a generated `search_vector` tsvector column with GIN, so it
+stays in sync by itself. SQLite keeps a separate FTS5 table, `costumes_fts`,
+which the costume routes update in the same transaction as the costume row.
+Neither is mapped in the ORM: both are created by DDL hooks on the costumes
+table and by the migration.
+
+Customers are looked up by a CPF or phone prefix, which the B-tree indexes on
+those columns answer as a range scan, or by part of their name, which a
+`pg_trgm` GIN index answers on PostgreSQL, tolerating typos as well.
+"""
+
+import re
+
+from sqlalchemy import DDL, event, func, inspect, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import dialect_name
+from .models import Costume, CostumeAvailability, Customer
+from .schemas import only_digits
+
+POSTGRESQL_DDL = (
+	(
+		'ALTER TABLE costumes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS '
+		"(to_tsvector('simple', name || ' ' || description)) STORED"
+	),
+	'CREATE INDEX ix_costumes_search_vector ON costumes USING gin (search_vector)',
+)
+SQLITE_DDL = (
+	'CREATE VIRTUAL TABLE IF NOT EXISTS costumes_fts USING fts5(name, description)',
+)
+
+for statement in POSTGRESQL_DDL:
+	event.listen(
+		Costume.__table__,
+		'after_create',
+		DDL(statement).execute_if(dialect='postgresql'),
+	)
+for statement in SQLITE_DDL:
+	event.listen(
+		Costume.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite')
+	)
+event.listen(
+	Customer.__table__,
+	'before_create',
+	DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
+event.listen(
+	Customer.__table__,
+	'after_create',
+	DDL(
+		'CREATE INDEX ix_customers_name_trgm ON customers USING gin (name gin_trgm_ops)'
+	).execute_if(dialect='postgresql'),
+)
+event.listen(
+	Costume.__table__,
+	'before_drop',
+	DDL('DROP TABLE IF EXISTS costumes_fts').execute_if(dialect='sqlite'),
+)
+
+
+def rebuild_index(connection) -> None:
+	"""Refill the SQLite FTS table from `costumes`, e.g. after a bulk load."""
+	if connection.dialect.name != 'sqlite':
+		return
+	if not inspect(connection).has_table('costumes_fts'):
+		return
+	connection.execute(text('DELETE FROM costumes_fts'))
+	connection.execute(
+		text(
+			'INSERT INTO costumes_fts (rowid, name, description) '
+			'SELECT id, name, description FROM costumes'
+		)
+	)
+
+
+async def index_costume(session: AsyncSession, costume: Costume) -> None:
+	if dialect_name(session) != 'sqlite':
+		return
+	await remove_costume(session, costume.id)
+	await session.execute(
+		text(
+			'INSERT INTO costumes_fts (rowid, name, description) '
+			'VALUES (:id, :name, :description)'
+		),
+		{'id': costume.id, 'name': costume.name, 'description': costume.description},
+	)
+
+
+async def remove_costume(session: AsyncSession, costume_id: int) -> None:
+	if dialect_name(session) != 'sqlite':
+		return
+	await session.execute(
+		text('DELETE FROM costumes_fts WHERE rowid = :id'), {'id': costume_id}
+	)
+
+
+def _ranked_ids(dialect: str, terms: list[str]):
+	"""Matching costume ids with a relevance score, higher is better."""
+	if dialect == 'postgresql':
+		query = func.plainto_tsquery('simple', ' '.join(terms))
+		vector = literal_column('costumes.search_vector')
+		rank = func.ts_rank(vector, query)
+		return select(Costume.id.label('id'), rank.label('rank')).where(
+			vector.op('@@')(query)
+		)
+
+	match = ' '.join(f'"{term}"' for term in terms)
+	return (
+		select(
+			literal_column('rowid').label('id'),
+			(-func.bm25(literal_column('costumes_fts'))).label('rank'),
+		)
+		.select_from(text('costumes_fts'))
+		.where(text('costumes_fts MATCH :match').bindparams(match=match))
+	)
+
+
+async def search_costumes(
+	session: AsyncSession,
+	q: str,
+	limit: int,
+	availability: CostumeAvailability | None = None,
+	after: tuple[float, int] | None = None,
+	options=(),
+) -> list[tuple[Costume, float]]:
+	"""Costumes matching every word of `q`, best first, then by id."""
+	terms = re.findall(r'\w+', q)
+	if not terms:
+		return []
+
+	ranked = _ranked_ids(dialect_name(session), terms).subquery()
+	query = (
+		select(Costume, ranked.c.rank)
+		.join(ranked, Costume.id == ranked.c.id)
+		.options(*options)
+	)
+
+	if availability:
+		query = query.where(Costume.availability == availability)
+
+	if after:
+		rank, costume_id = after
+		query = query.where(
+			(ranked.c.rank < rank)
+			| ((ranked.c.rank == rank) & (Costume.id > costume_id))
+		)
+
+	result = await session.execute(
+		query.order_by(ranked.c.rank.desc(), Costume.id).limit(limit)
+	)
+
+	return result.all()
+
+
+def _prefix(column, prefix: str):
+	# A range rather than LIKE, so a plain B-tree index serves it on any backend
+	upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+	return (column >= prefix) & (column < upper)
+
+
+async def search_customers(
+	session: AsyncSession, q: str, limit: int, options=()
+) -> list[Customer]:
+	"""
+	Customers whose CPF or phone starts with the digits of `q` when it has no
+	letters, otherwise whose name contains it; on PostgreSQL names that are
+	merely similar match too, the closest first.
+	"""
+	if not re.search(r'[^\W\d_]', q):
+		digits = only_digits(q)
+		if not digits:
+			return []
+		query = select(Customer).where(
+			or_(_prefix(Customer.cpf, digits), _prefix(Customer.phone_number, digits))
+		)
+		order = (Customer.name, Customer.id)
+	elif dialect_name(session) == 'postgresql':
+		q = q.strip()
+		query = select(Customer).where(
+			Customer.name.icontains(q, autoescape=True) | Customer.name.op('%')(q)
+		)
+		order = (func.similarity(Customer.name, q).desc(), Customer.id)
+	else:
+		terms = re.findall(r'\w+', q)
+		query = select(Customer).where(
+			*(Customer.name.icontains(term, autoescape=True) for term in terms)
+		)
+		order = (Customer.name, Customer.id)
+
+	customers = await session.scalars(
+		query.options(*options).order_by(*order).limit(limit)
+	)
+
+	return customers.all()
@@ -0,0 +1,422 @@
+"""
+Synthetic data for capacity testing.
+
+Generates users, customers, costumes and rentals deterministically from a seed
+and bulk loads them bypassing the ORM: `executemany` on SQLite and `COPY` on
+PostgreSQL. The tables must already exist (`alembic upgrade head`).
+
+	python -m app.seed --rentals 1000000 --seed 42
+"""
+
+import argparse
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from heapq import heapify, heappop, heappush
+from itertools import accumulate, islice
+from random import Random
+from typing import Iterable, Iterator, Sequence
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, make_url
+
+FIRST_NAMES = (
+	'Ana', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Daniel', 'Eduarda', 'Felipe',
+	'Fernanda', 'Gabriel', 'Gustavo', 'Helena', 'Isabela', 'João', 'Juliana',
+	'Larissa', 'Lucas', 'Mariana', 'Mateus', 'Pedro', 'Rafael', 'Sofia', 'Thiago',
+	'Vitória',
+)  # fmt: skip
+LAST_NAMES = (
+	'Almeida', 'Alves', 'Barbosa', 'Cardoso', 'Costa', 'Ferreira', 'Gomes',
+	'Lima', 'Martins', 'Oliveira', 'Pereira', 'Ribeiro', 'Rocha', 'Santos',
+	'Silva', 'Souza',
+)  # fmt: skip
+STREETS = (
+	'Rua das Flores', 'Avenida Brasil', 'Rua XV de Novembro', 'Rua Sete de Setembro',
+	'Avenida Paulista', 'Rua da Consolação', 'Rua Augusta', 'Avenida Atlântica',
+)  # fmt: skip
+CITIES = (
+	'São Paulo/SP', 'Rio de Janeiro/RJ', 'Belo Horizonte/MG', 'Salvador/BA',
+	'Recife/PE', 'Brasília/DF', 'Curitiba/PR', 'Porto Alegre/RS',
+)  # fmt: skip
+AREA_CODES = (11, 21, 31, 41, 51, 61, 71, 81, 85, 91)
+COSTUME_THEMES = (
+	'Pirata', 'Bruxa', 'Vampiro', 'Super-herói', 'Princesa', 'Palhaço', 'Caipira',
+	'Dinossauro', 'Astronauta', 'Fada', 'Múmia', 'Zumbi', 'Ninja', 'Cowboy',
+	'Sereia', 'Frevo', 'Odalisca', 'Marinheiro',
+)  # fmt: skip
+COSTUME_STYLES = (
+	'Clássico', 'Infantil', 'Luxo', 'Neon', 'Retrô', 'Gótico', 'Tropical',
+	'Dourado', 'Carnavalesco', 'Assustador',
+)  # fmt: skip
+
+# Relative demand per month: Carnaval (Feb), festa junina (Jun), Halloween (Oct)
+# and year-end parties stand out from the rest of the year.
+MONTH_WEIGHTS = {
+	1: 1.2, 2: 4.0, 3: 1.0, 4: 0.8, 5: 0.9, 6: 2.2,
+	7: 1.6, 8: 0.8, 9: 0.9, 10: 3.0, 11: 1.1, 12: 2.0,
+}  # fmt: skip
+RENTAL_DAYS = (1, 2, 3, 3, 5, 7, 7, 7, 7, 10, 14)
+
+TABLE_COLUMNS = {
+	'users': ('id', 'name', 'email', 'password', 'phone_number', 'is_admin'),
+	'customers': ('id', 'cpf', 'name', 'email', 'phone_number', 'address'),
+	'costumes': ('id', 'name', 'description', 'fee', 'availability'),
+	'rental': (
+		'id',
+		'user_id',
+		'customer_id',
+		'costume_id',
+		'rental_date',
+		'return_date',
+	),
+}
+
+
+def cpf_check_digits(base: str) -> str:
+	"""Return the two verification digits of a 9 digit CPF base."""
+	digits = [int(d) for d in base]
+	for weight in (10, 11):
+		total = sum(d * w for d, w in zip(digits, range(weight, 1, -1)))
+		remainder = total * 10 % 11
+		digits.append(0 if remainder == 10 else remainder)
+
+	return f'{digits[-2]}{digits[-1]}'
+
+
+def is_valid_cpf(cpf: str) -> bool:
+	if len(cpf) != 11 or not cpf.isdigit() or cpf == cpf[0] * 11:
+		return False
+
+	return cpf_check_digits(cpf[:9]) == cpf[9:]
+
+
+class SyntheticData:
+	"""Deterministic row generators, one `Random` per table so counts are independent."""
+
+	def __init__(self, seed: int, start: date, end: date):
+		self.seed = seed
+		days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+		self.days = days
+		self.cum_weights = list(
+			accumulate(
+				MONTH_WEIGHTS[day.month] * (1.3 if day.weekday() >= 4 else 1.0)
+				for day in days
+			)
+		)
+
+	def _random(self, table: str) -> Random:
+		return Random(f'{self.seed}:{table}')
+
+	def _name(self, rng: Random) -> str:
+		return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+	def _phone(self, rng: Random) -> str:
+		return f'{rng.choice(AREA_CODES)}9{rng.randrange(10**8):08d}'
+
+	def users(self, first_id: int, count: int, password_hash: str) -> Iterator[tuple]:
+		rng = self._random('users')
+		for user_id in range(first_id, first_id + count):
+			name = self._name(rng)
+			email = f'{name.lower().replace(" ", ".")}.{user_id}@example.com'
+			yield (user_id, name, email, password_hash, self._phone(rng), user_id == 1)
+
+	def customers(self, first_id: int, count: int) -> Iterator[tuple]:
+		rng = self._random('customers')
+		for customer_id in range(first_id, first_id + count):
+			name = self._name(rng)
+			base = f'{rng.randrange(10**9):09d}'
+			address = (
+				f'{rng.choice(STREETS)}, {rng.randint(1, 3000)} - {rng.choice(CITIES)}'
+			)
+			yield (
+				customer_id,
+				base + cpf_check_digits(base),
+				name,
+				f'{name.lower().replace(" ", ".")}.{customer_id}@example.com',
+				self._phone(rng),
+				address,
+			)
+
+	def costumes(self, first_id: int, count: int) -> Iterator[tuple]:
+		rng = self._random('costumes')
+		for costume_id in range(first_id, first_id + count):
+			theme = rng.choice(COSTUME_THEMES)
+			style = rng.choice(COSTUME_STYLES)
+			yield (
+				costume_id,
+				f'{theme} {style} #{costume_id}',
+				f'Fantasia de {theme.lower()} no estilo {style.lower()}.',
+				float(rng.randrange(2990, 49990, 100)) / 100,
+				'AVAILABLE',
+			)
+
+	def rentals(
+		self,
+		first_id: int,
+		count: int,
+		user_ids: Sequence[int],
+		customer_ids: Sequence[int],
+		costume_ids: Sequence[int],
+		busy_until: dict[int, datetime] | None = None,
+	) -> Iterator[tuple]:
+		"""
+		Rentals in chronological order, never overlapping for the same costume.
+
+		Each rental takes a random costume among those back in stock. When demand
+		outgrows the catalog, the rental waits for the first costume to return.
+		`busy_until` holds the last return date of costumes rented before.
+		"""
+		rng = self._random('rental')
+		days, cum_weights = self.days, self.cum_weights
+		total = cum_weights[-1]
+		last = len(days) - 1
+		starts = sorted(
+			(
+				min(bisect(cum_weights, rng.random() * total), last),
+				rng.randrange(9 * 3600, 20 * 3600),
+			)
+			for _ in range(count)
+		)
+
+		busy_until = busy_until or {}
+		free = [
+			costume_id for costume_id in costume_ids if costume_id not in busy_until
+		]
+		busy = [(returned, costume_id) for costume_id, returned in busy_until.items()]
+		heapify(busy)
+
+		for rental_id, (day_index, seconds) in enumerate(starts, first_id):
+			day = days[day_index]
+			rental_date = datetime(day.year, day.month, day.day) + timedelta(
+				seconds=seconds
+			)
+			while busy and busy[0][0] <= rental_date:
+				free.append(heappop(busy)[1])
+
+			if free:
+				index = rng.randrange(len(free))
+				free[index], free[-1] = free[-1], free[index]
+				costume_id = free.pop()
+			else:
+				returned, costume_id = heappop(busy)
+				rental_date = returned
+
+			return_date = rental_date + timedelta(days=rng.choice(RENTAL_DAYS))
+			heappush(busy, (return_date, costume_id))
+
+			yield (
+				rental_id,
+				rng.choice(user_ids),
+				rng.choice(customer_ids),
+				costume_id,
+				rental_date,
+				return_date,
+			)
+
+
+def _sync_url(database_url: str) -> URL:
+	"""Swap the async driver of `DATABASE_URL` for its blocking counterpart."""
+	url = make_url(database_url)
+	drivers = {'sqlite': 'sqlite', 'postgresql': 'postgresql+psycopg'}
+
+	return url.set(drivername=drivers[url.get_backend_name()])
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+	rows = iter(rows)
+	while chunk := list(islice(rows, size)):
+		yield chunk
+
+
+def _sqlite_value(value):
+	# Same storage format SQLAlchemy uses for DateTime columns on SQLite
+	if isinstance(value, datetime):
+		return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+	return value
+
+
+class BulkLoader:
+	def __init__(self, database_url: str, chunk_size: int = 50_000):
+		self.engine = create_engine(_sync_url(database_url))
+		self.dialect = self.engine.dialect.name
+		self.chunk_size = chunk_size
+
+	def ids(self, table: str) -> list[int]:
+		with self.engine.connect() as conn:
+			return list(conn.scalars(text(f'SELECT id FROM {table} ORDER BY id')))
+
+	def next_id(self, table: str) -> int:
+		with self.engine.connect() as conn:
+			return conn.scalar(text(f'SELECT coalesce(max(id), 0) + 1 FROM {table}'))
+
+	def load(self, table: str, rows: Iterable[tuple]) -> int:
+		columns = TABLE_COLUMNS[table]
+		raw = self.engine.raw_connection()
+		loaded = 0
+		try:
+			cursor = raw.cursor()
+			if self.dialect == 'postgresql':
+				copy_sql = f'COPY {table} ({", ".join(columns)}) FROM STDIN'
+				with cursor.copy(copy_sql) as copy:
+					for row in rows:
+						copy.write_row(row)
+						loaded += 1
+				cursor.execute(
+					f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+					f'(SELECT max(id) FROM {table}))'
+				)
+			else:
+				cursor.execute('PRAGMA synchronous = OFF')
+				insert_sql = (
+					f'INSERT INTO {table} ({", ".join(columns)}) '
+					f'VALUES ({", ".join("?" * len(columns))})'
+				)
+				for chunk in _chunks(rows, self.chunk_size):
+					cursor.executemany(
+						insert_sql, [tuple(map(_sqlite_value, row)) for row in chunk]
+					)
+					loaded += len(chunk)
+			raw.commit()
+		finally:
+			raw.close()
+
+		return loaded
+
+	def busy_until(self) -> dict[int, datetime]:
+		"""Last return date of every costume already rented."""
+		with self.engine.connect() as conn:
+			rows = conn.execute(
+				text(
+					'SELECT costume_id, max(return_date) FROM rental GROUP BY costume_id'
+				)
+			).all()
+
+		return {
+			costume_id: datetime.fromisoformat(returned)
+			if isinstance(returned, str)
+			else returned
+			for costume_id, returned in rows
+		}
+
+	def mark_rented_costumes(self, now: datetime) -> None:
+		"""Costumes with a rental still out at `now` are unavailable."""
+		if self.dialect == 'sqlite':
+			now = _sqlite_value(now)
+		with self.engine.begin() as conn:
+			conn.execute(
+				text(
+					"UPDATE costumes SET availability = 'UNAVAILABLE' WHERE id IN "
+					'(SELECT costume_id FROM rental WHERE return_date > :now)'
+				),
+				{'now': now},
+			)
+
+
+def seed(
+	database_url: str,
+	*,
+	users: int = 20,
+	customers: int = 10_000,
+	costumes: int = 5_000,
+	rentals: int = 100_000,
+	seed: int = 0,
+	years: int = 3,
+	until: date | None = None,
+	password_hash: str | None = None,
+	chunk_size: int = 50_000,
+	log=print,
+) -> dict[str, int]:
+	"""Append synthetic rows to every table, returning how many were loaded."""
+	loader = BulkLoader(database_url, chunk_size)
+	until = until or date.today()
+	data = SyntheticData(seed, until - timedelta(days=365 * years), until)
+
+	if password_hash is None and users:
+		from .security import get_password_hash
+
+		password_hash = get_password_hash('seed1234')
+
+	generators = {
+		'users': lambda first: data.users(first, users, password_hash),
+		'customers': lambda first: data.customers(first, customers),
+		'costumes': lambda first: data.costumes(first, costumes),
+	}
+	loaded = {}
+	for table, generate in generators.items():
+		started = time.perf_counter()
+		loaded[table] = loader.load(table, generate(loader.next_id(table)))
+		log(f'{table}: {loaded[table]} rows in {time.perf_counter() - started:.1f}s')
+
+	if costumes:
+		# Imported late: app.search pulls in app.database and its settings
+		from .search import rebuild_index
+
+		with loader.engine.begin() as conn:
+			rebuild_index(conn)
+
+	if rentals:
+		started = time.perf_counter()
+		ids = {table: loader.ids(table) for table in ('users', 'customers', 'costumes')}
+		for table, table_ids in ids.items():
+			if not table_ids:
+				raise ValueError(
+					f'Cannot seed rentals without {table}, load some with --{table}.'
+				)
+		rows = data.rentals(
+			loader.next_id('rental'),
+			rentals,
+			ids['users'],
+			ids['customers'],
+			ids['costumes'],
+			loader.busy_until(),
+		)
+		loaded['rental'] = loader.load('rental', rows)
+		loader.mark_rented_costumes(datetime.now())
+		log(f'rental: {loaded["rental"]} rows in {time.perf_counter() - started:.1f}s')
+
+	loader.engine.dispose()
+
+	return loaded
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	parser = argparse.ArgumentParser(
+		prog='python -m app.seed', description='Bulk load synthetic data.'
+	)
+	parser.add_argument('--database-url', help='defaults to DATABASE_URL')
+	parser.add_argument('--users', type=int, default=20)
+	parser.add_argument('--customers', type=int, default=10_000)
+	parser.add_argument('--costumes', type=int, default=5_000)
+	parser.add_argument('--rentals', type=int, default=100_000)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--years', type=int, default=3, help='history span')
+	parser.add_argument(
+		'--until', type=date.fromisoformat, help='last rental day, defaults to today'
+	)
+	parser.add_argument('--chunk-size', type=int, default=50_000)
+	args = parser.parse_args(argv)
+
+	if args.database_url is None:
+		from .settings import Settings
+
+		args.database_url = Settings().DATABASE_URL
+
+	try:
+		seed(
+			args.database_url,
+			users=args.users,
+			customers=args.customers,
+			costumes=args.costumes,
+			rentals=args.rentals,
+			seed=args.seed,
+			years=args.years,
+			until=args.until,
+			chunk_size=args.chunk_size,
+		)
+	except ValueError as error:
+		parser.error(str(error))
+
+
+if __name__ == '__main__':
+	main()
@@ -8,3 +8,65 @@ class Settings(BaseSettings):
 	SECRET_KEY: str
 	ALGORITHM: str
 	ACCESS_TOKEN_EXPIRE_DAYS: int
+
+	PROFILING_ENABLED: bool = False
+	PROFILING_DIR: str = 'profiles'
+	PROFILING_KEEP: int = 50
+
+	TRACING_ENABLED: bool = False
+	TRACING_FILE: str = 'traces.jsonl'
+
+	ADMISSION_ENABLED: bool = False
+	ADMISSION_MAX_CONCURRENCY: int = 32
+	ADMISSION_MAX_QUEUE: int = 64
+	ADMISSION_QUEUE_TIMEOUT: float = 2.0
+	ADMISSION_CHECKOUT_WAIT: float = 0.5
+	ADMISSION_RETRY_AFTER: int = 2
+
+	HEALTH_DB_TIMEOUT: float = 1.0
+
+	DATABASE_REPLICA_URLS: str = ''  # comma separated
+	REPLICA_MAX_LAG: float = 5.0
+	REPLICA_CHECK_INTERVAL: float = 5.0
+	REPLICA_PIN_SECONDS: float = 5.0
+
+	COSTUME_CACHE_ENABLED: bool = False
+	CACHE_POLL_INTERVAL: float = 1.0
+
+	SINGLE_FLIGHT_ENABLED: bool = False
+
+	COUNT_EXACT_THRESHOLD: int = 10_000
+
+	RENTAL_VIEW_ENABLED: bool = False
+
+	RENTAL_PARTITION_MONTHS_AHEAD: int = 3
+	RENTAL_PARTITION_CHECK_INTERVAL: float = 3600.0
+	RENTAL_ARCHIVE_AFTER_DAYS: int = 365
+
+	OUTBOX_ENABLED: bool = False
+	OUTBOX_SINK: str = 'file'  # or 'webhook'
+	OUTBOX_FILE: str = 'outbox.jsonl'
+	OUTBOX_WEBHOOK_URL: str = ''
+	OUTBOX_BATCH_SIZE: int = 100
+	OUTBOX_POLL_INTERVAL: float = 1.0
+	OUTBOX_LEASE_SECONDS: float = 30.0
+	OUTBOX_MAX_ATTEMPTS: int = 10
+	OUTBOX_BACKOFF_BASE: float = 1.0
+	OUTBOX_BACKOFF_MAX: float = 300.0
+	OUTBOX_KEEP_DELIVERED_HOURS: float = 24.0
+
+	AVAILABILITY_STREAM_ENABLED: bool = False
+	AVAILABILITY_POLL_INTERVAL: float = 1.0
+	AVAILABILITY_KEEPALIVE: float = 15.0
+	AVAILABILITY_QUEUE_SIZE: int = 100
+	AVAILABILITY_EVENTS_KEEP_HOURS: float = 24.0
+
+	IDEMPOTENCY_KEY_TTL_HOURS: float = 24.0
+	IDEMPOTENCY_PURGE_INTERVAL: float = 3600.0
+
+	HOLD_SECONDS: int = 600
+	HOLD_MAX_SECONDS: int = 3600
+
+	RENTAL_GROUP_COMMIT_ENABLED: bool = False
+	RENTAL_GROUP_COMMIT_WINDOW: float = 0.005
+	RENTAL_GROUP_COMMIT_MAX: int = 64
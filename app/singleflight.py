@@ -0,0 +1,58 @@
+"""
+Single-flight execution of identical concurrent reads.
+
+While a call for a key is running, further calls for the same key wait for
+its result instead of running their own, so a burst of requests for one hot
+costume costs one database round trip and one serialization per worker.
+Only calls that overlap are shared: nothing is kept once the first finishes.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from . import metrics
+from .settings import Settings
+
+settings = Settings()
+
+
+class SingleFlight:
+	def __init__(self, name: str, enabled: bool = True):
+		self.name = name
+		self.enabled = enabled
+		self.calls: dict[Hashable, asyncio.Future] = {}
+
+	async def do(self, key: Hashable, run: Callable[[], Awaitable[Any]]) -> Any:
+		if not self.enabled:
+			return await run()
+
+		while (call := self.calls.get(key)) is not None:
+			metrics.increment(f'{self.name}.coalesced')
+			try:
+				return await asyncio.shield(call)
+			except asyncio.CancelledError:
+				# The leading request went away: run again, unless it was us
+				if not call.cancelled():
+					raise
+
+		call = asyncio.get_running_loop().create_future()
+		self.calls[key] = call
+		metrics.increment(f'{self.name}.executed')
+		try:
+			result = await run()
+		except asyncio.CancelledError:
+			call.cancel()
+			raise
+		except Exception as error:
+			call.set_exception(error)
+			call.exception()  # retrieved, even if nobody was waiting
+			raise
+		else:
+			call.set_result(result)
+			return result
+		finally:
+			del self.calls[key]
+
+
+costume_reads = SingleFlight('costume_reads', settings.SINGLE_FLIGHT_ENABLED)
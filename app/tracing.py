@@ -0,0 +1,240 @@
+"""
+Lightweight request tracing.
+
+With TRACING_ENABLED every request gets a trace id (continued from an incoming
+W3C `traceparent` header when present) and `span()` records nested timings of
+the work done on its behalf: DB statements, bcrypt, JWT and response rendering.
+Finished traces are handed to a pluggable exporter; the default appends one
+JSON object per span to TRACING_FILE, using OpenTelemetry field names.
+
+Outside of a traced request `span()` does nothing, so callers never need to
+check whether tracing is on.
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Protocol
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+from .settings import Settings
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'costume-rental-api'
+
+
+class Span:
+	__slots__ = (
+		'trace_id',
+		'span_id',
+		'parent_span_id',
+		'name',
+		'kind',
+		'attributes',
+		'start_time_unix_nano',
+		'end_time_unix_nano',
+		'status',
+	)
+
+	def __init__(self, name, trace_id, parent_span_id=None, kind='INTERNAL'):
+		self.trace_id = trace_id
+		self.span_id = secrets.token_hex(8)
+		self.parent_span_id = parent_span_id
+		self.name = name
+		self.kind = kind
+		self.attributes = {}
+		self.start_time_unix_nano = time.time_ns()
+		self.end_time_unix_nano = None
+		self.status = {'code': 'UNSET'}
+
+	def end(self, error: BaseException | None = None):
+		self.end_time_unix_nano = time.time_ns()
+		if error is not None:
+			self.status = {'code': 'ERROR', 'message': repr(error)}
+
+	def to_dict(self) -> dict:
+		return {
+			'trace_id': self.trace_id,
+			'span_id': self.span_id,
+			'parent_span_id': self.parent_span_id,
+			'name': self.name,
+			'kind': self.kind,
+			'start_time_unix_nano': self.start_time_unix_nano,
+			'end_time_unix_nano': self.end_time_unix_nano,
+			'attributes': self.attributes,
+			'status': self.status,
+			'resource': {'service.name': SERVICE_NAME},
+		}
+
+
+class SpanExporter(Protocol):
+	def export(self, spans: list[dict]) -> None: ...
+
+
+class JsonLinesExporter:
+	def __init__(self, path: str):
+		self.path = path
+		self.lock = threading.Lock()
+
+	def export(self, spans: list[dict]) -> None:
+		lines = ''.join(json.dumps(span) + '\n' for span in spans)
+		with self.lock, open(self.path, 'a', encoding='utf-8') as file:
+			file.write(lines)
+
+
+exporter: SpanExporter = JsonLinesExporter(settings.TRACING_FILE)
+
+
+def set_exporter(new_exporter: SpanExporter) -> None:
+	global exporter
+	exporter = new_exporter
+
+
+_current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+_finished: ContextVar[list[Span] | None] = ContextVar('finished_spans', default=None)
+
+
+def current_trace_id() -> str | None:
+	current = _current_span.get()
+	return current.trace_id if current else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+	"""Time the block as a child of the current span, if a trace is active."""
+	parent = _current_span.get()
+	if parent is None:
+		yield None
+		return
+
+	child = Span(name, parent.trace_id, parent.span_id)
+	child.attributes.update(attributes)
+	token = _current_span.set(child)
+	try:
+		yield child
+	except BaseException as error:
+		child.end(error)
+		raise
+	else:
+		child.end()
+	finally:
+		_current_span.reset(token)
+		_finished.get().append(child)
+
+
+class TracedJSONResponse(JSONResponse):
+	"""JSONResponse whose rendering to bytes is recorded as a span."""
+
+	def render(self, content) -> bytes:
+		with span('response.serialize'):
+			return super().render(content)
+
+
+def _parse_traceparent(scope) -> tuple[str | None, str | None]:
+	for name, value in scope['headers']:
+		if name == b'traceparent':
+			parts = value.decode('latin-1').split('-')
+			if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+				return parts[1], parts[2]
+			break
+
+	return None, None
+
+
+class TracingMiddleware:
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope['type'] != 'http':
+			return await self.app(scope, receive, send)
+
+		trace_id, parent_span_id = _parse_traceparent(scope)
+		root = Span(
+			f'{scope["method"]} {scope["path"]}',
+			trace_id or secrets.token_hex(16),
+			parent_span_id,
+			kind='SERVER',
+		)
+		root.attributes.update({
+			'http.request.method': scope['method'],
+			'url.path': scope['path'],
+		})
+		finished = []
+		span_token = _current_span.set(root)
+		finished_token = _finished.set(finished)
+
+		async def send_wrapper(message):
+			if message['type'] == 'http.response.start':
+				root.attributes['http.response.status_code'] = message['status']
+				headers = list(message.get('headers', []))
+				headers.append((
+					b'traceparent',
+					f'00-{root.trace_id}-{root.span_id}-01'.encode(),
+				))
+				message = {**message, 'headers': headers}
+			await send(message)
+
+		error = None
+		try:
+			await self.app(scope, receive, send_wrapper)
+		except BaseException as exc:
+			error = exc
+			raise
+		finally:
+			_current_span.reset(span_token)
+			_finished.reset(finished_token)
+			route = scope.get('route')
+			if route is not None:
+				root.name = f'{scope["method"]} {route.path}'
+				root.attributes['http.route'] = route.path
+			root.end(error)
+			finished.append(root)
+			try:
+				await asyncio.to_thread(
+					exporter.export, [item.to_dict() for item in finished]
+				)
+			except Exception:
+				logger.exception('Could not export trace %s', root.trace_id)
+
+
+def instrument_engine(engine) -> None:
+	"""Record a `db.query` span around every statement run by `engine`."""
+	sync_engine = getattr(engine, 'sync_engine', engine)
+
+	@event.listens_for(sync_engine, 'before_cursor_execute')
+	def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+		if _current_span.get() is None:
+			return
+		manager = span(
+			'db.query',
+			**{
+				'db.system.name': conn.dialect.name,
+				'db.query.text': statement,
+			},
+		)
+		manager.__enter__()
+		conn.info.setdefault('tracing_spans', []).append(manager)
+
+	@event.listens_for(sync_engine, 'after_cursor_execute')
+	def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+		managers = conn.info.get('tracing_spans')
+		if managers:
+			managers.pop().__exit__(None, None, None)
+
+	@event.listens_for(sync_engine, 'handle_error')
+	def handle_error(exception_context):
+		conn = exception_context.connection
+		managers = conn.info.get('tracing_spans') if conn is not None else None
+		if managers:
+			error = exception_context.original_exception
+			managers.pop().__exit__(type(error), error, None)
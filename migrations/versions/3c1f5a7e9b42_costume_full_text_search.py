@@ -0,0 +1,50 @@
+"""costume full-text search
+
+Revision ID: 3c1f5a7e9b42
+Revises: ed55aec8da79
+Create Date: 2026-10-19 10:12:31.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f5a7e9b42'
+down_revision: Union[str, Sequence[str], None] = 'ed55aec8da79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE costumes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            "(to_tsvector('simple', name || ' ' || description)) STORED"
+        )
+        op.execute(
+            'CREATE INDEX ix_costumes_search_vector ON costumes '
+            'USING gin (search_vector)'
+        )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            'CREATE VIRTUAL TABLE costumes_fts USING fts5(name, description)'
+        )
+        op.execute(
+            'INSERT INTO costumes_fts (rowid, name, description) '
+            'SELECT id, name, description FROM costumes'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_costumes_search_vector', table_name='costumes')
+        op.drop_column('costumes', 'search_vector')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS costumes_fts')
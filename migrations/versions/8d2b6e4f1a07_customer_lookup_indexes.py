@@ -0,0 +1,58 @@
+"""customer lookup indexes
+
+Revision ID: 8d2b6e4f1a07
+Revises: 3c1f5a7e9b42
+Create Date: 2026-10-19 14:02:47.531920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2b6e4f1a07'
+down_revision: Union[str, Sequence[str], None] = '3c1f5a7e9b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _digits(column: str) -> str:
+    # SQLite has no regexp_replace, strip the usual CPF and phone punctuation
+    for char in ('.', '-', ' ', '(', ')', '+', '/'):
+        column = f"replace({column}, '{char}', '')"
+    return column
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE customers SET "
+            "cpf = regexp_replace(cpf, '\\D', '', 'g'), "
+            "phone_number = regexp_replace(phone_number, '\\D', '', 'g')"
+        )
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            'CREATE INDEX ix_customers_name_trgm ON customers '
+            'USING gin (name gin_trgm_ops)'
+        )
+    else:
+        op.execute(
+            f"UPDATE customers SET cpf = {_digits('cpf')}, "
+            f"phone_number = {_digits('phone_number')}"
+        )
+    op.create_index(op.f('ix_customers_cpf'), 'customers', ['cpf'], unique=False)
+    op.create_index(
+        op.f('ix_customers_phone_number'), 'customers', ['phone_number'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_customers_phone_number'), table_name='customers')
+    op.drop_index(op.f('ix_customers_cpf'), table_name='customers')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_customers_name_trgm', table_name='customers')
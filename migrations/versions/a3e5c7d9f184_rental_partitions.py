@@ -0,0 +1,120 @@
+"""rental partitions
+
+Revision ID: a3e5c7d9f184
+Revises: 7b2d4f6e8a13
+Create Date: 2026-10-19 21:04:12.518340
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e5c7d9f184'
+down_revision: Union[str, Sequence[str], None] = '7b2d4f6e8a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keep in step with app.archival, which creates the later partitions
+MONTHS_AHEAD = 3
+COLUMNS = 'id, user_id, customer_id, costume_id, rental_date, return_date, fee'
+FOREIGN_KEYS = {
+    'user_id': 'users',
+    'customer_id': 'customers',
+    'costume_id': 'costumes',
+}
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def create_rental_indexes() -> None:
+    op.create_index('ix_rental_costume_id_rental_date', 'rental', ['costume_id', sa.literal_column('rental_date DESC'), sa.literal_column('id DESC')], unique=False)
+    op.create_index('ix_rental_customer_id_rental_date', 'rental', ['customer_id', sa.literal_column('rental_date DESC'), sa.literal_column('id DESC')], unique=False)
+    op.create_index('ix_rental_rental_date', 'rental', [sa.literal_column('rental_date DESC'), sa.literal_column('id DESC')], unique=False)
+    op.create_index('ix_rental_return_date', 'rental', ['return_date', 'id'], unique=False)
+    op.create_index('ix_rental_user_id_rental_date', 'rental', ['user_id', sa.literal_column('rental_date DESC'), sa.literal_column('id DESC')], unique=False)
+
+
+def replace_rental(partitioned: bool) -> None:
+    """Copy `rental` into a new table, partitioned or not, that takes its place."""
+    op.execute('CREATE TABLE rental_new (LIKE rental INCLUDING DEFAULTS)' + (
+        ' PARTITION BY RANGE (rental_date)' if partitioned else ''
+    ))
+    # A partitioned table is only unique on keys including its partition key
+    op.execute('ALTER TABLE rental_new ADD CONSTRAINT rental_new_pkey PRIMARY KEY ' + (
+        '(id, rental_date)' if partitioned else '(id)'
+    ))
+
+    if partitioned:
+        first = op.get_bind().scalar(sa.text('SELECT min(rental_date) FROM rental'))
+        today = datetime.now().date()
+        month = date((first or today).year, (first or today).month, 1)
+        until = date(today.year, today.month, 1)
+        for _ in range(MONTHS_AHEAD):
+            until = next_month(until)
+        while month <= until:
+            op.execute(
+                f'CREATE TABLE rental_y{month.year}m{month.month:02d} '
+                f"PARTITION OF rental_new FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+            )
+            month = next_month(month)
+        op.execute('CREATE TABLE rental_default PARTITION OF rental_new DEFAULT')
+
+    op.execute(f'INSERT INTO rental_new ({COLUMNS}) SELECT {COLUMNS} FROM rental')
+    # The sequence of the ids would go with the table owning it
+    op.execute('ALTER SEQUENCE rental_id_seq OWNED BY rental_new.id')
+    op.execute('DROP TABLE rental')
+    op.execute('ALTER TABLE rental_new RENAME TO rental')
+    op.execute('ALTER TABLE rental RENAME CONSTRAINT rental_new_pkey TO rental_pkey')
+    for column, table in FOREIGN_KEYS.items():
+        op.create_foreign_key(f'rental_{column}_fkey', 'rental', table, [column], ['id'])
+    create_rental_indexes()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('rental_history',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('costume_id', sa.Integer(), nullable=False),
+    sa.Column('rental_date', sa.DateTime(), nullable=False),
+    sa.Column('return_date', sa.DateTime(), nullable=False),
+    sa.Column('fee', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rental_history_costume_id_rental_date', 'rental_history', ['costume_id', 'rental_date'], unique=False)
+    op.create_index('ix_rental_history_customer_id_rental_date', 'rental_history', ['customer_id', 'rental_date'], unique=False)
+    # ### end Alembic commands ###
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # No foreign key can point into a partitioned table's id alone; SQLite
+        # keeps it, as rental stays a plain table there
+        op.drop_constraint('rental_view_id_fkey', 'rental_view', type_='foreignkey')
+        replace_rental(partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        replace_rental(partitioned=False)
+
+    # Archived rentals go back to where they were, open again as far as
+    # app.customer_stats goes; rebuild it afterwards
+    op.execute(f'INSERT INTO rental ({COLUMNS}) SELECT {COLUMNS} FROM rental_history')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DELETE FROM rental_view WHERE id NOT IN (SELECT id FROM rental)')
+        op.create_foreign_key('rental_view_id_fkey', 'rental_view', 'rental', ['id'], ['id'], ondelete='CASCADE')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_rental_history_customer_id_rental_date', table_name='rental_history')
+    op.drop_index('ix_rental_history_costume_id_rental_date', table_name='rental_history')
+    op.drop_table('rental_history')
+    # ### end Alembic commands ###
@@ -0,0 +1,103 @@
+"""costume counts
+
+Revision ID: b7e4d2a9c613
+Revises: 5a9c3d1e7f20
+Create Date: 2026-10-19 16:02:44.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d2a9c613'
+down_revision: Union[str, Sequence[str], None] = '5a9c3d1e7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # The type of costumes.availability, which already exists on PostgreSQL
+    availability = postgresql.ENUM(
+        'AVAILABLE', 'UNAVAILABLE', 'UNRETURNED',
+        name='costumeavailability', create_type=False
+    )
+    op.create_table('costume_counts',
+    sa.Column('availability', availability, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('availability')
+    )
+
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            """
+            CREATE FUNCTION count_costumes() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND OLD.availability = NEW.availability THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    UPDATE costume_counts SET count = count - 1
+                    WHERE availability = OLD.availability;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO costume_counts (availability, count)
+                    VALUES (NEW.availability, 1)
+                    ON CONFLICT (availability) DO UPDATE SET count = costume_counts.count + 1;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        # Nothing may change between the backfill and the trigger taking over
+        op.execute('LOCK TABLE costumes IN SHARE ROW EXCLUSIVE MODE')
+        op.execute(
+            'CREATE TRIGGER count_costumes AFTER INSERT OR DELETE OR UPDATE OF availability '
+            'ON costumes FOR EACH ROW EXECUTE FUNCTION count_costumes()'
+        )
+    elif bind.dialect.name == 'sqlite':
+        count_new = (
+            'INSERT INTO costume_counts (availability, count) VALUES (NEW.availability, 1) '
+            'ON CONFLICT (availability) DO UPDATE SET count = count + 1;'
+        )
+        uncount_old = (
+            'UPDATE costume_counts SET count = count - 1 '
+            'WHERE availability = OLD.availability;'
+        )
+        op.execute(
+            'CREATE TRIGGER count_costumes_insert AFTER INSERT ON costumes '
+            f'BEGIN {count_new} END'
+        )
+        op.execute(
+            'CREATE TRIGGER count_costumes_delete AFTER DELETE ON costumes '
+            f'BEGIN {uncount_old} END'
+        )
+        op.execute(
+            'CREATE TRIGGER count_costumes_update AFTER UPDATE OF availability ON costumes '
+            'WHEN OLD.availability <> NEW.availability '
+            f'BEGIN {uncount_old} {count_new} END'
+        )
+
+    op.execute(
+        'INSERT INTO costume_counts (availability, count) '
+        'SELECT availability, count(*) FROM costumes GROUP BY availability'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS count_costumes ON costumes')
+        op.execute('DROP FUNCTION IF EXISTS count_costumes()')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS count_costumes_insert')
+        op.execute('DROP TRIGGER IF EXISTS count_costumes_delete')
+        op.execute('DROP TRIGGER IF EXISTS count_costumes_update')
+    op.drop_table('costume_counts')
@@ -0,0 +1,76 @@
+"""availability events
+
+Revision ID: c2e9a4f7b318
+Revises: f1c4a8e2b657
+Create Date: 2026-10-19 23:48:12.307519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e9a4f7b318'
+down_revision: Union[str, Sequence[str], None] = 'f1c4a8e2b657'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # The type of costumes.availability, which already exists on PostgreSQL
+    availability = postgresql.ENUM(
+        'AVAILABLE', 'UNAVAILABLE', 'UNRETURNED',
+        name='costumeavailability', create_type=False
+    )
+    op.create_table('availability_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('costume_id', sa.Integer(), nullable=False),
+    sa.Column('availability', availability, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_availability_events_created_at', 'availability_events', ['created_at'], unique=False)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            """
+            CREATE FUNCTION record_availability() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO availability_events (costume_id, availability, created_at)
+                VALUES (NEW.id, NEW.availability, LOCALTIMESTAMP);
+                PERFORM pg_notify('costume_availability', '');
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        op.execute(
+            'CREATE TRIGGER record_availability AFTER UPDATE OF availability ON costumes '
+            'FOR EACH ROW WHEN (OLD.availability IS DISTINCT FROM NEW.availability) '
+            'EXECUTE FUNCTION record_availability()'
+        )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            'CREATE TRIGGER record_availability AFTER UPDATE OF availability ON costumes '
+            'WHEN OLD.availability <> NEW.availability BEGIN '
+            'INSERT INTO availability_events (costume_id, availability, created_at) '
+            "VALUES (NEW.id, NEW.availability, datetime('now', 'localtime')); "
+            'END'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS record_availability ON costumes')
+        op.execute('DROP FUNCTION IF EXISTS record_availability()')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS record_availability')
+    op.drop_index('ix_availability_events_created_at', table_name='availability_events')
+    op.drop_table('availability_events')
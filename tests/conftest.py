@@ -13,7 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, joinedload  # , sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.database import get_session
+from app.database import get_read_session, get_session
 from app.main import app
 from app.models import (
 	Costume,
@@ -53,6 +53,7 @@ def client(test_session: Session):
 
 	with TestClient(app) as client:
 		app.dependency_overrides[get_session] = get_session_override
+		app.dependency_overrides[get_read_session] = get_session_override
 		yield client
 
 	app.dependency_overrides.clear()
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import (
+	AdmissionController,
+	AdmissionMiddleware,
+	Priority,
+	Rejected,
+	classify,
+)
+from app.main import app
+
+
+def controller(max_concurrency=1, max_queue=2, queue_timeout=1.0):
+	return AdmissionController(
+		max_concurrency,
+		max_queue,
+		queue_timeout,
+		checkout_wait_threshold=0.1,
+		retry_after=3,
+	)
+
+
+@pytest.mark.asyncio
+async def test_admits_up_to_max_concurrency():
+	limiter = controller(max_concurrency=2)
+
+	await limiter.acquire(Priority.READ)
+	await limiter.acquire(Priority.READ)
+
+	assert limiter.stats()['active'] == 2
+
+
+@pytest.mark.asyncio
+async def test_writes_are_admitted_before_reads():
+	limiter = controller()
+	await limiter.acquire(Priority.DEFAULT)
+	admitted = []
+
+	async def request(priority):
+		await limiter.acquire(priority)
+		admitted.append(priority)
+
+	read = asyncio.create_task(request(Priority.READ))
+	write = asyncio.create_task(request(Priority.WRITE))
+	await asyncio.sleep(0)
+	assert limiter.queued == 2
+
+	limiter.release()
+	await asyncio.sleep(0)
+	limiter.release()
+	await asyncio.gather(read, write)
+
+	assert admitted == [Priority.WRITE, Priority.READ]
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_is_full():
+	limiter = controller(max_queue=1)
+	await limiter.acquire(Priority.DEFAULT)
+	waiting = asyncio.create_task(limiter.acquire(Priority.READ))
+	await asyncio.sleep(0)
+
+	with pytest.raises(Rejected, match='queue full'):
+		await limiter.acquire(Priority.READ)
+
+	waiting.cancel()
+
+
+@pytest.mark.asyncio
+async def test_write_evicts_queued_read():
+	limiter = controller(max_queue=1)
+	await limiter.acquire(Priority.DEFAULT)
+	read = asyncio.create_task(limiter.acquire(Priority.READ))
+	await asyncio.sleep(0)
+
+	write = asyncio.create_task(limiter.acquire(Priority.WRITE))
+	await asyncio.sleep(0)
+
+	with pytest.raises(Rejected):
+		await read
+	limiter.release()
+	await write
+	assert limiter.stats()['rejected'] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejects_after_queue_timeout():
+	limiter = controller(queue_timeout=0.01)
+	await limiter.acquire(Priority.DEFAULT)
+
+	with pytest.raises(Rejected, match='Timed out'):
+		await limiter.acquire(Priority.READ)
+	assert limiter.waiters == []
+
+	limiter.release()
+	assert limiter.stats()['active'] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+	limiter = controller()
+	await limiter.acquire(Priority.DEFAULT)
+	waiting = asyncio.create_task(limiter.acquire(Priority.READ))
+	await asyncio.sleep(0)
+
+	waiting.cancel()
+	with pytest.raises(asyncio.CancelledError):
+		await waiting
+
+	assert limiter.waiters == []
+
+
+@pytest.mark.asyncio
+async def test_slow_pool_checkout_sheds_everything_but_writes():
+	limiter = controller(max_concurrency=10)
+	for _ in range(10):
+		limiter.observe_checkout_wait(1.0)
+
+	with pytest.raises(Rejected, match='pool saturated'):
+		await limiter.acquire(Priority.READ)
+	with pytest.raises(Rejected, match='pool saturated'):
+		await limiter.acquire(Priority.DEFAULT)
+	await limiter.acquire(Priority.WRITE)
+
+
+def test_classify():
+	assert classify({'method': 'POST', 'path': '/rental/'}) == Priority.WRITE
+	assert classify({'method': 'PATCH', 'path': '/rental/1'}) == Priority.WRITE
+	assert classify({'method': 'GET', 'path': '/rental/'}) == Priority.DEFAULT
+	assert classify({'method': 'GET', 'path': '/costumes/1'}) == Priority.READ
+
+
+def test_middleware_returns_503_with_retry_after(client: TestClient):
+	limiter = controller()
+	limiter.observe_checkout_wait(10.0)
+	admission_client = TestClient(AdmissionMiddleware(app, limiter))
+
+	response = admission_client.get('/costumes/')
+
+	assert response.status_code == 503
+	assert response.headers['retry-after'] == '3'
+	assert response.json() == {'detail': 'Database pool saturated.'}
+
+
+def test_middleware_releases_slot(client: TestClient):
+	limiter = controller()
+	admission_client = TestClient(AdmissionMiddleware(app, limiter))
+
+	assert admission_client.get('/costumes/').status_code == 200
+	assert admission_client.get('/costumes/').status_code == 200
+	assert limiter.stats()['active'] == 0
@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import archival, customer_stats, rental_view, rollups
+from app.models import CustomerStats, Rental, RentalHistory, RentalView
+from tests.factories import RentalFactory
+from tests.test_rollups import stored_rollups
+
+
+def test_partition_names():
+	assert archival.partition_name(date(2026, 3, 1)) == 'rental_y2026m03'
+	assert archival.partition_month('rental_y2026m03') == date(2026, 3, 1)
+	assert archival.partition_month(archival.DEFAULT_PARTITION) is None
+
+
+@pytest.mark.asyncio
+async def test_create_partitions_skips_unpartitioned_rental(test_session):
+	assert await archival.create_partitions(test_session, months_ahead=3) == []
+
+
+async def stored_stats(session):
+	rows = await session.execute(
+		select(
+			CustomerStats.customer_id,
+			CustomerStats.rentals,
+			CustomerStats.open_rentals,
+			CustomerStats.spend,
+		)
+	)
+	return [tuple(row) for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_returned_rentals(
+	test_session, user, customer, costume
+):
+	now = datetime.now()
+	rentals = [
+		RentalFactory(
+			user_id=user.id,
+			customer_id=customer.id,
+			costume_id=costume.id,
+			rental_date=start,
+			return_date=start + timedelta(days=7),
+			fee=100.0,
+			returned_at=returned_at,
+		)
+		for start, returned_at in (
+			(now - timedelta(days=400), now - timedelta(days=390)),
+			(now - timedelta(days=380), now - timedelta(days=370)),
+			(now - timedelta(days=370), None),  # Still out
+			(now - timedelta(days=3), None),
+		)
+	]
+	test_session.add_all(rentals)
+	await test_session.commit()
+	await rental_view.rebuild(test_session)
+	await customer_stats.rebuild(test_session)
+	await rollups.rebuild(test_session)
+	await test_session.commit()
+	recorded = await stored_rollups(test_session)
+
+	assert await archival.archive(test_session, timedelta(days=365), batch_size=1) == 2
+
+	still_out = [rental.id for rental in rentals[2:]]
+	assert (
+		await test_session.scalars(select(Rental.id).order_by(Rental.id))
+	).all() == still_out
+	assert (
+		await test_session.scalars(select(RentalView.id).order_by(RentalView.id))
+	).all() == still_out
+	history = (
+		await test_session.scalars(select(RentalHistory).order_by(RentalHistory.id))
+	).all()
+	assert [(row.id, row.rental_date) for row in history] == [
+		(rental.id, rental.rental_date) for rental in rentals[:2]
+	]
+
+	assert await stored_stats(test_session) == [(customer.id, 4, 2, 400.0)]
+
+	# The archive is part of the history the read models are rebuilt from
+	await customer_stats.rebuild(test_session)
+	assert await stored_stats(test_session) == [(customer.id, 4, 2, 400.0)]
+	assert await rollups.rebuild(test_session) == 4
+	assert await stored_rollups(test_session) == recorded
+
+	assert await archival.archive(test_session, timedelta(days=365)) == 0
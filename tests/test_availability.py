@@ -0,0 +1,197 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import availability
+from app.models import AvailabilityEvent, CostumeAvailability
+
+
+def hub(test_session) -> availability.AvailabilityHub:
+	return availability.AvailabilityHub(
+		True, 0.01, async_sessionmaker(test_session.bind, expire_on_commit=False)
+	)
+
+
+async def add_events(session, costume_id, *changes):
+	for change in changes:
+		session.add(
+			AvailabilityEvent(
+				costume_id=costume_id,
+				availability=change,
+				created_at=datetime.now(),
+			)
+		)
+	await session.commit()
+
+
+def parse(messages: list[str]) -> list[tuple]:
+	"""The (id, event, data) of each SSE message, skipping retry and comments."""
+	parsed = []
+	for message in messages:
+		fields = dict(
+			line.split(': ', 1)
+			for line in message.strip().splitlines()
+			if not line.startswith(':')
+		)
+		if 'event' in fields:
+			parsed.append((
+				int(fields['id']),
+				fields['event'],
+				json.loads(fields['data']),
+			))
+
+	return parsed
+
+
+async def collect(events: availability.AvailabilityHub, last_event_id, rounds=1):
+	"""The messages streamed until the client disconnects after `rounds` waits."""
+	waits = iter(range(rounds))
+
+	async def disconnected():
+		return next(waits, None) is None
+
+	return [message async for message in events.stream(last_event_id, disconnected)]
+
+
+@pytest.mark.asyncio
+async def test_changes_are_recorded(
+	client: TestClient, token, available_costume, customer, test_session
+):
+	headers = {'Authorization': f'Bearer {token}'}
+	client.post(
+		'/rental',
+		headers=headers,
+		json={'costume_id': available_costume.id, 'customer_id': customer.id},
+	)
+	client.post('/rental/1/return', headers=headers)
+	client.put(
+		f'/costumes/{available_costume.id}',
+		headers=headers,
+		json={
+			'name': available_costume.name,
+			'description': available_costume.description,
+			'fee': available_costume.fee,
+			'availability': 'available',
+		},
+	)
+
+	events = (
+		await test_session.scalars(
+			select(AvailabilityEvent).order_by(AvailabilityEvent.id)
+		)
+	).all()
+	# Saving it unchanged is not a change
+	assert [(event.costume_id, event.availability) for event in events] == [
+		(available_costume.id, CostumeAvailability.UNAVAILABLE),
+		(available_costume.id, CostumeAvailability.AVAILABLE),
+	]
+
+
+@pytest.mark.asyncio
+async def test_fetch_broadcasts_in_order(test_session, monkeypatch):
+	events = hub(test_session)
+	await events.start()
+	queue = events.subscribe()
+	await add_events(test_session, 1, CostumeAvailability.UNAVAILABLE)
+	await add_events(test_session, 2, CostumeAvailability.UNAVAILABLE)
+	await add_events(test_session, 1, CostumeAvailability.AVAILABLE)
+	# As if the second event were not committed yet
+	await test_session.delete(await test_session.get(AvailabilityEvent, 2))
+	await test_session.commit()
+
+	await events.fetch()
+	assert [data['id'] for data in queue.get_nowait()] == [1]
+	assert queue.empty()
+
+	# A rolled back transaction leaves the gap for good
+	monkeypatch.setattr('app.availability.GAP_WAIT', 0.0)
+	await events.fetch()
+	assert queue.get_nowait() == [
+		{'id': 3, 'costume_id': 1, 'availability': 'available'}
+	]
+	assert events.last_id == 3
+
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_catch_up_from_the_table(test_session, monkeypatch):
+	monkeypatch.setattr('app.availability.settings.AVAILABILITY_QUEUE_SIZE', 1)
+	events = hub(test_session)
+	await events.start()
+	queue = events.subscribe()
+
+	events.broadcast([{'id': 1}])
+	events.broadcast([{'id': 2}])
+	assert queue.get_nowait() is availability.LAGGED
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_after_last_event_id(test_session):
+	await add_events(
+		test_session,
+		1,
+		CostumeAvailability.UNAVAILABLE,
+		CostumeAvailability.AVAILABLE,
+		CostumeAvailability.UNAVAILABLE,
+	)
+	events = hub(test_session)
+	await events.start()
+
+	messages = await collect(events, 1, rounds=0)
+	assert messages[0].startswith('retry: ')
+	assert parse(messages) == [
+		(2, 'availability', {'costume_id': 1, 'availability': 'available'}),
+		(3, 'availability', {'costume_id': 1, 'availability': 'unavailable'}),
+	]
+	# Nothing missed, nothing to resend
+	assert parse(await collect(events, 3, rounds=0)) == []
+
+
+@pytest.mark.asyncio
+async def test_stream_resets_when_history_is_gone(test_session):
+	await add_events(
+		test_session, 1, CostumeAvailability.UNAVAILABLE, CostumeAvailability.AVAILABLE
+	)
+	await test_session.delete(await test_session.get(AvailabilityEvent, 1))
+	await test_session.commit()
+	events = hub(test_session)
+	await events.start()
+
+	assert parse(await collect(events, 0, rounds=0)) == [(2, 'reset', {})]
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_live_events(test_session):
+	events = hub(test_session)
+	await events.start()
+
+	async def publish():
+		while not events.subscribers:
+			await asyncio.sleep(0)
+		await add_events(test_session, 7, CostumeAvailability.UNAVAILABLE)
+		await events.fetch()
+
+	messages, _ = await asyncio.gather(collect(events, None), publish())
+	assert parse(messages) == [
+		(1, 'availability', {'costume_id': 7, 'availability': 'unavailable'})
+	]
+	assert not events.subscribers
+
+
+@pytest.mark.asyncio
+async def test_stream_keeps_idle_connections_alive(test_session, monkeypatch):
+	monkeypatch.setattr('app.availability.settings.AVAILABILITY_KEEPALIVE', 0.01)
+	events = hub(test_session)
+
+	assert (await collect(events, None))[1:] == [': keepalive\n\n']
+
+
+def test_stream_disabled(client: TestClient):
+	response = client.get('/costumes/availability/stream')
+
+	assert response.status_code == 503
+	assert response.json() == {'detail': 'Availability stream disabled.'}
@@ -0,0 +1,96 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.cache import CostumeCache
+from app.models import CostumeAvailability
+
+
+def worker_cache(test_session):
+	return CostumeCache(
+		enabled=True,
+		poll_interval=1.0,
+		session_factory=async_sessionmaker(test_session.bind, expire_on_commit=False),
+		notify=False,
+	)
+
+
+@pytest.mark.asyncio
+async def test_cache_serves_reads_from_memory(test_session, costume):
+	cache = worker_cache(test_session)
+	await cache.poll_once()
+
+	assert (await cache.get(test_session, costume.id))['name'] == costume.name
+	assert [c['id'] for c in await cache.list(test_session, None)] == [costume.id]
+
+	costume.name = 'Renamed behind the cache'
+	await test_session.commit()
+
+	assert (await cache.get(test_session, costume.id))['name'] != costume.name
+	assert await cache.get(test_session, 404) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidation_reaches_other_workers(test_session, costume):
+	writer, reader = worker_cache(test_session), worker_cache(test_session)
+	await reader.poll_once()
+	await reader.get(test_session, costume.id)
+	await reader.list(test_session, CostumeAvailability(costume.availability))
+
+	costume.name = 'Updated by another worker'
+	await writer.invalidate(test_session, costume.id)
+	await test_session.commit()
+	assert reader.by_id
+
+	await reader.poll_once()
+	assert reader.by_id == {}
+	assert reader.by_availability == {}
+	assert (await reader.get(test_session, costume.id))['name'] == costume.name
+
+	# Nothing changed since: the cache is kept
+	await reader.poll_once()
+	assert costume.id in reader.by_id
+
+
+@pytest.mark.asyncio
+async def test_load_racing_an_invalidation_is_not_kept(
+	test_session, costume, monkeypatch
+):
+	cache = worker_cache(test_session)
+	scalar = test_session.scalar
+
+	async def scalar_then_invalidate(query):
+		result = await scalar(query)
+		cache.discard(costume.id)
+		return result
+
+	monkeypatch.setattr(test_session, 'scalar', scalar_then_invalidate)
+
+	assert (await cache.get(test_session, costume.id))['id'] == costume.id
+	assert cache.by_id == {}
+
+
+def test_costume_routes_use_cache(
+	client: TestClient, test_session, costume, token, monkeypatch
+):
+	cache = worker_cache(test_session)
+	cache.active = True
+	monkeypatch.setattr('app.routes.costumes.costume_cache', cache)
+
+	assert client.get('/costumes/').json()['costumes'][0]['name'] == costume.name
+	assert client.get(f'/costumes/{costume.id}').json()['name'] == costume.name
+	assert client.get('/costumes/404').status_code == 404
+	assert costume.id in cache.by_id
+
+	client.put(
+		f'/costumes/{costume.id}',
+		headers={'Authorization': f'Bearer {token}'},
+		json={
+			'name': 'Astronauta',
+			'description': 'Capacete espacial',
+			'fee': 80.0,
+			'availability': 'available',
+		},
+	)
+	assert client.get(f'/costumes/{costume.id}').json()['name'] == 'Astronauta'
+	assert client.get('/costumes/?skip=1').json() == {'costumes': []}
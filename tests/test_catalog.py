@@ -0,0 +1,17 @@
+import pytest
+
+from app.catalog import BENCHMARKS, catalog_query, explain, next_cursor
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('params', BENCHMARKS.values(), ids=BENCHMARKS)
+async def test_catalog_queries_scan_an_index(test_session, costume, params):
+	sort = params.get('sort', 'id')
+	query = catalog_query(**params, cursor=next_cursor(costume, sort))
+
+	[plan, *steps] = await explain(test_session, query.limit(50))
+
+	assert plan.startswith('SEARCH costumes USING')
+	# Only a fee range sorted by id cannot follow an index
+	if steps:
+		assert params == {'min_fee': 100, 'max_fee': 200}
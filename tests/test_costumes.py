@@ -1,7 +1,10 @@
 from http import HTTPStatus
 
+import pytest
 from fastapi.testclient import TestClient
 
+from app.pagination import encode_cursor
+
 
 def test_get_costumes(client: TestClient):
 	response = client.get('/costumes')
@@ -126,3 +129,239 @@ def test_delete_costume_not_registered(client: TestClient, user, token):
 	)
 	assert response.status_code == 404
 	assert response.json() == {'detail': 'Costume not registered.'}
+
+
+def create_costumes(client: TestClient, token, costumes):
+	for name, description, availability in costumes:
+		client.post(
+			'/costumes',
+			headers={'Authorization': f'Bearer {token}'},
+			json={
+				'name': name,
+				'description': description,
+				'fee': 50.0,
+				'availability': availability,
+			},
+		)
+
+
+def test_search_costumes(client: TestClient, user, token):
+	create_costumes(
+		client,
+		token,
+		[
+			('Pirata', 'Chapéu de pirata com pena no chapéu', 'available'),
+			('Bruxa', 'Vestido preto com chapéu pontudo', 'available'),
+			('Vampiro', 'Capa preta', 'unavailable'),
+		],
+	)
+
+	response = client.get('/costumes/search?q=chapéu')
+	assert response.status_code == 200
+	assert [c['name'] for c in response.json()['costumes']] == ['Pirata', 'Bruxa']
+
+	response = client.get('/costumes/search?q=preta&availability=available')
+	assert response.json() == {'costumes': []}
+
+	response = client.get('/costumes/search?q=chapéu pontudo')
+	assert [c['name'] for c in response.json()['costumes']] == ['Bruxa']
+
+
+def test_search_costumes_cursor(client: TestClient, user, token):
+	create_costumes(
+		client,
+		token,
+		[(f'Palhaço {n}', 'Nariz vermelho', 'available') for n in range(5)],
+	)
+
+	names = []
+	cursor = None
+	while True:
+		params = {'q': 'nariz', 'limit': 2}
+		if cursor:
+			params['cursor'] = cursor
+		response = client.get('/costumes/search', params=params)
+		names += [c['name'] for c in response.json()['costumes']]
+		cursor = response.headers.get('X-Next-Cursor')
+		if not cursor:
+			break
+
+	assert names == [f'Palhaço {n}' for n in range(5)]
+
+
+@pytest.mark.parametrize(
+	'cursor', ['nope', encode_cursor([1], 1), encode_cursor('x', 1), 'W251bGwsIG51bGxd']
+)
+def test_search_costumes_invalid_cursor(client: TestClient, cursor):
+	response = client.get('/costumes/search', params={'q': 'nariz', 'cursor': cursor})
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Invalid cursor.'}
+
+
+def test_search_index_follows_updates_and_deletes(client: TestClient, costume, token):
+	client.put(
+		f'/costumes/{costume.id}',
+		headers={'Authorization': f'Bearer {token}'},
+		json={
+			'name': 'Astronauta',
+			'description': 'Capacete espacial',
+			'fee': 80.0,
+			'availability': 'available',
+		},
+	)
+	assert client.get('/costumes/search?q=capacete').json()['costumes'][0]['id'] == (
+		costume.id
+	)
+
+	client.delete(
+		f'/costumes/{costume.id}', headers={'Authorization': f'Bearer {token}'}
+	)
+	assert client.get('/costumes/search?q=capacete').json() == {'costumes': []}
+
+
+def test_get_costumes_sparse_fields(client: TestClient, costume):
+	response = client.get('/costumes/?fields=name,id')
+	assert response.status_code == 200
+	assert response.json() == {'costumes': [{'id': costume.id, 'name': costume.name}]}
+
+	response = client.get(f'/costumes/{costume.id}?fields=fee')
+	assert response.json() == {'fee': costume.fee}
+
+	response = client.get('/costumes/search', params={'q': 'x', 'fields': 'name'})
+	assert response.json() == {'costumes': []}
+
+
+def test_get_costumes_unknown_fields(client: TestClient):
+	response = client.get('/costumes/?fields=name,password')
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Unknown fields: password.'}
+
+	response = client.get('/costumes/1?fields=name.first')
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Unknown fields: name.first.'}
+
+
+def test_get_costumes_total(client: TestClient, costume, token):
+	response = client.get('/costumes/?total=true&limit=0')
+	assert response.json() == {'costumes': []}
+	assert response.headers['X-Total-Count'] == '1'
+	assert response.headers['X-Total-Count-Exact'] == 'true'
+
+	availability = costume.availability.value
+	other = 'available' if availability == 'unavailable' else 'unavailable'
+	client.put(
+		f'/costumes/{costume.id}',
+		headers={'Authorization': f'Bearer {token}'},
+		json={
+			'name': costume.name,
+			'description': costume.description,
+			'fee': costume.fee,
+			'availability': other,
+		},
+	)
+	response = client.get(f'/costumes/?total=true&availability={other}&fields=id')
+	assert response.json() == {'costumes': [{'id': costume.id}]}
+	assert response.headers['X-Total-Count'] == '1'
+	response = client.get(f'/costumes/?total=true&availability={availability}')
+	assert response.headers['X-Total-Count'] == '0'
+
+	client.delete(
+		f'/costumes/{costume.id}', headers={'Authorization': f'Bearer {token}'}
+	)
+	assert client.get('/costumes/?total=true').headers['X-Total-Count'] == '0'
+	assert 'X-Total-Count' not in client.get('/costumes/').headers
+
+
+@pytest.fixture
+def catalog(client: TestClient, token):
+	for name, fee, availability in (
+		('Bruxa', 50.0, 'available'),
+		('Pirata', 120.0, 'unavailable'),
+		('Astronauta', 120.0, 'available'),
+		('Dinossauro', 300.0, 'available'),
+	):
+		client.post(
+			'/costumes',
+			headers={'Authorization': f'Bearer {token}'},
+			json={
+				'name': name,
+				'description': 'Fantasia',
+				'fee': fee,
+				'availability': availability,
+			},
+		)
+
+
+@pytest.mark.parametrize(
+	('params', 'names'),
+	[
+		({}, ['Bruxa', 'Pirata', 'Astronauta', 'Dinossauro']),
+		({'sort': '-id'}, ['Dinossauro', 'Astronauta', 'Pirata', 'Bruxa']),
+		({'sort': 'name'}, ['Astronauta', 'Bruxa', 'Dinossauro', 'Pirata']),
+		({'sort': 'fee'}, ['Bruxa', 'Pirata', 'Astronauta', 'Dinossauro']),
+		({'sort': '-fee'}, ['Dinossauro', 'Astronauta', 'Pirata', 'Bruxa']),
+		({'min_fee': 100, 'max_fee': 120}, ['Pirata', 'Astronauta']),
+		(
+			{'availability': 'available', 'min_fee': 100, 'sort': '-fee'},
+			['Dinossauro', 'Astronauta'],
+		),
+	],
+)
+def test_get_costumes_filtered_and_sorted(client: TestClient, catalog, params, names):
+	# One costume per page, so every page continues from a cursor
+	seen = []
+	params = {**params, 'limit': 1}
+	while True:
+		response = client.get('/costumes/', params=params)
+		assert response.status_code == 200
+		seen += [costume['name'] for costume in response.json()['costumes']]
+		if 'X-Next-Cursor' not in response.headers:
+			break
+		params['cursor'] = response.headers['X-Next-Cursor']
+
+	assert seen == names
+
+
+def test_get_costumes_fee_range_total(client: TestClient, catalog):
+	response = client.get('/costumes/?min_fee=100&total=true&limit=1&fields=name')
+	assert response.json() == {'costumes': [{'name': 'Pirata'}]}
+	assert response.headers['X-Total-Count'] == '3'
+
+
+def test_get_costumes_cursor_of_another_sort(client: TestClient, catalog):
+	response = client.get('/costumes/?sort=fee&limit=1')
+	cursor = response.headers['X-Next-Cursor']
+
+	response = client.get('/costumes/', params={'sort': 'name', 'cursor': cursor})
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Invalid cursor.'}
+
+
+def test_get_costumes_by_ids(client: TestClient, catalog):
+	response = client.get('/costumes/batch?ids=3,404,1,3')
+	assert response.status_code == 200
+	assert [costume['name'] for costume in response.json()['costumes']] == [
+		'Astronauta',
+		'Bruxa',
+	]
+	assert response.json()['missing'] == [404]
+
+	response = client.get('/costumes/batch?ids=4,2&fields=fee')
+	assert response.json() == {
+		'costumes': [{'fee': 300.0}, {'fee': 120.0}],
+		'missing': [],
+	}
+
+
+@pytest.mark.parametrize(
+	('ids', 'detail'),
+	[
+		('1,x', 'Ids must be integers.'),
+		(',', 'No ids given.'),
+		(','.join(map(str, range(101))), 'At most 100 ids at a time.'),
+	],
+)
+def test_get_costumes_by_ids_invalid(client: TestClient, ids, detail):
+	response = client.get('/costumes/batch', params={'ids': ids})
+	assert response.status_code == 400
+	assert response.json() == {'detail': detail}
@@ -0,0 +1,93 @@
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import customer_stats
+from app.models import CustomerStats
+from tests.factories import CostumeFactory, CustomerFactory
+
+
+def rent(client: TestClient, token, costume_id, customer_id):
+	return client.post(
+		'/rental',
+		headers={'Authorization': f'Bearer {token}'},
+		json={'costume_id': costume_id, 'customer_id': customer_id},
+	)
+
+
+@pytest_asyncio.fixture
+async def shop(test_session):
+	costumes = [CostumeFactory(fee=fee, availability='available') for fee in (50, 80)]
+	customers = [CustomerFactory(cpf=str(n) * 11) for n in (1, 2)]
+	test_session.add_all(costumes + customers)
+	await test_session.commit()
+
+	return costumes, customers
+
+
+def test_rental_routes_keep_customer_stats(client: TestClient, token, shop):
+	(cheap, dear), (first, second) = shop
+	headers = {'Authorization': f'Bearer {token}'}
+
+	rent(client, token, cheap.id, first.id)
+	rent(client, token, dear.id, first.id)
+	client.post('/rental/1/return', headers=headers)
+	rent(client, token, cheap.id, second.id)
+
+	response = client.get(f'/customers/{first.id}?stats=true', headers=headers)
+	assert response.status_code == 200
+	stats = response.json()['stats']
+	assert stats['rentals'] == 2
+	assert stats['open_rentals'] == 1
+	assert stats['spend'] == 130.0
+	assert stats['last_rental_date'] is not None
+
+	response = client.get(
+		f'/customers/{second.id}?stats=true&fields=name', headers=headers
+	)
+	assert response.json()['name'] == second.name
+	assert response.json()['stats']['spend'] == 50.0
+
+	response = client.get('/customers/top?sort=spend', headers=headers)
+	assert [customer['name'] for customer in response.json()['customers']] == [
+		first.name,
+		second.name,
+	]
+
+
+def test_get_customer_stats_before_any_rental(client: TestClient, token, customer):
+	response = client.get(
+		f'/customers/{customer.id}?stats=true',
+		headers={'Authorization': f'Bearer {token}'},
+	)
+	assert response.json()['stats'] == {
+		'rentals': 0,
+		'open_rentals': 0,
+		'last_rental_date': None,
+		'spend': 0.0,
+	}
+
+	response = client.get(
+		f'/customers/{customer.id}', headers={'Authorization': f'Bearer {token}'}
+	)
+	assert 'stats' not in response.json()
+
+
+@pytest.mark.asyncio
+async def test_rebuild_customer_stats(test_session, rental):
+	test_session.add(
+		CustomerStats(
+			customer_id=rental.customer_id,
+			rentals=9,
+			open_rentals=9,
+			last_rental_date=rental.rental_date,
+			spend=9.0,
+		)
+	)
+	await test_session.commit()
+
+	assert await customer_stats.rebuild(test_session) == 1
+	stats = await test_session.scalar(select(CustomerStats))
+	await test_session.refresh(stats)
+	assert (stats.rentals, stats.open_rentals, stats.spend) == (1, 1, 100.0)
@@ -135,3 +135,88 @@ def test_delete_customer_not_registered(client: TestClient, user, token):
 	)
 	assert response.status_code == 404
 	assert response.json() == {'detail': 'Customer not registered.'}
+
+
+def test_create_customer_normalizes_cpf_and_phone(client: TestClient, user, token):
+	response = client.post(
+		'/customers',
+		headers={'Authorization': f'Bearer {token}'},
+		json={
+			'cpf': '009.009.009-11',
+			'name': 'Cachorro Doido',
+			'email': 'calordamulinga@gmail.com',
+			'phone_number': '+55 (61) 91234-5678',
+			'address': 'Rua 12 Lote 12 Casa 12',
+		},
+	)
+	assert response.status_code == 201
+	assert response.json()['cpf'] == '00900900911'
+	assert response.json()['phone_number'] == '61912345678'
+
+
+def test_create_customer_invalid_cpf(client: TestClient, user, token):
+	response = client.post(
+		'/customers',
+		headers={'Authorization': f'Bearer {token}'},
+		json={
+			'cpf': '009.009',
+			'name': 'Cachorro Doido',
+			'email': 'calordamulinga@gmail.com',
+			'phone_number': '61912345678',
+			'address': 'Rua 12 Lote 12 Casa 12',
+		},
+	)
+	assert response.status_code == 422
+
+
+def test_search_customers(client: TestClient, user, token):
+	headers = {'Authorization': f'Bearer {token}'}
+	for cpf, name, phone_number in [
+		('52998224725', 'Maria da Silva', '61912345678'),
+		('11144477735', 'João Souza', '11987654321'),
+		('52911122233', 'Mariana Costa', '61933334444'),
+	]:
+		client.post(
+			'/customers',
+			headers=headers,
+			json={
+				'cpf': cpf,
+				'name': name,
+				'email': 'cliente@example.com',
+				'phone_number': phone_number,
+				'address': 'Rua 1',
+			},
+		)
+
+	def names(q):
+		response = client.get('/customers/search', headers=headers, params={'q': q})
+		assert response.status_code == 200
+		return [customer['name'] for customer in response.json()['customers']]
+
+	assert names('529.') == ['Maria da Silva', 'Mariana Costa']
+	assert names('(11) 9876') == ['João Souza']
+	assert names('maria') == ['Maria da Silva', 'Mariana Costa']
+	assert names('silva maria') == ['Maria da Silva']
+	assert names('100%') == []
+
+
+def test_get_customers_sparse_fields(client: TestClient, customer, user, token):
+	headers = {'Authorization': f'Bearer {token}'}
+
+	response = client.get('/customers?fields=name&limit=10', headers=headers)
+	assert response.json() == {'customers': [{'name': customer.name}]}
+
+	response = client.get(f'/customers/{customer.id}?fields=cpf', headers=headers)
+	assert response.json() == {'cpf': customer.cpf}
+
+
+def test_get_customers_by_ids(client: TestClient, customer, token):
+	response = client.get(
+		f'/customers/batch?ids=404,{customer.id}&fields=cpf',
+		headers={'Authorization': f'Bearer {token}'},
+	)
+	assert response.status_code == 200
+	assert response.json() == {'customers': [{'cpf': customer.cpf}], 'missing': [404]}
+
+	response = client.get(f'/customers/batch?ids={customer.id}')
+	assert response.status_code == 401
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from factories import CostumeFactory
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import metrics
+from app.group_commit import GroupCommit
+from app.models import CostumeAvailability, Rental
+from app.routes.rental import rent_item, rental_writes
+from app.schemas import RentalInput
+
+
+def group_commit(test_session, work, **options) -> GroupCommit:
+	return GroupCommit(
+		'test_writes',
+		work,
+		session_factory=async_sessionmaker(test_session.bind, expire_on_commit=False),
+		**options,
+	)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rentals_share_one_commit(
+	test_session, user, customer, available_costume
+):
+	other_costume = CostumeFactory(availability=CostumeAvailability.AVAILABLE)
+	test_session.add(other_costume)
+	await test_session.commit()
+	writes = group_commit(test_session, rent_item)
+	batches = metrics.counters['test_writes.batches']
+
+	results = await asyncio.gather(
+		*(
+			writes.submit((user, RentalInput(costume_id=id, customer_id=customer.id)))
+			for id in (available_costume.id, other_costume.id, available_costume.id)
+		),
+		return_exceptions=True,
+	)
+
+	assert metrics.counters['test_writes.batches'] == batches + 1
+	assert [result.costume_id for result in results[:2]] == [
+		available_costume.id,
+		other_costume.id,
+	]
+	# Rejected on its own, the batch went through
+	assert isinstance(results[2], HTTPException)
+	assert results[2].detail == 'Costume unavailable.'
+	assert await test_session.scalar(select(func.count()).select_from(Rental)) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_one_by_one(test_session):
+	async def work(session, item):
+		if item == 'bad':
+			raise RuntimeError('constraint violated')
+		return item
+
+	writes = group_commit(test_session, work)
+	retried = metrics.counters['test_writes.retried']
+
+	results = await asyncio.gather(
+		*map(writes.submit, ['a', 'bad', 'b']), return_exceptions=True
+	)
+
+	assert results[0] == 'a'
+	assert isinstance(results[1], RuntimeError)
+	assert results[2] == 'b'
+	assert metrics.counters['test_writes.retried'] == retried + 3
+
+
+@pytest.mark.asyncio
+async def test_full_batch_does_not_wait_for_the_window(test_session):
+	async def work(session, item):
+		return item
+
+	writes = group_commit(test_session, work, window=60.0, max_size=2)
+
+	results = await asyncio.wait_for(
+		asyncio.gather(writes.submit(1), writes.submit(2)), 5
+	)
+
+	assert results == [1, 2]
+	assert writes.timer is None
+
+
+@pytest.mark.asyncio
+async def test_create_rental_with_group_commit(
+	client: TestClient, token, available_costume, customer, test_session, monkeypatch
+):
+	monkeypatch.setattr(rental_writes, 'enabled', True)
+	monkeypatch.setattr(
+		rental_writes,
+		'session_factory',
+		async_sessionmaker(test_session.bind, expire_on_commit=False),
+	)
+	items = metrics.counters['rental_writes.items']
+
+	response = client.post(
+		'/rental',
+		headers={'Authorization': f'Bearer {token}'},
+		json={'costume_id': available_costume.id, 'customer_id': customer.id},
+	)
+
+	assert response.status_code == 201
+	assert response.json()['costume']['id'] == available_costume.id
+	assert response.json()['customer']['cpf'] == customer.cpf
+	assert metrics.counters['rental_writes.items'] == items + 1
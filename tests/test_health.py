@@ -0,0 +1,128 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import QueuePool
+
+from app import background
+from app.database import pool_status
+from app.main import app
+
+
+def test_liveness(client: TestClient):
+	response = client.get('/health/live')
+	assert response.status_code == 200
+	assert response.json() == {'status': 'ok'}
+
+
+def test_readiness(client: TestClient):
+	response = client.get('/health/ready')
+	assert response.status_code == 200
+	assert response.json()['status'] == 'ok'
+	assert response.json()['database'] == 'ok'
+	assert response.json()['pool']['saturated'] is False
+	assert response.json()['admission']['active'] == 0
+
+
+def test_readiness_fails_when_pool_saturated(client: TestClient, monkeypatch):
+	monkeypatch.setattr(
+		'app.routes.health.pool_status',
+		lambda: {'pool': 'QueuePool', 'saturated': True},
+	)
+
+	response = client.get('/health/ready')
+	assert response.status_code == 503
+	assert response.json()['status'] == 'unavailable'
+
+
+def test_readiness_reports_background_tasks(monkeypatch):
+	monkeypatch.setattr('app.main.costume_cache.enabled', True)
+
+	with TestClient(app) as client:
+		response = client.get('/health/ready')
+
+	assert response.json()['background_tasks'] == {
+		'costume-cache': 'running',
+		'idempotency-keys': 'running',
+		'costume-holds': 'running',
+	}
+	assert background.tasks == {}
+
+
+def test_readiness_fails_when_background_task_died(monkeypatch):
+	async def crash():
+		raise RuntimeError('boom')
+
+	monkeypatch.setattr('app.main.costume_cache.enabled', True)
+	monkeypatch.setattr('app.main.costume_cache.run', crash)
+
+	with TestClient(app) as client:
+		response = client.get('/health/ready')
+
+	assert response.status_code == 503
+	assert response.json()['background_tasks'] == {
+		'costume-cache': 'failed',
+		'idempotency-keys': 'running',
+		'costume-holds': 'running',
+	}
+
+
+class BrokenEngine:
+	def __init__(self, connect_delay=None):
+		self.connect_delay = connect_delay
+
+	@asynccontextmanager
+	async def connect(self):
+		if self.connect_delay is None:
+			raise OSError('connection refused')
+		await asyncio.sleep(self.connect_delay)
+		yield
+
+
+@pytest.mark.parametrize('engine', [BrokenEngine(), BrokenEngine(connect_delay=5)])
+def test_readiness_fails_fast_when_database_is_unreachable(
+	client: TestClient, monkeypatch, engine
+):
+	monkeypatch.setattr('app.database.settings.ADMISSION_ENABLED', True)
+	monkeypatch.setattr('app.routes.health.settings.HEALTH_DB_TIMEOUT', 0.1)
+	monkeypatch.setattr('app.routes.health.async_engine', engine)
+
+	started = time.perf_counter()
+	response = client.get('/health/ready')
+	assert time.perf_counter() - started < 1
+	assert response.status_code == 503
+	assert response.json()['database'] == 'unavailable'
+
+
+def test_pool_status_counts_connections():
+	pool = QueuePool(MagicMock, pool_size=1, max_overflow=1)
+	first = pool.connect()
+	assert pool_status(pool)['saturated'] is False
+
+	second = pool.connect()
+	status = pool_status(pool)
+	assert status['checked_out'] == 2
+	assert status['overflow'] == 1
+	assert status['saturated'] is True
+
+	first.close()
+	second.close()
+
+
+def test_background_status():
+	async def scenario():
+		async def crash():
+			raise RuntimeError('boom')
+
+		background.start('sleeper', lambda: asyncio.sleep(10))
+		background.start('crasher', crash)
+		await asyncio.sleep(0)
+		status = background.status()
+		await background.stop_all()
+		return status
+
+	assert asyncio.run(scenario()) == {'sleeper': 'running', 'crasher': 'failed'}
+	assert background.tasks == {}
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import metrics
+from app.holds import HoldScheduler
+from app.models import Costume
+
+
+def auth(token):
+	return {'Authorization': f'Bearer {token}'}
+
+
+async def stored_hold(session, costume_id):
+	costume = await session.get(Costume, costume_id, populate_existing=True)
+
+	return costume.held_by, costume.held_until
+
+
+def scheduler(test_session) -> HoldScheduler:
+	return HoldScheduler(async_sessionmaker(test_session.bind, expire_on_commit=False))
+
+
+@pytest.mark.asyncio
+async def test_held_costume_is_rented_only_by_its_holder(
+	client: TestClient,
+	token,
+	other_token,
+	user,
+	available_costume,
+	customer,
+	test_session,
+):
+	rental = {'costume_id': available_costume.id, 'customer_id': customer.id}
+
+	response = client.post(
+		'/holds', headers=auth(token), json={'costume_ids': [available_costume.id]}
+	)
+	assert response.status_code == 201
+	[hold] = response.json()['holds']
+	assert hold['costume_id'] == available_costume.id
+	held_by, held_until = await stored_hold(test_session, available_costume.id)
+	assert held_by == user.id
+	assert held_until > datetime.now() + timedelta(seconds=590)
+
+	response = client.post('/rental', headers=auth(other_token), json=rental)
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Costume held for another checkout.'}
+
+	response = client.post('/rental', headers=auth(token), json=rental)
+	assert response.status_code == 201
+	# Renting it consumes the hold
+	assert await stored_hold(test_session, available_costume.id) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_holds_are_all_or_nothing(
+	client: TestClient, token, available_costume, unavailable_costume, test_session
+):
+	costume_ids = [available_costume.id, unavailable_costume.id]
+
+	response = client.post(
+		'/holds', headers=auth(token), json={'costume_ids': costume_ids}
+	)
+
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Costume unavailable.'}
+	assert await stored_hold(test_session, costume_ids[0]) == (None, None)
+
+
+def test_held_costume_cannot_be_held_by_another(
+	client: TestClient, token, other_token, available_costume
+):
+	hold = {'costume_ids': [available_costume.id], 'seconds': 60}
+	client.post('/holds', headers=auth(token), json=hold)
+
+	assert (
+		client.post('/holds', headers=auth(other_token), json=hold).status_code == 400
+	)
+	# Its holder extends it
+	extended = client.post(
+		'/holds', headers=auth(token), json={**hold, 'seconds': 120}
+	).json()
+	assert (
+		extended['holds'][0]['held_until']
+		> (datetime.now() + timedelta(seconds=100)).isoformat()
+	)
+
+
+def test_release_hold(client: TestClient, token, other_token, available_costume):
+	client.post(
+		'/holds', headers=auth(token), json={'costume_ids': [available_costume.id]}
+	)
+
+	response = client.delete(
+		f'/holds/{available_costume.id}', headers=auth(other_token)
+	)
+	assert response.status_code == 404
+	assert response.json() == {'detail': 'Hold not registered.'}
+
+	assert client.get('/holds/count', headers=auth(token)).json() == {'active': 1}
+	response = client.delete(f'/holds/{available_costume.id}', headers=auth(token))
+	assert response.status_code == 200
+	assert response.json() == {'message': 'Hold has been released successfully.'}
+	assert client.get('/holds/count', headers=auth(token)).json() == {'active': 0}
+
+
+@pytest.mark.asyncio
+async def test_expired_holds_stop_counting(
+	client: TestClient, token, other_token, available_costume, customer, test_session
+):
+	client.post(
+		'/holds', headers=auth(token), json={'costume_ids': [available_costume.id]}
+	)
+	costume = await test_session.get(Costume, available_costume.id)
+	costume.held_until = datetime.now() - timedelta(seconds=1)
+	await test_session.commit()
+
+	response = client.post(
+		'/rental',
+		headers=auth(other_token),
+		json={'costume_id': available_costume.id, 'customer_id': customer.id},
+	)
+	assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_scheduler_releases_due_holds(test_session, available_costume, costume):
+	now = datetime.now()
+	for held, held_until in [
+		(available_costume, now - timedelta(seconds=1)),
+		(costume, now + timedelta(minutes=5)),
+	]:
+		held.held_by = 1
+		held.held_until = held_until
+	await test_session.commit()
+	holds = scheduler(test_session)
+	await holds.load()
+	# Scheduled before it was extended: not due any more
+	holds.schedule(costume.id, now - timedelta(seconds=1))
+	expired = metrics.counters['holds.expired']
+
+	assert await holds.release_due() == 1
+	assert await stored_hold(test_session, available_costume.id) == (None, None)
+	assert (await stored_hold(test_session, costume.id))[0] == 1
+	assert metrics.counters['holds.expired'] == expired + 1
+	assert metrics.gauges['holds.scheduled'] == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_wakes_up_for_an_earlier_hold(test_session, available_costume):
+	holds = scheduler(test_session)
+	holds.schedule(0, datetime.now() + timedelta(hours=1))
+	task = asyncio.create_task(holds.run())
+	await asyncio.sleep(0.05)
+
+	held_until = datetime.now() + timedelta(seconds=0.05)
+	available_costume.held_by = 1
+	available_costume.held_until = held_until
+	await test_session.commit()
+	holds.schedule(available_costume.id, held_until)
+	await asyncio.sleep(0.3)
+	task.cancel()
+
+	assert await stored_hold(test_session, available_costume.id) == (None, None)
+	assert len(holds.expiries) == 1
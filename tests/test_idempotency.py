@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import idempotency
+from app.models import IdempotencyKey, Rental, table_registry
+from app.schemas import Message
+
+CUSTOMER = {
+	'cpf': '00900900911',
+	'name': 'Cachorro Doido',
+	'email': 'calordamulinga@gmail.com',
+	'phone_number': '61912345678',
+	'address': 'Rua 12 Lote 12 Casa 12',
+}
+
+
+def headers(token, key):
+	return {'Authorization': f'Bearer {token}', 'Idempotency-Key': key}
+
+
+@pytest.mark.asyncio
+async def test_retried_rental_is_created_once(
+	client: TestClient, token, available_costume, customer, test_session
+):
+	rental = {'costume_id': available_costume.id, 'customer_id': customer.id}
+
+	first = client.post('/rental', headers=headers(token, 'checkout-1'), json=rental)
+	retry = client.post('/rental', headers=headers(token, 'checkout-1'), json=rental)
+
+	assert first.status_code == retry.status_code == 201
+	assert retry.json() == first.json()
+	assert retry.headers['Idempotent-Replayed'] == 'true'
+	assert 'Idempotent-Replayed' not in first.headers
+	assert await test_session.scalar(select(func.count()).select_from(Rental)) == 1
+
+
+def test_retried_customer_is_created_once(client: TestClient, token):
+	first = client.post('/customers', headers=headers(token, 'c-1'), json=CUSTOMER)
+	retry = client.post('/customers', headers=headers(token, 'c-1'), json=CUSTOMER)
+	again = client.post(
+		'/customers', headers={'Authorization': f'Bearer {token}'}, json=CUSTOMER
+	)
+
+	assert retry.status_code == 201
+	assert retry.json() == first.json() == CUSTOMER
+	# Without the key it is a new request
+	assert again.status_code == 400
+
+
+def test_key_reused_for_another_request(client: TestClient, token):
+	client.post('/customers', headers=headers(token, 'c-1'), json=CUSTOMER)
+	response = client.post(
+		'/customers',
+		headers=headers(token, 'c-1'),
+		json={**CUSTOMER, 'cpf': '00900900922'},
+	)
+
+	assert response.status_code == 422
+	assert response.json() == {
+		'detail': 'Idempotency key already used for another request.'
+	}
+
+
+def test_keys_are_per_user(client: TestClient, token, other_user):
+	other_token = client.post(
+		'/auth/token',
+		data={'username': other_user.email, 'password': other_user.clean_password},
+	).json()['access_token']
+	client.post('/customers', headers=headers(token, 'c-1'), json=CUSTOMER)
+	response = client.post(
+		'/customers', headers=headers(other_token, 'c-1'), json=CUSTOMER
+	)
+
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Customer already registered.'}
+
+
+def test_failed_requests_are_not_stored(client: TestClient, token, available_costume):
+	rental = {'costume_id': available_costume.id, 'customer_id': 404}
+
+	first = client.post('/rental', headers=headers(token, 'checkout-1'), json=rental)
+	retry = client.post('/rental', headers=headers(token, 'checkout-1'), json=rental)
+
+	assert first.status_code == retry.status_code == 400
+	assert 'Idempotent-Replayed' not in retry.headers
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_run_again(client: TestClient, token, user, test_session):
+	client.post('/customers', headers=headers(token, 'c-1'), json=CUSTOMER)
+	stored = await test_session.get(IdempotencyKey, (user.id, 'c-1'))
+	stored.expires_at = datetime.now() - timedelta(seconds=1)
+	await test_session.commit()
+
+	response = client.post('/customers', headers=headers(token, 'c-1'), json=CUSTOMER)
+
+	assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_the_first(tmp_path):
+	engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/keys.db')
+	async with engine.begin() as conn:
+		await conn.run_sync(table_registry.metadata.create_all)
+	sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+	async with sessions() as first, sessions() as duplicate:
+		running = await idempotency.claim(first, 1, 'key', 'fingerprint')
+		waiting = asyncio.create_task(
+			idempotency.claim(duplicate, 1, 'key', 'fingerprint')
+		)
+		await asyncio.sleep(0.1)
+		assert not waiting.done()
+
+		await running.save(first, 201, Message(message='created'))
+		await first.commit()
+		replayed = await waiting
+
+	assert running.replay is None
+	assert replayed.replay.status_code == 201
+	assert replayed.replay.body == b'{"message":"created"}'
+	await engine.dispose()
@@ -0,0 +1,139 @@
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import metrics, outbox
+from app.models import OutboxEvent
+
+
+class FailingSink:
+	async def deliver(self, events):
+		raise ConnectionError('downstream is down')
+
+
+def dispatcher(test_session, sink) -> outbox.Dispatcher:
+	return outbox.Dispatcher(
+		sink, async_sessionmaker(test_session.bind, expire_on_commit=False)
+	)
+
+
+async def stored_events(session):
+	return (
+		await session.scalars(
+			select(OutboxEvent)
+			.order_by(OutboxEvent.id)
+			.execution_options(populate_existing=True)
+		)
+	).all()
+
+
+@pytest.mark.asyncio
+async def test_events_are_written_with_the_rental(
+	client: TestClient, token, available_costume, customer, test_session
+):
+	headers = {'Authorization': f'Bearer {token}'}
+	client.post(
+		'/rental',
+		headers=headers,
+		json={'costume_id': available_costume.id, 'customer_id': customer.id},
+	)
+	client.post('/rental/1/return', headers=headers)
+	client.delete('/rental/1', headers=headers)
+
+	events = await stored_events(test_session)
+	assert [event.topic for event in events] == [
+		'rental.created',
+		'rental.returned',
+		'rental.deleted',
+	]
+	assert {event.payload['rental_id'] for event in events} == {1}
+	assert events[0].payload['costume_id'] == available_costume.id
+	assert events[2].payload['returned_at'] == events[1].payload['returned_at']
+
+
+@pytest.mark.asyncio
+async def test_dispatch_to_file(test_session, tmp_path):
+	for n in range(3):
+		outbox.publish(test_session, 'rental.created', {'rental_id': n})
+	await test_session.commit()
+	path = tmp_path / 'outbox.jsonl'
+	events = dispatcher(test_session, outbox.FileSink(str(path)))
+	events.batch_size = 2
+
+	assert await events.dispatch_once() == 2
+	assert metrics.gauges['outbox.pending'] == 1
+	assert await events.dispatch_once() == 1
+	assert await events.dispatch_once() == 0
+	assert metrics.gauges['outbox.pending'] == 0
+	assert metrics.gauges['outbox.lag_seconds'] == 0.0
+
+	lines = [json.loads(line) for line in path.read_text().splitlines()]
+	assert [line['payload']['rental_id'] for line in lines] == [0, 1, 2]
+	assert all(
+		event.delivered_at and event.attempts == 1
+		for event in await stored_events(test_session)
+	)
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_backs_off(test_session, monkeypatch):
+	monkeypatch.setattr('app.outbox.settings.OUTBOX_MAX_ATTEMPTS', 2)
+	outbox.publish(test_session, 'rental.created', {'rental_id': 1})
+	await test_session.commit()
+	events = dispatcher(test_session, FailingSink())
+	failed = metrics.counters['outbox.failed']
+
+	assert await events.dispatch_once() == 1
+	[event] = await stored_events(test_session)
+	assert event.delivered_at is None
+	assert event.attempts == 1
+	assert 'downstream is down' in event.last_error
+	assert event.available_at > datetime.now()
+	assert metrics.counters['outbox.failed'] == failed + 1
+	assert metrics.gauges['outbox.pending'] == 1
+
+	# Not due again until its backoff is over
+	assert await events.dispatch_once() == 0
+
+	event.available_at = datetime.now()
+	await test_session.commit()
+	dead = metrics.counters['outbox.dead']
+	assert await events.dispatch_once() == 1
+	assert metrics.counters['outbox.dead'] == dead + 1
+	# Out of attempts, so no longer pending or claimed
+	assert metrics.gauges['outbox.pending'] == 0
+	[event] = await stored_events(test_session)
+	event.available_at = datetime.now()
+	await test_session.commit()
+	assert await events.dispatch_once() == 0
+
+
+def test_backoff_doubles_up_to_its_max(monkeypatch):
+	monkeypatch.setattr('app.outbox.settings.OUTBOX_BACKOFF_BASE', 1.0)
+	monkeypatch.setattr('app.outbox.settings.OUTBOX_BACKOFF_MAX', 5.0)
+
+	assert [outbox.backoff(attempts) for attempts in range(1, 5)] == [1, 2, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_webhook_sink():
+	received = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		received.append(json.loads(request.content))
+		status = 200 if len(received) == 1 else 503
+		return httpx.Response(status)
+
+	sink = outbox.WebhookSink(
+		'http://downstream.test/events', transport=httpx.MockTransport(handler)
+	)
+	await sink.deliver([{'id': 1}])
+	assert received == [{'events': [{'id': 1}]}]
+
+	with pytest.raises(httpx.HTTPStatusError):
+		await sink.deliver([{'id': 2}])
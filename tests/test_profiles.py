@@ -0,0 +1,115 @@
+import pstats
+
+import pytest
+from fastapi.testclient import TestClient
+from jwt import encode
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.main import app
+from app.profiling import ProfileStore, ProfilingMiddleware
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+	profile_store = ProfileStore(tmp_path, keep=2)
+	monkeypatch.setattr('app.routes.profiles.profile_store', profile_store)
+
+	return profile_store
+
+
+@pytest.fixture
+def profiling_client(client: TestClient, test_session, store):
+	session_factory = async_sessionmaker(test_session.bind, expire_on_commit=False)
+
+	return TestClient(
+		ProfilingMiddleware(app, store=store, session_factory=session_factory)
+	)
+
+
+def test_profile_admin_request(profiling_client: TestClient, store, token, tmp_path):
+	response = profiling_client.get(
+		'/costumes/404',
+		headers={'Authorization': f'Bearer {token}', 'X-Profile': '1'},
+	)
+	assert response.status_code == 404
+
+	[info] = store.list()
+	assert info['route'] == '/costumes/{costume_id}'
+	assert info['status_code'] == 404
+	assert pstats.Stats(str(store.path(info['id']))).total_calls > 0
+
+
+def test_profile_query_flag(profiling_client: TestClient, store, token):
+	profiling_client.get(
+		'/costumes/?profile=1', headers={'Authorization': f'Bearer {token}'}
+	)
+
+	assert len(store.list()) == 1
+
+
+def test_profile_requires_flag_and_admin(
+	profiling_client: TestClient, store, token, other_token
+):
+	profiling_client.get('/costumes/', headers={'Authorization': f'Bearer {token}'})
+	profiling_client.get('/costumes/', headers={'X-Profile': '1'})
+	profiling_client.get(
+		'/costumes/',
+		headers={'Authorization': f'Bearer {other_token}', 'X-Profile': '1'},
+	)
+
+	assert store.list() == []
+
+
+def test_profile_ignores_unsigned_token(profiling_client: TestClient, store, user):
+	unsigned = encode({'sub': user.email}, key=None, algorithm='none')
+
+	response = profiling_client.get(
+		'/costumes/', headers={'Authorization': f'Bearer {unsigned}', 'X-Profile': '1'}
+	)
+
+	assert response.status_code == 200
+	assert store.list() == []
+
+
+def test_profiles_are_pruned(profiling_client: TestClient, store, token):
+	for _ in range(3):
+		profiling_client.get(
+			'/costumes/', headers={'Authorization': f'Bearer {token}', 'X-Profile': '1'}
+		)
+
+	assert len(store.list()) == 2
+
+
+def test_list_and_download_profiles(profiling_client: TestClient, store, token):
+	profiling_client.get(
+		'/costumes/', headers={'Authorization': f'Bearer {token}', 'X-Profile': '1'}
+	)
+	[info] = store.list()
+
+	response = profiling_client.get(
+		'/profiles/', headers={'Authorization': f'Bearer {token}'}
+	)
+	assert response.status_code == 200
+	assert response.json()['profiles'][0]['id'] == info['id']
+
+	response = profiling_client.get(
+		f'/profiles/{info["id"]}', headers={'Authorization': f'Bearer {token}'}
+	)
+	assert response.status_code == 200
+	assert response.content == store.path(info['id']).read_bytes()
+
+
+def test_download_profile_not_found(client: TestClient, store, token):
+	response = client.get(
+		'/profiles/missing', headers={'Authorization': f'Bearer {token}'}
+	)
+	assert response.status_code == 404
+	assert response.json() == {'detail': 'Profile not found.'}
+
+
+def test_list_profiles_requires_admin(client: TestClient, store, other_token):
+	response = client.get(
+		'/profiles/', headers={'Authorization': f'Bearer {other_token}'}
+	)
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Not enough permissions'}
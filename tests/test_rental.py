@@ -1,3 +1,6 @@
+from datetime import datetime, timedelta
+
+import pytest_asyncio
 from fastapi.testclient import TestClient
 
 from app.routes.rental import set_rental_attr
@@ -148,3 +151,137 @@ def test_delete_rental_not_registered(client: TestClient, user, token):
 	)
 	assert response.status_code == 404
 	assert response.json() == {'detail': 'Rental not registered.'}
+
+
+def rent(client: TestClient, headers, costume_id, customer_id):
+	return client.post(
+		'/rental',
+		headers=headers,
+		json={'costume_id': costume_id, 'customer_id': customer_id},
+	)
+
+
+def test_return_rental(client: TestClient, token, available_costume, customer):
+	headers = {'Authorization': f'Bearer {token}'}
+	rent(client, headers, available_costume.id, customer.id)
+
+	response = client.post('/rental/1/return', headers=headers)  # The only rental
+	assert response.status_code == 200
+	assert response.json() == {'message': 'Rental has been returned successfully.'}
+
+	assert client.get('/rental/1', headers=headers).json()['returned_at'] is not None
+	response = client.get(f'/costumes/{available_costume.id}', headers=headers)
+	assert response.json()['availability'] == 'available'
+
+	response = client.get('/rental/?returned=false', headers=headers)
+	assert response.json()['rental_list'] == []
+	response = client.get('/rental/?returned=true', headers=headers)
+	assert len(response.json()['rental_list']) == 1
+
+	response = client.post('/rental/1/return', headers=headers)
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Rental already returned.'}
+
+	response = client.post('/rental/404/return', headers=headers)
+	assert response.status_code == 404
+	assert response.json() == {'detail': 'Rental not registered.'}
+
+
+def test_delete_returned_rental_leaves_costume_out(
+	client: TestClient, token, available_costume, customer
+):
+	headers = {'Authorization': f'Bearer {token}'}
+	rent(client, headers, available_costume.id, customer.id)
+	client.post('/rental/1/return', headers=headers)
+	rent(client, headers, available_costume.id, customer.id)
+
+	response = client.delete('/rental/1', headers=headers)
+	assert response.status_code == 200
+
+	response = client.get(f'/costumes/{available_costume.id}', headers=headers)
+	assert response.json()['availability'] == 'unavailable'
+
+
+def test_read_rental_sparse_fields(client: TestClient, user, token, rental):
+	headers = {'Authorization': f'Bearer {token}'}
+
+	response = client.get(
+		'/rental/?fields=costume.name,rental_date,customer', headers=headers
+	)
+	assert response.status_code == 200
+	[item] = response.json()['rental_list']
+	assert list(item) == ['rental_date', 'costume', 'customer']
+	assert item['costume'] == {'name': rental.costumes.name}
+	assert item['customer']['cpf'] == rental.customers.cpf
+
+	response = client.get(f'/rental/{rental.id}?fields=user.email', headers=headers)
+	assert response.json() == {'user': {'email': rental.users.email}}
+
+	response = client.get('/rental/?fields=user.password', headers=headers)
+	assert response.status_code == 400
+
+
+@pytest_asyncio.fixture
+async def rentals(test_session, user, other_user, customer, available_costume):
+	"""Five rentals a day apart, newest last; the odd ones by `other_user`."""
+	start = datetime(2026, 3, 1)
+	rentals = [
+		RentalFactory(
+			user_id=other_user.id if day % 2 else user.id,
+			customer_id=customer.id,
+			costume_id=available_costume.id,
+			rental_date=start + timedelta(days=day),
+			return_date=start + timedelta(days=day + 7),
+		)
+		for day in range(5)
+	]
+	test_session.add_all(rentals)
+	await test_session.commit()
+
+	return rentals
+
+
+def test_read_rental_list_filters(client: TestClient, token, rentals):
+	headers = {'Authorization': f'Bearer {token}'}
+
+	def dates(params):
+		response = client.get('/rental/', params=params, headers=headers)
+		assert response.status_code == 200
+		return [rental['rental_date'] for rental in response.json()['rental_list']]
+
+	newest_first = [rental.rental_date.isoformat() for rental in reversed(rentals)]
+	assert dates({'customer_id': rentals[0].customer_id}) == newest_first
+	assert dates({'customer_id': 404}) == []
+	assert dates({'user_id': rentals[1].user_id}) == newest_first[1::2]
+	assert dates({'costume_id': rentals[0].costume_id}) == newest_first
+	assert (
+		dates({
+			'rented_from': '2026-03-02T00:00:00',
+			'rented_until': '2026-03-04T00:00:00',
+		})
+		== newest_first[2:4]
+	)
+	# Soonest due first
+	assert dates({'due_from': '2026-03-10T00:00:00'}) == newest_first[2::-1]
+
+
+def test_read_rental_list_cursor(client: TestClient, token, rentals):
+	headers = {'Authorization': f'Bearer {token}'}
+
+	for params, expected in (
+		({}, list(reversed(rentals))),
+		({'due_until': '2026-03-20T00:00:00'}, rentals),
+	):
+		seen = []
+		params = {**params, 'limit': 2}
+		while True:
+			response = client.get('/rental/', params=params, headers=headers)
+			seen += [rental['rental_date'] for rental in response.json()['rental_list']]
+			if 'X-Next-Cursor' not in response.headers:
+				break
+			params['cursor'] = response.headers['X-Next-Cursor']
+		assert seen == [rental.rental_date.isoformat() for rental in expected]
+
+	response = client.get('/rental/?cursor=bad', headers=headers)
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'Invalid cursor.'}
@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import rental_view
+from app.fields import requested_fields
+from app.schemas import RentalSchema
+
+BOARD = 'rental_date,return_date,costume.name,customer.name,user.name'
+
+
+@pytest.fixture
+def view_enabled(monkeypatch):
+	monkeypatch.setattr('app.rental_view.settings.RENTAL_VIEW_ENABLED', True)
+
+
+@pytest.mark.parametrize(
+	('fields', 'served'),
+	[
+		(BOARD, True),
+		('costume.id,user', False),
+		('customer', False),
+		('costume.fee', False),
+	],
+)
+def test_view_serves_what_it_holds(view_enabled, fields, served):
+	assert rental_view.serves(requested_fields(fields, RentalSchema)) is served
+
+
+def test_view_is_off_by_default():
+	assert not rental_view.serves(requested_fields(BOARD, RentalSchema))
+
+
+def test_rental_board_follows_writes(
+	client: TestClient, token, available_costume, customer, user, view_enabled
+):
+	headers = {'Authorization': f'Bearer {token}'}
+	client.post(
+		'/rental',
+		headers=headers,
+		json={'costume_id': available_costume.id, 'customer_id': customer.id},
+	)
+
+	response = client.get('/rental/', params={'fields': BOARD}, headers=headers)
+	[board] = response.json()['rental_list']
+	assert board['costume'] == {'name': available_costume.name}
+	assert board['customer'] == {'name': customer.name}
+	assert board['user'] == {'name': user.name}
+
+	client.put(
+		f'/costumes/{available_costume.id}',
+		headers=headers,
+		json={
+			'name': 'Renomeada',
+			'description': available_costume.description,
+			'fee': available_costume.fee,
+			'availability': 'unavailable',
+		},
+	)
+	response = client.get(
+		'/rental/',
+		params={'fields': 'costume.name', 'costume_id': available_costume.id},
+		headers=headers,
+	)
+	assert response.json() == {'rental_list': [{'costume': {'name': 'Renomeada'}}]}
+
+	client.delete('/rental/1', headers=headers)  # The only rental
+	response = client.get('/rental/', params={'fields': BOARD}, headers=headers)
+	assert response.json() == {'rental_list': []}
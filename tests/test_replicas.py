@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import database
+from app.replicas import LAG_QUERIES, ReplicaPinMiddleware, ReplicaSet
+
+
+def replica_set(urls=2, max_lag=5.0):
+	return ReplicaSet(
+		['sqlite+aiosqlite:///:memory:'] * urls,
+		max_lag=max_lag,
+		check_interval=1.0,
+		check_timeout=1.0,
+		pin_seconds=60.0,
+	)
+
+
+def request(authorization=b'Bearer abc'):
+	return Request({
+		'type': 'http',
+		'method': 'GET',
+		'path': '/costumes/',
+		'headers': [(b'authorization', authorization)],
+	})
+
+
+async def read_session_bind(monkeypatch, replicas, req):
+	monkeypatch.setattr(database, 'replicas', replicas)
+	sessions = database.get_read_session(req)
+	session = await anext(sessions)
+	await sessions.aclose()
+	return session.bind
+
+
+def test_pick_rotates_between_idle_replicas():
+	replicas = replica_set()
+	first, second = replicas.replicas
+
+	assert [replicas.pick() for _ in range(4)] == [first, second, first, second]
+
+
+def test_pick_skips_unhealthy_replicas():
+	replicas = replica_set()
+	first, second = replicas.replicas
+	first.healthy = False
+	assert {replicas.pick() for _ in range(3)} == {second}
+
+	second.healthy = False
+	assert replicas.pick() is None
+
+
+@pytest.mark.asyncio
+async def test_check_marks_lagging_and_unreachable_replicas(monkeypatch):
+	replicas = replica_set(max_lag=5.0)
+	await replicas.check(replicas.replicas[0])
+	assert replicas.replicas[0].healthy
+
+	monkeypatch.setitem(LAG_QUERIES, 'sqlite', 'SELECT 30')
+	await replicas.check(replicas.replicas[0])
+	assert not replicas.replicas[0].healthy
+	assert replicas.replicas[0].lag == 30
+	await replicas.dispose()
+
+	broken = ReplicaSet(['sqlite+aiosqlite:////nonexistent/dir/db'], 5.0, 1.0, 1.0, 1.0)
+	await broken.check(broken.replicas[0])
+	assert not broken.replicas[0].healthy
+
+
+@pytest.mark.asyncio
+async def test_read_session_uses_replica_then_primary(monkeypatch):
+	replicas = replica_set(urls=1)
+	replica = replicas.replicas[0]
+
+	assert await read_session_bind(monkeypatch, replicas, request()) is replica.engine
+
+	replica.healthy = False
+	assert (
+		await read_session_bind(monkeypatch, replicas, request())
+		is database.async_engine
+	)
+
+
+@pytest.mark.asyncio
+async def test_read_session_reads_own_writes_on_primary(monkeypatch):
+	replicas = replica_set(urls=1)
+	replicas.pin('Bearer abc')
+
+	assert (
+		await read_session_bind(monkeypatch, replicas, request())
+		is database.async_engine
+	)
+	assert (
+		await read_session_bind(monkeypatch, replicas, request(b'Bearer xyz'))
+		is replicas.replicas[0].engine
+	)
+
+
+def test_middleware_pins_clients_after_successful_writes(client: TestClient, token):
+	replicas = replica_set(urls=1)
+	headers = {'Authorization': f'Bearer {token}'}
+	pinned_client = TestClient(ReplicaPinMiddleware(client.app, replicas))
+
+	pinned_client.get('/costumes/', headers=headers)
+	pinned_client.delete('/costumes/404', headers=headers)
+	assert not replicas.pinned(f'Bearer {token}')
+
+	pinned_client.post(
+		'/costumes/',
+		headers=headers,
+		json={
+			'name': 'Pirata',
+			'description': 'Chapéu',
+			'fee': 50.0,
+			'availability': 'available',
+		},
+	)
+	assert replicas.pinned(f'Bearer {token}')
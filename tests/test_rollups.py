@@ -0,0 +1,125 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import rollups
+from app.models import CostumeRollup
+from tests.factories import RentalFactory
+
+
+def test_rented_seconds_are_split_between_months():
+	assert rollups.rented_seconds(
+		datetime(2026, 1, 31, 12), datetime(2026, 3, 1, 6)
+	) == {
+		date(2026, 1, 1): 12 * 3600,
+		date(2026, 2, 1): 28 * 86_400,
+		date(2026, 3, 1): 6 * 3600,
+	}
+	assert rollups.next_month(date(2026, 12, 1)) == date(2027, 1, 1)
+
+
+async def stored_rollups(session):
+	rows = await session.scalars(
+		select(CostumeRollup).order_by(CostumeRollup.costume_id, CostumeRollup.month)
+	)
+	return [
+		(row.costume_id, row.month, row.rentals, row.revenue, row.rented_seconds)
+		for row in rows
+	]
+
+
+@pytest.mark.asyncio
+async def test_record_and_rebuild_agree(test_session, user, customer, costume):
+	rentals = [
+		RentalFactory(
+			user_id=user.id,
+			customer_id=customer.id,
+			costume_id=costume.id,
+			rental_date=start,
+			return_date=end,
+			fee=fee,
+		)
+		for start, end, fee in (
+			(datetime(2026, 1, 30), datetime(2026, 2, 2), 100.0),
+			(datetime(2026, 2, 10), datetime(2026, 2, 11), 80.0),
+			(datetime(2026, 3, 1), datetime(2026, 3, 4), None),
+		)
+	]
+	test_session.add_all(rentals)
+	await test_session.flush()
+	for rental in rentals:
+		await rollups.record(test_session, rental)
+	await rollups.record(test_session, rentals[1], sign=-1)
+	await test_session.delete(rentals[1])
+	await test_session.commit()
+
+	recorded = await stored_rollups(test_session)
+	assert recorded == [
+		(costume.id, date(2026, 1, 1), 1, 100.0, 2 * 86_400),
+		(costume.id, date(2026, 2, 1), 0, 0.0, 86_400),
+		(costume.id, date(2026, 3, 1), 1, costume.fee, 3 * 86_400),
+	]
+
+	assert await rollups.rebuild(test_session) == 2
+	assert await stored_rollups(test_session) == recorded
+
+
+def test_rental_routes_keep_rollups(
+	client: TestClient, token, available_costume, customer
+):
+	headers = {'Authorization': f'Bearer {token}'}
+	rental = client.post(
+		'/rental',
+		headers=headers,
+		json={'costume_id': available_costume.id, 'customer_id': customer.id},
+	).json()
+	month = rental['rental_date'][:10]
+
+	response = client.get(
+		'/reports/costumes', params={'start': month, 'end': month}, headers=headers
+	)
+	assert response.status_code == 200
+	[report] = response.json()['costumes']
+	assert report['costume_id'] == available_costume.id
+	assert report['rentals'] == 1
+	assert report['revenue'] == available_costume.fee
+
+	client.delete('/rental/1', headers=headers)  # The only rental
+	response = client.get(
+		'/reports/revenue', params={'start': month, 'end': month}, headers=headers
+	)
+	[report] = response.json()['months']
+	assert report['rentals'] == 0
+	assert report['revenue'] == 0
+
+
+def test_reports_check_their_range(client: TestClient, token):
+	headers = {'Authorization': f'Bearer {token}'}
+
+	response = client.get(
+		'/reports/revenue',
+		params={'start': '2026-03-01', 'end': '2026-01-01'},
+		headers=headers,
+	)
+	assert response.status_code == 400
+	assert response.json() == {'detail': "Start can't be later than end."}
+
+	response = client.get(
+		'/reports/costumes',
+		params={'start': '2000-01-01', 'end': '2026-01-01'},
+		headers=headers,
+	)
+	assert response.status_code == 400
+	assert response.json() == {'detail': 'At most 120 months at a time.'}
+
+	response = client.get(
+		'/reports/revenue',
+		params={'start': '2026-01-15', 'end': '2026-02-01'},
+		headers=headers,
+	)
+	assert [month['month'] for month in response.json()['months']] == [
+		'2026-01-01',
+		'2026-02-01',
+	]
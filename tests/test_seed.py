@@ -0,0 +1,106 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.models import table_registry
+from app.seed import cpf_check_digits, is_valid_cpf, seed
+
+
+@pytest.fixture
+def database_url(tmp_path):
+	url = f'sqlite:///{tmp_path / "seed.db"}'
+	engine = create_engine(url)
+	table_registry.metadata.create_all(engine)
+	engine.dispose()
+
+	return url
+
+
+def _seed(url):
+	return seed(
+		url,
+		users=3,
+		customers=20,
+		costumes=10,
+		rentals=200,
+		seed=7,
+		until=date(2025, 12, 31),
+		password_hash='not-a-real-hash',
+		log=lambda message: None,
+	)
+
+
+def _rows(url, query):
+	engine = create_engine(url)
+	with engine.connect() as conn:
+		rows = conn.execute(text(query)).all()
+	engine.dispose()
+
+	return rows
+
+
+def test_cpf_check_digits():
+	assert cpf_check_digits('529982247') == '25'
+	assert is_valid_cpf('52998224725')
+	assert not is_valid_cpf('52998224724')
+	assert not is_valid_cpf('11111111111')
+
+
+def test_seed_loads_every_table(database_url):
+	loaded = _seed(database_url)
+
+	assert loaded == {'users': 3, 'customers': 20, 'costumes': 10, 'rental': 200}
+	assert all(
+		is_valid_cpf(cpf) for (cpf,) in _rows(database_url, 'SELECT cpf FROM customers')
+	)
+	assert _rows(
+		database_url,
+		'SELECT count(*) FROM rental WHERE return_date <= rental_date '
+		'OR costume_id NOT IN (SELECT id FROM costumes)',
+	) == [(0,)]
+
+
+def test_seed_never_overlaps_rentals_of_a_costume(database_url):
+	_seed(database_url)
+	_seed(database_url)
+
+	assert _rows(
+		database_url,
+		'SELECT count(*) FROM rental a JOIN rental b '
+		'ON a.costume_id = b.costume_id AND a.id < b.id '
+		'AND a.rental_date < b.return_date AND b.rental_date < a.return_date',
+	) == [(0,)]
+
+
+def test_seed_rentals_require_costumes(database_url):
+	with pytest.raises(ValueError, match='without costumes'):
+		seed(
+			database_url,
+			users=1,
+			customers=1,
+			costumes=0,
+			rentals=1,
+			password_hash='not-a-real-hash',
+			log=lambda message: None,
+		)
+
+
+def test_seed_is_deterministic(database_url, tmp_path):
+	other_url = f'sqlite:///{tmp_path / "other.db"}'
+	engine = create_engine(other_url)
+	table_registry.metadata.create_all(engine)
+	engine.dispose()
+
+	_seed(database_url)
+	_seed(other_url)
+
+	query = 'SELECT * FROM rental ORDER BY id'
+	assert _rows(database_url, query) == _rows(other_url, query)
+
+
+def test_seed_appends_after_existing_rows(database_url):
+	_seed(database_url)
+	_seed(database_url)
+
+	assert _rows(database_url, 'SELECT count(*), max(id) FROM rental') == [(400, 400)]
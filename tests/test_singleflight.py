@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+	flight = SingleFlight('test_flight')
+	executions = []
+	before = metrics.counters.copy()
+
+	async def load():
+		executions.append(1)
+		await asyncio.sleep(0.01)
+		return b'{"id": 1}'
+
+	results = await asyncio.gather(*(flight.do(1, load) for _ in range(5)))
+
+	assert results == [b'{"id": 1}'] * 5
+	assert executions == [1]
+	assert (
+		metrics.counters['test_flight.executed'] - before['test_flight.executed'] == 1
+	)
+	assert (
+		metrics.counters['test_flight.coalesced'] - before['test_flight.coalesced'] == 4
+	)
+	assert flight.calls == {}
+
+	await flight.do(1, load)
+	assert executions == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+	flight = SingleFlight('test_flight')
+
+	async def fail():
+		await asyncio.sleep(0.01)
+		raise LookupError('missing')
+
+	results = await asyncio.gather(
+		*(flight.do('key', fail) for _ in range(3)), return_exceptions=True
+	)
+
+	assert [type(result) for result in results] == [LookupError] * 3
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_leader_is_cancelled():
+	flight = SingleFlight('test_flight')
+	started = asyncio.Event()
+
+	async def load():
+		started.set()
+		await asyncio.sleep(0.01)
+		return 'loaded'
+
+	leader = asyncio.create_task(flight.do('key', load))
+	await started.wait()
+	follower = asyncio.create_task(flight.do('key', load))
+	await asyncio.sleep(0)
+	leader.cancel()
+
+	assert await follower == 'loaded'
+
+
+def test_get_costume_shares_serialized_response(
+	client: TestClient, costume, monkeypatch
+):
+	monkeypatch.setattr('app.routes.costumes.costume_reads', SingleFlight('costumes'))
+
+	response = client.get(f'/costumes/{costume.id}')
+	assert response.status_code == 200
+	assert response.json()['name'] == costume.name
+
+	response = client.get('/costumes/404')
+	assert response.status_code == 404
+	assert response.json() == {'detail': 'Costume not registered.'}
+
+
+def test_metrics(client: TestClient):
+	metrics.increment('test.requests', 2)
+	metrics.set_gauge('test.depth', 3)
+
+	response = client.get('/health/metrics')
+	assert response.status_code == 200
+	assert response.json()['counters']['test.requests'] >= 2
+	assert response.json()['gauges']['test.depth'] == 3
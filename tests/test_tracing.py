@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import tracing
+from app.main import app
+from app.tracing import (
+	JsonLinesExporter,
+	TracingMiddleware,
+	instrument_engine,
+	set_exporter,
+	span,
+)
+
+
+class ListExporter:
+	def __init__(self):
+		self.spans = []
+
+	def export(self, spans):
+		self.spans.extend(spans)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+	list_exporter = ListExporter()
+	monkeypatch.setattr('app.tracing.exporter', list_exporter)
+
+	return list_exporter
+
+
+@pytest.fixture
+def tracing_client(client: TestClient, test_session, exporter):
+	instrument_engine(test_session.bind)
+
+	return TestClient(TracingMiddleware(app))
+
+
+def test_span_outside_of_a_trace_is_a_no_op():
+	with span('nothing') as current:
+		assert current is None
+
+
+def test_login_spans(tracing_client: TestClient, user, exporter):
+	response = tracing_client.post(
+		'/auth/token',
+		data={'username': user.email, 'password': user.clean_password},
+	)
+	assert response.status_code == 200
+
+	spans = {item['name']: item for item in exporter.spans}
+	root = spans['POST /auth/token']
+	assert root['kind'] == 'SERVER'
+	assert root['parent_span_id'] is None
+	assert root['attributes']['http.route'] == '/auth/token'
+	assert root['attributes']['http.response.status_code'] == 200
+	assert {'db.query', 'bcrypt.verify', 'jwt.encode', 'response.serialize'} <= set(
+		spans
+	)
+	assert all(item['trace_id'] == root['trace_id'] for item in exporter.spans)
+	assert spans['db.query']['parent_span_id'] == root['span_id']
+	assert 'FROM users' in spans['db.query']['attributes']['db.query.text']
+	assert response.headers['traceparent'].split('-')[1] == root['trace_id']
+
+
+def test_trace_continues_incoming_traceparent(tracing_client: TestClient, exporter):
+	trace_id, parent_id = 'a' * 32, 'b' * 16
+
+	tracing_client.get(
+		'/costumes/', headers={'traceparent': f'00-{trace_id}-{parent_id}-01'}
+	)
+
+	root = exporter.spans[-1]
+	assert root['trace_id'] == trace_id
+	assert root['parent_span_id'] == parent_id
+
+
+def test_authenticated_request_spans(tracing_client: TestClient, token, exporter):
+	tracing_client.get('/rental/404', headers={'Authorization': f'Bearer {token}'})
+
+	root = exporter.spans[-1]
+	assert root['attributes']['http.response.status_code'] == 404
+	assert 'jwt.decode' in {item['name'] for item in exporter.spans}
+
+
+def test_json_lines_exporter(tmp_path):
+	path = tmp_path / 'traces.jsonl'
+	JsonLinesExporter(str(path)).export([{'name': 'a'}, {'name': 'b'}])
+
+	assert path.read_text().splitlines() == ['{"name": "a"}', '{"name": "b"}']
+
+
+def test_set_exporter(monkeypatch):
+	monkeypatch.setattr('app.tracing.exporter', None)
+	list_exporter = ListExporter()
+
+	set_exporter(list_exporter)
+
+	assert tracing.exporter is list_exporter
@@ -137,3 +137,34 @@ def test_delete_user_no_permission(
 	)
 	assert response_delete.status_code == HTTPStatus.BAD_REQUEST
 	assert response_delete.json() == {'detail': 'Not enough permissions'}
+
+
+def test_read_users_sparse_fields(client: TestClient, user):
+	response = client.get('/users/?fields=id,email')
+	assert response.json() == {'users': [{'id': user.id, 'email': user.email}]}
+
+	response = client.get(f'/users/{user.id}?fields=name')
+	assert response.json() == {'name': user.name}
+
+
+def test_read_users_total(client: TestClient, user, other_user, monkeypatch):
+	response = client.get('/users/?total=true&limit=1')
+	assert len(response.json()['users']) == 1
+	assert response.headers['X-Total-Count'] == '2'
+	assert response.headers['X-Total-Count-Exact'] == 'true'
+
+	# Past the threshold the highest id stands in for the count
+	monkeypatch.setattr('app.counts.settings.COUNT_EXACT_THRESHOLD', 1)
+	response = client.get('/users/?total=true&fields=id')
+	assert response.headers['X-Total-Count'] == str(max(user.id, other_user.id))
+	assert response.headers['X-Total-Count-Exact'] == 'false'
+
+
+def test_read_users_by_ids(client: TestClient, user, other_user):
+	response = client.get(f'/users/batch?ids={other_user.id},404,{user.id}')
+	assert response.status_code == 200
+	assert [found['email'] for found in response.json()['users']] == [
+		other_user.email,
+		user.email,
+	]
+	assert response.json()['missing'] == [404]